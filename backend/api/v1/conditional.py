@@ -0,0 +1,119 @@
+from datetime import datetime, timezone
+from functools import wraps
+from hashlib import sha1
+from time import time
+
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from core.versions import get_versions
+from recipes.ingredient_index import INGREDIENTS_VERSION_KEY
+from recipes.models import Recipe
+from recipes.versions import (AUTHORS_VERSION_KEY, RECIPES_VERSION_KEY,
+                              TAGS_VERSION_KEY, author_version_key,
+                              membership_version_key, recipe_version_key)
+
+NANOSECONDS = 10 ** 9
+
+
+def get_validators(request, keys):
+    """
+    Возвращает ETag и Last-Modified для ресурса по версиям его частей.
+
+    Last-Modified передается с точностью до секунды, поэтому время
+    последнего изменения округляется вверх. Если эта секунда еще не
+    прошла, Last-Modified не возвращается: следующее изменение в ту же
+    секунду дало бы то же значение и ложный ответ 304 на
+    If-Modified-Since. Такие ответы проверяются только по ETag.
+
+    Для аутентифицированного пользователя в валидатор входит версия его
+    избранного, корзины и подписок, поэтому флаги is_favorited,
+    is_in_shopping_cart и is_subscribed не устаревают.
+    В валидатор входит и выбранный формат ответа (JSON или MessagePack).
+
+    Args:
+        request (Request): Запрос.
+        keys (list | None): Имена версий (core.versions) или None, если
+        ресурс не найден.
+
+    Returns:
+        tuple: ETag (str) и Last-Modified (datetime | None) или
+        (None, None).
+    """
+    if keys is None:
+        return None, None
+    keys = list(keys)
+    user = request.user
+    if user.is_authenticated:
+        keys.append(membership_version_key(user.pk))
+    versions = get_versions(*keys)
+    etag = sha1(repr((
+        user.pk, getattr(request, 'accepted_media_type', None),
+        [versions[key] for key in keys])).encode()).hexdigest()
+    seconds = -(-max(versions.values()) // NANOSECONDS)
+    if seconds > time():
+        return etag, None
+    return etag, datetime.fromtimestamp(seconds, tz=timezone.utc)
+
+
+def conditional_get(get_keys):
+    """
+    Декоратор GET-обработчика для условных запросов.
+
+    Отвечает 304 Not Modified на If-None-Match / If-Modified-Since до
+    выборки данных и сериализации, иначе добавляет к ответу ETag и
+    Last-Modified. Версии ресурса увеличиваются при записи (см.
+    recipes.versions и recipes.signals).
+
+    Args:
+        get_keys (callable): Функция (request, *args, **kwargs),
+        возвращающая имена версий ресурса или None.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            validators = []
+
+            def get_cached_validators(request, *args, **kwargs):
+                if not validators:
+                    validators.extend(get_validators(
+                        request, get_keys(request, *args, **kwargs)))
+                return validators
+
+            response = condition(
+                etag_func=lambda *args, **kwargs: get_cached_validators(
+                    *args, **kwargs)[0],
+                last_modified_func=lambda *args, **kwargs: (
+                    get_cached_validators(*args, **kwargs)[1]),
+            )(view_func)(request, *args, **kwargs)
+            patch_vary_headers(response, ('Authorization', 'Accept'))
+            patch_cache_control(response, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def recipe_list_keys(request, *args, **kwargs):
+    """Версии списка рецептов."""
+    return [RECIPES_VERSION_KEY, AUTHORS_VERSION_KEY, TAGS_VERSION_KEY,
+            INGREDIENTS_VERSION_KEY]
+
+
+def recipe_detail_keys(request, pk, *args, **kwargs):
+    """Версии рецепта: сам рецепт, его автор, теги и ингредиенты."""
+    author_id = Recipe.objects.filter(pk=pk).values_list(
+        'author_id', flat=True).first()
+    if author_id is None:
+        return None
+    return [recipe_version_key(pk), author_version_key(author_id),
+            TAGS_VERSION_KEY, INGREDIENTS_VERSION_KEY]
+
+
+def tag_keys(request, *args, **kwargs):
+    """Версии тегов."""
+    return [TAGS_VERSION_KEY]
+
+
+def ingredient_keys(request, *args, **kwargs):
+    """Версии каталога ингредиентов."""
+    return [INGREDIENTS_VERSION_KEY]
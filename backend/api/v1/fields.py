@@ -0,0 +1,78 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import serializers
+from rest_framework.relations import (MANY_RELATION_KWARGS, ManyRelatedField,
+                                      PrimaryKeyRelatedField)
+
+from recipes.models import Recipe
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """
+    Поле со ссылками на уменьшенные варианты изображения рецепта.
+
+    Преобразует {размер: {формат: файл}} в {размер: {формат: URL}}.
+    Как и ImageField, возвращает абсолютные ссылки, если в контексте
+    сериализатора есть запрос.
+    """
+
+    def to_representation(self, variants):
+        request = self.context.get('request')
+        storage = Recipe.image.field.storage
+        representation = {}
+        for variant, formats in variants.items():
+            representation[variant] = {}
+            for image_format, name in formats.items():
+                url = storage.url(name)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                representation[variant][image_format] = url
+        return representation
+
+
+class BulkManyRelatedField(ManyRelatedField):
+    """
+    Список связанных объектов, которые загружаются одним запросом
+    WHERE pk IN (...), а не отдельным запросом на каждый элемент.
+
+    Порядок и повторы элементов сохраняются, ошибки совпадают с
+    ошибками PrimaryKeyRelatedField.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        child = self.child_relation
+        queryset = child.get_queryset()
+        pk_field = queryset.model._meta.pk
+        pks = []
+        for item in data:
+            if isinstance(item, bool):
+                child.fail('incorrect_type', data_type=type(item).__name__)
+            try:
+                pks.append(pk_field.to_python(item))
+            except (TypeError, ValueError, DjangoValidationError):
+                child.fail('incorrect_type', data_type=type(item).__name__)
+
+        objects = queryset.in_bulk(set(pks))
+        for pk in pks:
+            if pk not in objects:
+                child.fail('does_not_exist', pk_value=pk)
+        return [objects[pk] for pk in pks]
+
+
+class BulkPrimaryKeyRelatedField(PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField, который при many=True загружает все объекты
+    одним запросом (см. BulkManyRelatedField).
+    """
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
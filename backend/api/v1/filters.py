@@ -2,6 +2,7 @@ from django_filters import (CharFilter, FilterSet,
                             ModelMultipleChoiceFilter, NumberFilter)
 
 from recipes.models import Ingredient, Recipe, Tag
+from recipes.search import search_recipes
 from users.models import User
 
 
@@ -10,7 +11,8 @@ class RecipeFilter(FilterSet):
     Настраиваемые фильтры для рецептов.
 
     Позволяет фильтровать рецепты по тегам, авторам, а также по наличию
-    в избранном или корзине определенного пользователя.
+    в избранном или корзине определенного пользователя, и искать их
+    по названию, описанию и ингредиентам.
 
     Attributes:
         - is_favorited (NumberFilter): Фильтр для проверки наличия рецепта
@@ -18,6 +20,8 @@ class RecipeFilter(FilterSet):
         - is_in_shopping_cart (NumberFilter): Фильтр для проверки наличия
         рецепта в корзине пользователя.
         - tags (ModelMultipleChoiceFilter): Фильтр по тегам.
+        - search (CharFilter): Полнотекстовый поиск с сортировкой по
+        релевантности.
     """
 
     is_favorited = NumberFilter(
@@ -35,6 +39,10 @@ class RecipeFilter(FilterSet):
         queryset=Tag.objects.all(),
         to_field_name='slug'
     )
+    search = CharFilter(
+        method='filter_search',
+        label='search'
+    )
 
     class Meta:
         model = Recipe
@@ -42,7 +50,8 @@ class RecipeFilter(FilterSet):
             'tags',
             'author',
             'is_favorited',
-            'is_in_shopping_cart'
+            'is_in_shopping_cart',
+            'search'
         )
 
     def filter_users_lists(self, queryset, name, value):
@@ -51,6 +60,10 @@ class RecipeFilter(FilterSet):
             return queryset
         return queryset.filter(**{name: user})
 
+    @staticmethod
+    def filter_search(queryset, name, value):
+        return search_recipes(queryset, value)
+
 
 class UserFilter(FilterSet):
     """
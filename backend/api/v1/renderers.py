@@ -0,0 +1,95 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Типы, которые кодеки не поддерживают сами (Decimal, ленивые строки
+# перевода, QuerySet), и даты кодируются так же, как в JSONRenderer.
+encode_default = JSONEncoder().default
+
+
+class PassthroughRenderer(BaseRenderer):
+    """
+    Базовый рендерер для представлений, которые сами формируют тело
+    ответа (HttpResponse/StreamingHttpResponse).
+
+    Используется только для согласования формата (`?format=` или
+    заголовок Accept): данные, переданные в render, возвращаются как есть.
+    """
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+
+class PDFRenderer(PassthroughRenderer):
+    """Согласование формата application/pdf (`?format=pdf`)."""
+    media_type = 'application/pdf'
+    format = 'pdf'
+
+
+class PlainTextRenderer(PassthroughRenderer):
+    """Согласование формата text/plain (`?format=txt`)."""
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+
+class CSVRenderer(PassthroughRenderer):
+    """Согласование формата text/csv (`?format=csv`)."""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer на основе orjson (подключается в настройках, если
+    пакет установлен).
+
+    Вывод совпадает с JSONRenderer: компактный UTF-8 без экранирования
+    не-ASCII символов, даты и Decimal кодируются кодировщиком DRF,
+    U+2028 и U+2029 экранируются. Ответы с отступами (`indent` в Accept)
+    рендерятся JSONRenderer.
+    """
+    options = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+               if orjson is not None else 0)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        content = orjson.dumps(data, default=encode_default,
+                               option=self.options)
+        return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+            b'\xe2\x80\xa9', b'\\u2029')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Рендерер application/msgpack для мобильных клиентов (`?format=msgpack`
+    или заголовок Accept; подключается, если установлен msgpack).
+
+    Типы, которых нет в MessagePack, кодируются так же, как в JSON.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encode_default,
+                             use_bin_type=True)
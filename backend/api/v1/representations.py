@@ -0,0 +1,168 @@
+from typing import Dict, Iterable, List, Optional
+
+from django.db.models import F
+
+from recipes.membership import get_membership
+from recipes.models import Recipe
+
+
+class Representer:
+    """
+    Быстрое представление объектов для ответов на чтение.
+
+    Повторяет вывод TagSerializer, UserSerializer, RecipeReadSerializer,
+    ShortRecipeReadSerializer и UserSubscriptionListSerializer байт в
+    байт, но без полей DRF: объект с уже загруженными связями
+    превращается в словарь прямым чтением атрибутов. Сериализаторы
+    делегируют сюда to_representation и по-прежнему используют свои
+    поля для записи. Один экземпляр создается на корневой сериализатор
+    (get_representer), множества пользователя загружаются один раз.
+
+    Методы:
+        - tag(tag): Представление тега.
+        - user(user): Представление пользователя.
+        - recipe(recipe): Полное представление рецепта.
+        - short_recipe(recipe, absolute): Краткое представление рецепта.
+        - subscription(author, recipes): Представление автора в списке
+        подписок с превью его рецептов.
+    """
+
+    def __init__(self, request=None):
+        self.request = request
+        self.storage = Recipe.image.field.storage
+        self._membership = None
+
+    @property
+    def membership(self):
+        if self._membership is None:
+            self._membership = get_membership(self.request.user)
+        return self._membership
+
+    def url(self, name: str, absolute: bool = True) -> str:
+        url = self.storage.url(name)
+        if absolute and self.request is not None:
+            return self.request.build_absolute_uri(url)
+        return url
+
+    def image(self, file, absolute: bool = True) -> Optional[str]:
+        """Ссылка на файл изображения, как у ImageField."""
+        if not file:
+            return None
+        return self.url(file.name, absolute)
+
+    def image_variants(self, variants: Optional[Dict],
+                       absolute: bool = True) -> Optional[Dict]:
+        """Ссылки на варианты изображения, как у ImageVariantsField."""
+        if variants is None:
+            return None
+        return {
+            variant: {image_format: self.url(name, absolute)
+                      for image_format, name in formats.items()}
+            for variant, formats in variants.items()
+        }
+
+    def is_subscribed(self, user_id: int) -> bool:
+        if self.request is None:
+            return False
+        return self.membership.is_subscribed(user_id)
+
+    @staticmethod
+    def tag(tag) -> Dict:
+        return {
+            'id': tag.id,
+            'name': tag.name,
+            'color': tag.color,
+            'slug': tag.slug,
+        }
+
+    def user(self, user) -> Dict:
+        return {
+            'email': user.email,
+            'id': user.id,
+            'username': user.username,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'is_subscribed': self.is_subscribed(user.id),
+        }
+
+    @staticmethod
+    def ingredients(recipe) -> List[Dict]:
+        essentials = getattr(recipe, 'prefetched_essentials', None)
+        if essentials is None:
+            return list(recipe.ingredients.values(
+                'id', 'name', 'measurement_unit',
+                amount=F('recipeessentials__amount')))
+        return [
+            {
+                'id': essential.ingredient.id,
+                'name': essential.ingredient.name,
+                'measurement_unit': essential.ingredient.measurement_unit,
+                'amount': essential.amount,
+            }
+            for essential in essentials
+        ]
+
+    def recipe(self, recipe) -> Dict:
+        membership = self.membership
+        return {
+            'id': recipe.id,
+            'tags': [self.tag(tag) for tag in recipe.tags.all()],
+            'author': self.user(recipe.author),
+            'ingredients': self.ingredients(recipe),
+            'is_favorited': membership.is_favorited(recipe.id),
+            'is_in_shopping_cart': membership.is_in_shopping_cart(recipe.id),
+            'image': self.image(recipe.image),
+            'image_width': recipe.image_width,
+            'image_height': recipe.image_height,
+            'image_placeholder': recipe.image_placeholder,
+            'image_variants': self.image_variants(recipe.image_variants),
+            'name': recipe.name,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+        }
+
+    def short_recipe(self, recipe, absolute: bool = True) -> Dict:
+        return {
+            'id': recipe.id,
+            'name': recipe.name,
+            'image': self.image(recipe.image, absolute),
+            'image_width': recipe.image_width,
+            'image_height': recipe.image_height,
+            'image_placeholder': recipe.image_placeholder,
+            'image_variants': self.image_variants(recipe.image_variants,
+                                                  absolute),
+            'cooking_time': recipe.cooking_time,
+        }
+
+    def subscription(self, author, recipes: Iterable) -> Dict:
+        return {
+            'email': author.email,
+            'id': author.id,
+            'username': author.username,
+            'first_name': author.first_name,
+            'last_name': author.last_name,
+            'is_subscribed': self.membership.is_subscribed(author.id),
+            # Превью рецептов в подписках содержат относительные ссылки.
+            'recipes': [self.short_recipe(recipe, absolute=False)
+                        for recipe in recipes],
+            'recipes_count': author.recipes_count,
+        }
+
+
+def get_representer(serializer) -> Representer:
+    """
+    Возвращает Representer корневого сериализатора (один на список).
+
+    Args:
+        serializer (Serializer): Сериализатор или дочерний сериализатор
+        списка.
+
+    Returns:
+        Representer: Представление с запросом из контекста сериализатора.
+    """
+    root = serializer.root
+    representer = getattr(root, '_representer', None)
+    if representer is None:
+        representer = Representer(serializer.context.get('request'))
+        root._representer = representer
+    return representer
@@ -0,0 +1,211 @@
+import time
+from hashlib import sha1
+
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from core.background import run_in_background
+from core.constants.settings import (RESPONSE_CACHE_REFRESH_LOCK_TIMEOUT,
+                                     RESPONSE_CACHE_STALE_IF_ERROR,
+                                     RESPONSE_CACHE_STALE_WHILE_REVALIDATE,
+                                     RESPONSE_CACHE_TIMEOUT)
+from core.versions import get_versions
+from recipes.ingredient_index import INGREDIENTS_VERSION_KEY
+from recipes.versions import (AUTHORS_VERSION_KEY, RECIPE_SET_VERSION_KEY,
+                              RECIPES_VERSION_KEY, TAGS_VERSION_KEY,
+                              author_version_key, recipe_version_key)
+
+CACHED_HEADERS = ('ETag', 'Last-Modified', 'Vary', 'Cache-Control')
+# Общие версии, которые увеличиваются вместе с версией любого рецепта,
+# автора, тега или ингредиента.
+GLOBAL_TAGS = (RECIPES_VERSION_KEY, AUTHORS_VERSION_KEY,
+               RECIPE_SET_VERSION_KEY, TAGS_VERSION_KEY,
+               INGREDIENTS_VERSION_KEY)
+REFRESH_ATTRIBUTE = '_response_cache_refresh'
+
+
+def get_cache_key(request) -> str:
+    """
+    Возвращает ключ кеша ответа: хост, путь, нормализованная строка
+    запроса (параметры и значения отсортированы, пустые отброшены) и
+    заголовок Accept.
+    """
+    query = sorted(
+        (key, value)
+        for key, values in request.GET.lists()
+        for value in values if value != ''
+    )
+    source = repr((request.get_host(), request.path, query,
+                   request.META.get('HTTP_ACCEPT', '')))
+    return f'response:{sha1(source.encode()).hexdigest()}'
+
+
+def get_recipe_tags(data) -> list:
+    """
+    Возвращает версии, от которых зависит ответ со списком рецептов или
+    одним рецептом: версии рецептов и их авторов, множества рецептов
+    (для списков), тегов и ингредиентов.
+    """
+    if 'results' in data:
+        recipes = data['results']
+        tags = [RECIPE_SET_VERSION_KEY]
+    else:
+        recipes = [data]
+        tags = []
+    tags += [TAGS_VERSION_KEY, INGREDIENTS_VERSION_KEY]
+    for recipe in recipes:
+        tags.append(recipe_version_key(recipe['id']))
+        tags.append(author_version_key(recipe['author']['id']))
+    return list(dict.fromkeys(tags))
+
+
+def clone_request(request) -> HttpRequest:
+    """Копия GET-запроса для повторного выполнения в фоне."""
+    clone = HttpRequest()
+    clone.method = 'GET'
+    clone.path = request.path
+    clone.path_info = request.path_info
+    clone.META = request.META.copy()
+    clone.GET = request.GET.copy()
+    setattr(clone, REFRESH_ATTRIBUTE, True)
+    return clone
+
+
+class AnonymousResponseCacheMixin:
+    """
+    Примесь APIView: общий кеш GET-ответов для анонимных пользователей.
+
+    Ответы анонимным пользователям одинаковы, поэтому кешируются по
+    нормализованной строке запроса (без аутентификации и обращения к
+    базе данных при попадании). Запись помечается версиями рецептов и
+    авторов, которые в нее вошли, а также тегов, ингредиентов и (для
+    списков) множества рецептов, и перестает быть свежей, как только
+    любая из версий изменилась или истек RESPONSE_CACHE_TIMEOUT.
+
+    Устаревшая запись:
+        - отдается еще RESPONSE_CACHE_STALE_WHILE_REVALIDATE секунд,
+        пока ответ пересчитывается в фоне (stale-while-revalidate);
+        - отдается до RESPONSE_CACHE_STALE_IF_ERROR секунд, если
+        пересчитать ответ не удалось из-за ошибки базы данных
+        (stale-if-error).
+
+    Ответ не сохраняется, если во время его расчета изменилась любая из
+    общих версий (GLOBAL_TAGS): неизвестно, какие данные в него вошли.
+
+    Заголовок X-Cache ответа: HIT, STALE или MISS.
+
+    Атрибуты:
+        - get_response_cache_tags (callable): Возвращает версии, от
+        которых зависит ответ, по его данным.
+    """
+    get_response_cache_tags = staticmethod(get_recipe_tags)
+
+    def dispatch(self, request, *args, **kwargs):
+        if (request.method != 'GET'
+                or 'HTTP_AUTHORIZATION' in request.META):
+            return super().dispatch(request, *args, **kwargs)
+
+        cache_key = get_cache_key(request)
+        entry = None
+        if not getattr(request, REFRESH_ATTRIBUTE, False):
+            entry = cache.get(cache_key)
+        if entry is not None:
+            stale_since = self.get_stale_since(entry)
+            if stale_since is None:
+                return self.build_cached_response(request, entry, 'HIT')
+            if time.time() - stale_since < (
+                    RESPONSE_CACHE_STALE_WHILE_REVALIDATE):
+                self.schedule_refresh(request, cache_key, *args, **kwargs)
+                return self.build_cached_response(request, entry, 'STALE')
+
+        global_versions = get_versions(*GLOBAL_TAGS)
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+        except DatabaseError:
+            if entry is None:
+                raise
+            return self.build_cached_response(request, entry, 'STALE')
+        if response.status_code == 200:
+            self.store(cache_key, response, global_versions)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    @staticmethod
+    def get_stale_since(entry):
+        """
+        Возвращает время (в секундах), с которого запись устарела, или
+        None, если запись свежая.
+        """
+        versions = get_versions(*entry['versions'])
+        changed = [version for key, version in versions.items()
+                   if version != entry['versions'][key]]
+        expires_at = entry['created_at'] + RESPONSE_CACHE_TIMEOUT
+        if changed:
+            return min(max(changed) / 1e9, expires_at)
+        if time.time() >= expires_at:
+            return expires_at
+        return None
+
+    def store(self, cache_key: str, response, global_versions: dict) -> None:
+        """
+        Сохраняет отрендеренный ответ вместе с версиями его частей.
+
+        Args:
+            cache_key (str): Ключ кеша ответа.
+            response (Response): Ответ.
+            global_versions (dict): Общие версии, прочитанные до расчета
+            ответа.
+        """
+        tags = self.get_response_cache_tags(response.data)
+        versions = get_versions(*tags, *GLOBAL_TAGS)
+        # Версии частей ответа увеличиваются вместе с общими, поэтому
+        # при неизменных общих версиях они совпадают с версиями до
+        # расчета ответа.
+        if any(versions[key] != version
+               for key, version in global_versions.items()):
+            return
+        response.render()
+        cache.set(cache_key, {
+            'content': response.content,
+            'status': response.status_code,
+            'headers': {header: response[header] for header in
+                        CACHED_HEADERS + ('Content-Type',)
+                        if response.has_header(header)},
+            'versions': {key: versions[key] for key in tags},
+            'created_at': time.time(),
+        }, RESPONSE_CACHE_STALE_IF_ERROR)
+
+    @staticmethod
+    def build_cached_response(request, entry, state: str):
+        response = HttpResponse(entry['content'], status=entry['status'])
+        for header, value in entry['headers'].items():
+            response[header] = value
+        response['X-Cache'] = state
+        last_modified = parse_http_date_safe(
+            entry['headers'].get('Last-Modified', ''))
+        response = get_conditional_response(
+            request, etag=entry['headers'].get('ETag'),
+            last_modified=last_modified, response=response)
+        return response
+
+    def schedule_refresh(self, request, cache_key: str, *args, **kwargs):
+        """
+        Пересчитывает ответ в фоне (не больше одного пересчета на ключ
+        одновременно).
+        """
+        if not cache.add(f'{cache_key}:refresh', 1,
+                         RESPONSE_CACHE_REFRESH_LOCK_TIMEOUT):
+            return
+        view = type(self).as_view()
+        clone = clone_request(request)
+
+        def refresh():
+            try:
+                view(clone, *args, **kwargs)
+            finally:
+                cache.delete(f'{cache_key}:refresh')
+
+        run_in_background(refresh)
@@ -1,15 +1,28 @@
 from typing import Dict, List
 
+from django.db import transaction
 from django.db.models import F
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import IntegerField, SerializerMethodField
-from rest_framework.relations import PrimaryKeyRelatedField
-
-from core.constants.recipes import MIN_INGREDIENT_AMOUNT
-from recipes.models import (Favorite, Ingredient, Recipe,
-                            RecipeEssentials, ShoppingCart, Tag)
+from rest_framework.reverse import reverse
+
+from api.v1.fields import BulkPrimaryKeyRelatedField, ImageVariantsField
+from api.v1.representations import get_representer
+from core.background import run_in_background
+from core.constants.recipes import (BULK_RECIPES_MAX_LENGTH,
+                                    MIN_INGREDIENT_AMOUNT)
+from core.counters import change_counter
+from core.versions import bump_version
+from recipes.models import (Ingredient, Recipe, RecipeEssentials,
+                            ShoppingListJob, Tag)
+from recipes.images import process_recipe_image
+from recipes.membership import get_membership
+from recipes.search import index_recipes
+from recipes.shopping_list import apply_recipe_changes
+from recipes.versions import RECIPE_SET_VERSION_KEY, bump_recipes
+from users.models import User
 from users.serializers import UserSerializer
 
 
@@ -35,6 +48,9 @@ class TagSerializer(serializers.ModelSerializer):
             data[attr] = value.strip(" #").upper()
         return data
 
+    def to_representation(self, instance: Tag) -> Dict:
+        return get_representer(self).tag(instance)
+
 
 class IngredientSerializer(serializers.ModelSerializer):
     """
@@ -59,6 +75,8 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         author (UserSerializer): Сериализатор для автора рецепта.
         ingredients (list of dict): Список ингредиентов рецепта.
         image (str): Изображение рецепта в формате Base64.
+        image_variants (dict): Ссылки на уменьшенные варианты изображения
+        в форматах WebP и JPEG.
         is_favorited (bool): Указывает, добавлен ли рецепт в избранное
         текущим пользователем.
         is_in_shopping_cart (bool): Указывает, добавлен ли рецепт в
@@ -68,6 +86,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     ingredients = SerializerMethodField()
     image = Base64ImageField()
+    image_variants = ImageVariantsField()
     is_favorited = SerializerMethodField()
     is_in_shopping_cart = SerializerMethodField()
 
@@ -81,6 +100,10 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             'is_favorited',
             'is_in_shopping_cart',
             'image',
+            'image_width',
+            'image_height',
+            'image_placeholder',
+            'image_variants',
             'name',
             'text',
             'cooking_time',
@@ -90,6 +113,16 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     def get_ingredients(obj: Recipe) -> List[Dict]:
         """Возвращает список ингредиентов рецепта в виде списка словарей."""
         recipe = obj
+        if hasattr(recipe, 'prefetched_essentials'):
+            return [
+                {
+                    'id': essential.ingredient.id,
+                    'name': essential.ingredient.name,
+                    'measurement_unit': essential.ingredient.measurement_unit,
+                    'amount': essential.amount,
+                }
+                for essential in recipe.prefetched_essentials
+            ]
         ingredients = recipe.ingredients.values(
             'id',
             'name',
@@ -100,17 +133,20 @@ class RecipeReadSerializer(serializers.ModelSerializer):
 
     def get_is_favorited(self, recipe: Recipe) -> bool:
         """Указывает, добавлен ли рецепт в избранное текущим пользователем."""
-        return ((user := self.context.get('request').user)
-                and user.is_authenticated
-                and Favorite.objects.filter(user=user,
-                                            recipe=recipe).exists())
+        user = self.context.get('request').user
+        return get_membership(user).is_favorited(recipe.pk)
 
     def get_is_in_shopping_cart(self, recipe: Recipe) -> bool:
         """Указывает, добавлен ли рецепт в корзину текущим пользователем."""
-        return ((user := self.context.get('request').user)
-                and user.is_authenticated
-                and ShoppingCart.objects.filter(user=user,
-                                                recipe=recipe).exists())
+        user = self.context.get('request').user
+        return get_membership(user).is_in_shopping_cart(recipe.pk)
+
+    def to_representation(self, instance: Recipe) -> Dict:
+        """
+        Возвращает представление рецепта без обхода полей DRF
+        (api.v1.representations), вывод совпадает с полями выше.
+        """
+        return get_representer(self).recipe(instance)
 
 
 class RecipeEssentialsSerializer(serializers.ModelSerializer):
@@ -146,7 +182,7 @@ class RecipePostSerializer(serializers.ModelSerializer):
         text (str): Описание рецепта.
         cooking_time (int): Время приготовления рецепта в минутах.
     """
-    tags = PrimaryKeyRelatedField(many=True, queryset=Tag.objects.all())
+    tags = BulkPrimaryKeyRelatedField(many=True, queryset=Tag.objects.all())
     author = UserSerializer(read_only=True)
     id = IntegerField(read_only=True)
     ingredients = RecipeEssentialsSerializer(many=True)
@@ -174,110 +210,176 @@ class RecipePostSerializer(serializers.ModelSerializer):
     @staticmethod
     def create_recipe_essentials(recipe: Recipe,
                                  ingredients: List[Dict]) -> None:
-        """Создает связи между рецептом и ингредиентами (RecipeEssentials)."""
-        essentials = []
-        for ingredient in ingredients:
-            try:
-                ingredient_obj = Ingredient.objects.get(id=ingredient['id'])
-            except Ingredient.DoesNotExist:
-                raise serializers.ValidationError(
-                    {
-                        "ingredients": f'Ингредиента с ID {ingredient["id"]}'
-                                       f' не существует.'})
-
-            composition = RecipeEssentials(
-                ingredient=ingredient_obj,
+        """
+        Создает связи между рецептом и ингредиентами (RecipeEssentials)
+        одним запросом. Существование ингредиентов проверяется в validate.
+        """
+        RecipeEssentials.objects.bulk_create(
+            RecipeEssentials(
+                ingredient_id=ingredient['id'],
                 recipe=recipe,
                 amount=ingredient['amount']
             )
-            essentials.append(composition)
-        RecipeEssentials.objects.bulk_create(essentials)
+            for ingredient in ingredients
+        )
 
     def create(self, validated_data: Dict) -> Recipe:
         """Создает новый рецепт в базе данных."""
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
 
-        for ingredient in ingredients:
-            ingredient = ingredient['id']
-            try:
-                Ingredient.objects.get(id=ingredient)
-            except Ingredient.DoesNotExist:
-                raise serializers.ValidationError(
-                    {"ingredients": f"Ингредиента с ID {ingredient} "
-                                    f"не существует."})
-
-        recipe = Recipe.objects.create(**validated_data)
-        recipe.tags.set(tags)
-        self.create_recipe_essentials(recipe=recipe,
-                                      ingredients=ingredients)
+        with transaction.atomic():
+            recipe = Recipe.objects.create(**validated_data)
+            recipe.tags.set(tags)
+            self.create_recipe_essentials(recipe=recipe,
+                                          ingredients=ingredients)
+            change_counter(User, recipe.author_id, 'recipes_count', 1)
+        index_recipes([recipe.pk])
+        run_in_background(process_recipe_image, recipe.pk)
         return recipe
 
     def update(self, instance, validated_data):
-        instance.name = validated_data.get('name', instance.name)
-        instance.text = validated_data.get('text', instance.text)
-        instance.cooking_time = validated_data.get('cooking_time',
-                                                   instance.cooking_time)
-        instance.image = validated_data.get('image', instance.image)
+        """
+        Обновляет рецепт, записывая только изменившиеся данные.
 
-        tags = validated_data.get('tags', [])
-        instance.tags.set(tags)
+        Теги и ингредиенты сравниваются с текущими: добавляются новые,
+        обновляется количество измененных и удаляются лишние связи. Поля,
+        не переданные в PATCH, не затрагиваются.
+        """
+        update_fields = [field for field in ('name', 'text', 'cooking_time',
+                                             'image')
+                         if field in validated_data]
+        for field in update_fields:
+            setattr(instance, field, validated_data[field])
+        if 'image' in validated_data:
+            # Данные обработки сбрасывает сигнал reset_replaced_image.
+            update_fields += ['image_width', 'image_height',
+                              'image_variants', 'image_placeholder']
+
+        with transaction.atomic():
+            if 'tags' in validated_data:
+                instance.tags.set(validated_data['tags'])
+            ingredients_changed = (
+                'ingredients' in validated_data
+                and self.update_recipe_essentials(
+                    instance, validated_data['ingredients']))
+            if update_fields:
+                instance.save(update_fields=update_fields)
+
+            # Изменение только тегов и ингредиентов не сохраняет рецепт.
+            bump_recipes([instance.pk])
+            if 'tags' in validated_data or ingredients_changed:
+                bump_version(RECIPE_SET_VERSION_KEY)
+
+        if ingredients_changed or {'name', 'text'} & set(update_fields):
+            index_recipes([instance.pk])
+        return instance
 
-        ingredients_data = validated_data.get('ingredients', [])
-        instance.ingredients.clear()
-        self.create_recipe_essentials(instance, ingredients_data)
+    @staticmethod
+    def update_recipe_essentials(recipe: Recipe,
+                                 ingredients: List[Dict]) -> bool:
+        """
+        Приводит ингредиенты рецепта к новому составу минимальным
+        набором запросов (INSERT, UPDATE, DELETE только при необходимости)
+        и обновляет списки покупок пользователей.
 
-        instance.save()
-        return instance
+        Returns:
+            bool: True, если состав рецепта изменился.
+        """
+        current = {
+            ingredient_id: (pk, amount)
+            for pk, ingredient_id, amount in recipe.ingredient.values_list(
+                'id', 'ingredient_id', 'amount')
+        }
+        new_amounts = {item['id']: item['amount'] for item in ingredients}
+        created = [
+            RecipeEssentials(recipe=recipe, ingredient_id=ingredient_id,
+                             amount=amount)
+            for ingredient_id, amount in new_amounts.items()
+            if ingredient_id not in current
+        ]
+        updated = [
+            RecipeEssentials(id=current[ingredient_id][0], amount=amount)
+            for ingredient_id, amount in new_amounts.items()
+            if ingredient_id in current
+            and current[ingredient_id][1] != amount
+        ]
+        deleted = [pk for ingredient_id, (pk, _) in current.items()
+                   if ingredient_id not in new_amounts]
+        if not (created or updated or deleted):
+            return False
+
+        if deleted:
+            RecipeEssentials.objects.filter(id__in=deleted).delete()
+        if updated:
+            RecipeEssentials.objects.bulk_update(updated, ['amount'])
+        if created:
+            RecipeEssentials.objects.bulk_create(created)
+        apply_recipe_changes(
+            recipe,
+            {ingredient_id: amount
+             for ingredient_id, (_, amount) in current.items()},
+            new_amounts)
+        return True
 
     def validate(self, data):
         """
         Дополнительная проверяет наличия и количества
         ингредиентов и тегов в рецепте.
+
+        При частичном обновлении (PATCH) теги и ингредиенты проверяются,
+        только если они переданы.
         """
+        if not self.partial or 'tags' in data:
+            self.validate_tags_data(data.get('tags', []))
+        if not self.partial or 'ingredients' in data:
+            self.validate_ingredients_data(data.get('ingredients', []))
+        return data
 
+    @staticmethod
+    def validate_tags_data(tags: List[Tag]) -> None:
+        """Проверяет наличие и уникальность тегов."""
         # Проверка на наличие тегов.
-        tags = data.get('tags', [])
         if not tags:
             raise serializers.ValidationError(
                 {'tags': 'Укажите хотя бы один тег.'})
 
-        # Проверка на наличие ингредиентов.
-        ingredients = data.get('ingredients', [])
-        if not ingredients:
-            raise serializers.ValidationError(
-                {'ingredients': 'Укажите хотя бы один ингредиент.'})
-
         # Проверка на уникальность тегов.
         tag_ids = [tag.id for tag in tags]
         if len(tag_ids) != len(set(tag_ids)):
             raise serializers.ValidationError(
                 {'tags': 'Теги не могут дублироваться.'})
 
+    @staticmethod
+    def validate_ingredients_data(ingredients: List[Dict]) -> None:
+        """Проверяет наличие, уникальность и существование ингредиентов."""
+        # Проверка на наличие ингредиентов.
+        if not ingredients:
+            raise serializers.ValidationError(
+                {'ingredients': 'Укажите хотя бы один ингредиент.'})
+
         # Проверка на уникальность ингредиентов.
         ingredient_ids = [ingredient['id'] for ingredient in ingredients]
         if len(ingredient_ids) != len(set(ingredient_ids)):
             raise serializers.ValidationError(
                 {'ingredients': 'Ингредиенты не могут дублироваться.'})
 
+        # Проверка существования всех ингредиентов одним запросом.
+        existing_ids = set(Ingredient.objects.filter(
+            id__in=ingredient_ids).values_list('id', flat=True))
+        missing_ids = [ingredient_id for ingredient_id in ingredient_ids
+                       if ingredient_id not in existing_ids]
+        if missing_ids:
+            raise serializers.ValidationError(
+                {'ingredients': f'Ингредиента с ID {missing_ids[0]} '
+                                f'не существует.'})
+
         # Дополнительная проверка ингредиентов на минимальное количество.
         if len(ingredients) < MIN_INGREDIENT_AMOUNT:
             raise ValidationError(
                 {"ingredients": f"Нужен минимум "
                                 f"{MIN_INGREDIENT_AMOUNT} ингредиент!"})
 
-        # Проверка на пустое поле тегов.
-        if not data.get('tags'):
-            raise serializers.ValidationError(
-                {'tags': 'Поле тегов не может быть пустым.'})
-
-        # Проверка на пустое поле ингредиентов.
-        if not data.get('ingredients'):
-            raise serializers.ValidationError(
-                {'ingredients': 'Поле ингредиентов не может быть пустым.'})
-
-        return data
-
     @staticmethod
     def validate_image(value: str) -> str:
         """Дополнительно проверяет наличие изображения в рецепте."""
@@ -285,3 +387,56 @@ class RecipePostSerializer(serializers.ModelSerializer):
             raise ValidationError(
                 {'image': 'Нужно изображение!'})
         return value
+
+
+class ShoppingListJobSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор для задания на генерацию PDF-списка покупок.
+
+    Attributes:
+        id (uuid, read-only): Идентификатор задания.
+        status (str): Статус задания.
+        download (str): Ссылка на готовый PDF-файл (только для
+        выполненных заданий).
+    """
+    download = SerializerMethodField()
+
+    class Meta:
+        model = ShoppingListJob
+        fields = (
+            'id',
+            'status',
+            'error',
+            'created_at',
+            'finished_at',
+            'download',
+        )
+        read_only_fields = fields
+
+    def get_download(self, job: ShoppingListJob):
+        """Возвращает ссылку на скачивание готового PDF-файла."""
+        if job.status != ShoppingListJob.DONE:
+            return None
+        return self.context.get('request').build_absolute_uri(
+            reverse('shopping_list_job_download', args=(job.pk,)))
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """
+    Сериализатор списка рецептов для массового добавления в избранное
+    или корзину и удаления из них.
+
+    Attributes:
+        recipes (list of int): Идентификаторы рецептов (повторы
+        игнорируются).
+    """
+    recipes = serializers.ListField(
+        child=IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_RECIPES_MAX_LENGTH
+    )
+
+    @staticmethod
+    def validate_recipes(value: List[int]) -> List[int]:
+        """Убирает повторы, сохраняя порядок."""
+        return list(dict.fromkeys(value))
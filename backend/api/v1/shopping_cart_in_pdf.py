@@ -1,11 +1,44 @@
-from django.db.models import Sum
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db.models import F, Q
 from django.http import HttpResponse
-from weasyprint import HTML
+from django.utils import timezone
 
-from recipes.models import RecipeEssentials, Recipe
+from core.constants.recipes import (SHOPPING_LIST_JOB_TIMEOUT,
+                                    SHOPPING_LIST_PDF_CACHE_TIMEOUT)
+from recipes.models import ShoppingListItem, ShoppingListJob
+from recipes.shopping_list import get_shopping_list_version
 
 
-def generate_shopping_list_pdf(user):
+def get_shopping_list(user):
+    """
+    Возвращает сводный список ингредиентов из рецептов в корзине
+    пользователя.
+
+    Args:
+        user (User): Пользователь, для которого собирается список покупок.
+
+    Returns:
+        QuerySet: Словари с ключами ingredient__name,
+        ingredient__measurement_unit и total_amount, отсортированные
+        по названию ингредиента.
+    """
+    get_shopping_list_version(user)
+    return ShoppingListItem.objects.filter(user=user).values(
+        'ingredient__name',
+        'ingredient__measurement_unit',
+        total_amount=F('amount')
+    ).order_by('ingredient__name')
+
+
+def get_pdf_cache_key(user_id: int, version: int) -> str:
+    """Возвращает ключ кеша PDF для версии списка покупок."""
+    return f'shopping_list_pdf:{user_id}:{version}'
+
+
+def render_shopping_list_pdf(user) -> bytes:
     """
     Генерирует PDF-список покупок на основе рецептов, находящихся в
     корзине пользователя.
@@ -14,36 +47,140 @@ def generate_shopping_list_pdf(user):
         user (User): Пользователь, для которого генерируется список покупок.
 
     Returns:
-        HttpResponse: HTTP-ответ с PDF-списком покупок в формате
-        application/pdf.
+        bytes: Содержимое PDF-файла.
     """
-    recipes_in_cart = Recipe.objects.filter(shoppingcart__user=user)
+    # WeasyPrint импортируется здесь, чтобы не загружать его в процессах
+    # и запросах, которым нужен только список без PDF.
+    from weasyprint import HTML
 
-    ingredients = RecipeEssentials.objects.filter(
-        recipe__in=recipes_in_cart
-    ).values(
-        'ingredient__name',
-        'ingredient__measurement_unit'
-    ).annotate(total_amount=Sum('amount')).order_by('ingredient__name')
+    ingredients = get_shopping_list(user)
 
     html_content = '<h1>Мой список покупок</h1><ul>'
     html_content += ''.join([
         f'<li>{ingredient["ingredient__name"]} '
         f'({ingredient["ingredient__measurement_unit"]}) - '
         f'{ingredient["total_amount"]}</li>'
-        for ingredient in ingredients.values('ingredient__name',
-                                             'ingredient__measurement_unit',
-                                             'total_amount')
+        for ingredient in ingredients
     ])
     html_content += '</ul>'
     html_content += ('<div style="position: absolute; bottom: '
                      '100px; width: 100%; text-align: center; '
                      'font-size: 24px;">Foodgram</div>')
 
-    pdf_file = HTML(string=html_content).write_pdf()
+    return HTML(string=html_content).write_pdf()
+
+
+def generate_shopping_list_pdf(user):
+    """
+    Генерирует PDF-список покупок на основе рецептов, находящихся в
+    корзине пользователя.
+
+    Готовый PDF кешируется по версии списка покупок, поэтому пока
+    корзина не меняется, повторная генерация не выполняется.
+
+    Args:
+        user (User): Пользователь, для которого генерируется список покупок.
+
+    Returns:
+        HttpResponse: HTTP-ответ с PDF-списком покупок в формате
+        application/pdf.
+    """
+    cache_key = get_pdf_cache_key(user.pk, get_shopping_list_version(user))
+    pdf_file = cache.get(cache_key)
+    if pdf_file is None:
+        pdf_file = render_shopping_list_pdf(user)
+        cache.set(cache_key, pdf_file, SHOPPING_LIST_PDF_CACHE_TIMEOUT)
 
     response = HttpResponse(pdf_file, content_type='application/pdf')
     response[
         'Content-Disposition'] = 'attachment; filename="shopping_list.pdf"'
 
     return response
+
+
+def enqueue_shopping_list_job(user):
+    """
+    Ставит в очередь задание на генерацию PDF-списка покупок.
+
+    Если у пользователя уже есть задание для текущей версии списка
+    покупок (в очереди, в работе или готовое), новое не создается.
+    Вызывается в транзакции с заблокированной строкой пользователя
+    (lock_user), иначе два одновременных запроса могут не найти
+    задание и создать два.
+
+    Args:
+        user (User): Пользователь, для которого генерируется список покупок.
+
+    Returns:
+        tuple: Задание (ShoppingListJob) и признак того, что оно создано.
+    """
+    version = get_shopping_list_version(user)
+    job = ShoppingListJob.objects.filter(user=user, version=version).exclude(
+        status=ShoppingListJob.FAILED).order_by('-created_at').first()
+    if job is not None:
+        return job, False
+    return ShoppingListJob.objects.create(user=user, version=version), True
+
+
+def claim_shopping_list_job():
+    """
+    Забирает из очереди самое старое задание и переводит его в
+    статус RUNNING.
+
+    Задания, которые дольше SHOPPING_LIST_JOB_TIMEOUT находятся в статусе
+    RUNNING (например, воркер был остановлен), забираются повторно.
+    Условное обновление по статусу и started_at гарантирует, что одно
+    задание получит только один воркер, даже без SELECT ... FOR UPDATE.
+
+    Returns:
+        ShoppingListJob | None: Задание или None, если очередь пуста.
+    """
+    stale_before = timezone.now() - timedelta(
+        seconds=SHOPPING_LIST_JOB_TIMEOUT)
+    queue = ShoppingListJob.objects.filter(
+        Q(status=ShoppingListJob.PENDING)
+        | Q(status=ShoppingListJob.RUNNING, started_at__lt=stale_before)
+    ).order_by('created_at')
+    for job in queue[:10]:
+        started_at = timezone.now()
+        claimed = ShoppingListJob.objects.filter(
+            pk=job.pk, status=job.status, started_at=job.started_at
+        ).update(status=ShoppingListJob.RUNNING, started_at=started_at)
+        if claimed:
+            job.status = ShoppingListJob.RUNNING
+            job.started_at = started_at
+            return job
+    return None
+
+
+def process_shopping_list_job(job) -> None:
+    """
+    Генерирует PDF для задания и сохраняет результат.
+
+    Если пока задание выполнялось список покупок изменился (задание
+    удалено) или задание забрал другой воркер, готовый файл удаляется.
+
+    Args:
+        job (ShoppingListJob): Задание в статусе RUNNING.
+    """
+    try:
+        pdf_file = render_shopping_list_pdf(job.user)
+    except Exception as error:
+        ShoppingListJob.objects.filter(
+            pk=job.pk, status=ShoppingListJob.RUNNING,
+            started_at=job.started_at
+        ).update(status=ShoppingListJob.FAILED, error=str(error),
+                 finished_at=timezone.now())
+        raise
+
+    job.file.save(f'{job.pk}.pdf', ContentFile(pdf_file), save=False)
+    saved = ShoppingListJob.objects.filter(
+        pk=job.pk, status=ShoppingListJob.RUNNING,
+        started_at=job.started_at
+    ).update(status=ShoppingListJob.DONE, file=job.file.name,
+             finished_at=timezone.now())
+    if not saved:
+        job.file.delete(save=False)
+        return
+    cache.set(get_pdf_cache_key(job.user_id, job.version), pdf_file,
+              SHOPPING_LIST_PDF_CACHE_TIMEOUT)
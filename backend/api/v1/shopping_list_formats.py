@@ -0,0 +1,82 @@
+import csv
+import json
+
+from django.http import StreamingHttpResponse
+
+from api.v1.shopping_cart_in_pdf import get_shopping_list
+
+
+class Echo:
+    """Псевдобуфер для csv.writer: возвращает записанную строку."""
+
+    @staticmethod
+    def write(value: str) -> str:
+        return value
+
+
+def iter_shopping_list(user):
+    """
+    Итерирует позиции списка покупок пользователя без загрузки всего
+    списка в память.
+
+    Yields:
+        tuple: Название ингредиента, единица измерения и количество.
+    """
+    for ingredient in get_shopping_list(user).iterator():
+        yield (ingredient['ingredient__name'],
+               ingredient['ingredient__measurement_unit'],
+               ingredient['total_amount'])
+
+
+def iter_txt(user):
+    yield 'Мой список покупок\n\n'
+    for name, measurement_unit, amount in iter_shopping_list(user):
+        yield f'{name} ({measurement_unit}) - {amount}\n'
+
+
+def iter_csv(user):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for row in iter_shopping_list(user):
+        yield writer.writerow(row)
+
+
+def iter_json(user):
+    separator = ''
+    yield '['
+    for name, measurement_unit, amount in iter_shopping_list(user):
+        yield separator + json.dumps(
+            {'name': name,
+             'measurement_unit': measurement_unit,
+             'amount': amount},
+            ensure_ascii=False)
+        separator = ','
+    yield ']'
+
+
+SHOPPING_LIST_FORMATS = {
+    'txt': (iter_txt, 'text/plain; charset=utf-8'),
+    'csv': (iter_csv, 'text/csv; charset=utf-8'),
+    'json': (iter_json, 'application/json'),
+}
+
+
+def stream_shopping_list(user, output_format: str) -> StreamingHttpResponse:
+    """
+    Отдает список покупок в текстовом формате потоком, напрямую из
+    запроса к сводному списку, без HTML и WeasyPrint.
+
+    Args:
+        user (User): Пользователь, для которого формируется список покупок.
+        output_format (str): Один из форматов SHOPPING_LIST_FORMATS.
+
+    Returns:
+        StreamingHttpResponse: Потоковый ответ с вложением
+        shopping_list.<format>.
+    """
+    iterator, content_type = SHOPPING_LIST_FORMATS[output_format]
+    response = StreamingHttpResponse(iterator(user),
+                                     content_type=content_type)
+    response['Content-Disposition'] = (
+        f'attachment; filename="shopping_list.{output_format}"')
+    return response
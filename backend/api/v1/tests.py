@@ -0,0 +1,720 @@
+import atexit
+import json
+import time
+from base64 import b64decode, b64encode
+from contextlib import ExitStack
+from datetime import timedelta
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from django.apps import apps
+from django.core.cache import cache
+from django.test import TestCase, modify_settings, override_settings
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.authtoken.models import Token
+from rest_framework.serializers import ModelSerializer
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.views import APIView
+
+from api.v1.serializers import RecipeReadSerializer, TagSerializer
+from api.v1.shopping_cart_in_pdf import claim_shopping_list_job
+from core import metrics
+from core.constants.recipes import (INGREDIENT_SEARCH_LIMIT,
+                                    INGREDIENT_SEARCH_MAX_LIMIT,
+                                    SHOPPING_LIST_JOB_TIMEOUT)
+from core.constants.settings import RESPONSE_CACHE_STALE_WHILE_REVALIDATE
+from core.counters import reconcile_counters
+from core.versions import VERSION_KEY_PREFIX, get_version
+from recipes import ingredient_index
+from recipes.ingredient_index import INGREDIENTS_VERSION_KEY
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeEssentials,
+                            ShoppingCart, ShoppingListItem, ShoppingListJob,
+                            Tag)
+from recipes.versions import TAGS_VERSION_KEY
+from users.models import Subscription, User
+from users.serializers import (ShortRecipeReadSerializer,
+                               UserSerializer,
+                               UserSubscriptionListSerializer)
+
+
+# Сериализаторы, которые отдают представление через Representer.
+FAST_SERIALIZERS = (TagSerializer, RecipeReadSerializer, UserSerializer,
+                    ShortRecipeReadSerializer, UserSubscriptionListSerializer)
+
+
+def drf_representation():
+    """
+    Возвращает контекст, в котором сериализаторы FAST_SERIALIZERS
+    строят представление полями DRF (ModelSerializer.to_representation).
+    """
+    stack = ExitStack()
+    for serializer_class in FAST_SERIALIZERS:
+        stack.enter_context(mock.patch.object(
+            serializer_class, 'to_representation',
+            ModelSerializer.to_representation))
+    return stack
+
+
+def get_ids(page):
+    return [recipe['id'] for recipe in page['results']]
+
+
+class KeysetPaginationTest(TestCase):
+    """Проверяет курсорную пагинацию списка рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com',
+            password='password')
+        now = timezone.now()
+        for number in range(7):
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='Описание',
+                cooking_time=10, image='recipes/images/test.png')
+            # У пар рецептов одна дата: порядок внутри пары задает id.
+            Recipe.objects.filter(pk=recipe.pk).update(
+                pub_date=now - timedelta(minutes=number // 2))
+        cls.expected = list(Recipe.objects.order_by(
+            '-pub_date', '-id').values_list('id', flat=True))
+
+    def get_page(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        page = response.json()
+        self.assertNotIn('count', page)
+        return page
+
+    def test_pages_cover_listing_once(self):
+        page = self.get_page('/api/recipes/?pagination=cursor&limit=3')
+        self.assertIsNone(page['previous'])
+        pages = [get_ids(page)]
+        while page['next']:
+            page = self.get_page(page['next'])
+            pages.append(get_ids(page))
+        self.assertEqual(pages, [self.expected[:3], self.expected[3:6],
+                                 self.expected[6:]])
+
+    def test_previous_returns_preceding_page(self):
+        first = self.get_page('/api/recipes/?pagination=cursor&limit=3')
+        second = self.get_page(first['next'])
+        third = self.get_page(second['next'])
+        self.assertIsNone(third['next'])
+        self.assertEqual(get_ids(self.get_page(third['previous'])),
+                         get_ids(second))
+        back = self.get_page(second['previous'])
+        self.assertEqual(get_ids(back), get_ids(first))
+        self.assertIsNone(back['previous'])
+
+    def test_cursor_holds_last_position(self):
+        page = self.get_page('/api/recipes/?pagination=cursor&limit=3')
+        cursor = page['next'].split('cursor=')[1].split('&')[0]
+        data = json.loads(b64decode(cursor.replace('%3D', '=')))
+        last = Recipe.objects.get(pk=self.expected[2])
+        self.assertEqual(data['r'], 0)
+        self.assertEqual(data['p'][1], str(last.pk))
+
+    def test_invalid_cursor(self):
+        wrong_length = b64encode(json.dumps(
+            {'p': ['2020-01-01T00:00:00Z'], 'r': 0}).encode()).decode()
+        for cursor in ('garbage', wrong_length):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(
+                    '/api/recipes/', {'pagination': 'cursor',
+                                      'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+
+    def test_page_numbers_by_default(self):
+        response = self.client.get('/api/recipes/?limit=3')
+        self.assertEqual(response.json()['count'], len(self.expected))
+
+
+class ShoppingListFormatsTest(TestCase):
+    """Проверяет выбор формата списка покупок и потоковые ответы."""
+
+    path = '/api/recipes/download_shopping_cart/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='user', email='user@example.com', password='password')
+        salt = Ingredient.objects.create(name='соль', measurement_unit='г')
+        flour = Ingredient.objects.create(name='мука, пшеничная',
+                                          measurement_unit='г')
+        for amounts in ((5, 100), (3, None)):
+            recipe = Recipe.objects.create(
+                author=cls.user, name='Рецепт', text='Описание',
+                cooking_time=10, image='recipes/images/test.png')
+            for ingredient, amount in zip((salt, flour), amounts):
+                if amount is not None:
+                    RecipeEssentials.objects.create(
+                        recipe=recipe, ingredient=ingredient, amount=amount)
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def download(self, output_format=None, accept=None):
+        params = {'format': output_format} if output_format else {}
+        headers = {'HTTP_ACCEPT': accept} if accept else {}
+        response = self.client.get(self.path, params, **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_txt(self):
+        response, content = self.download('txt')
+        self.assertEqual(response['Content-Type'],
+                         'text/plain; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'],
+                         'attachment; filename="shopping_list.txt"')
+        self.assertEqual(content, 'Мой список покупок\n\n'
+                                  'мука, пшеничная (г) - 100\n'
+                                  'соль (г) - 8\n')
+
+    def test_csv_by_accept_header(self):
+        response, content = self.download(accept='text/csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(content.splitlines(), [
+            'name,measurement_unit,amount',
+            '"мука, пшеничная",г,100',
+            'соль,г,8',
+        ])
+
+    def test_json(self):
+        response, content = self.download('json')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(content), [
+            {'name': 'мука, пшеничная', 'measurement_unit': 'г',
+             'amount': 100},
+            {'name': 'соль', 'measurement_unit': 'г', 'amount': 8},
+        ])
+
+    def test_empty_list_is_valid_json(self):
+        ShoppingCart.objects.filter(user=self.user).delete()
+        _, content = self.download('json')
+        self.assertEqual(json.loads(content), [])
+
+    def test_errors_are_json(self):
+        response = self.client.get(self.path, HTTP_ACCEPT='image/png')
+        self.assertEqual(response.status_code, 406)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        response = APIClient().get(self.path, {'format': 'csv'})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+
+class ConditionalGetTest(TestCase):
+    """Проверяет ETag, Last-Modified и ответы 304."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='user', email='user@example.com', password='password')
+        cls.recipe = Recipe.objects.create(
+            author=cls.user, name='Рецепт', text='Описание',
+            cooking_time=10, image='recipes/images/test.png')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.authenticated = APIClient()
+        self.authenticated.credentials(
+            HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def assert_not_modified(self, client, path, **headers):
+        response = client.get(path, **headers)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    @mock.patch('api.v1.conditional.time', lambda: time.time() + 1)
+    def test_validators_and_not_modified(self):
+        for path in ('/api/tags/', '/api/ingredients/', '/api/recipes/',
+                     f'/api/recipes/{self.recipe.pk}/'):
+            for client in (self.client, self.authenticated):
+                with self.subTest(path=path, client=client):
+                    response = client.get(path)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertIn('no-cache', response['Cache-Control'])
+                    self.assertIn('Authorization', response['Vary'])
+                    self.assert_not_modified(
+                        client, path, HTTP_IF_NONE_MATCH=response['ETag'])
+                    self.assert_not_modified(
+                        client, path,
+                        HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+
+    def test_last_modified_is_rounded_up(self):
+        stamp = 1_600_000_000
+        cache.set(f'{VERSION_KEY_PREFIX}:{TAGS_VERSION_KEY}',
+                  stamp * 10 ** 9 + 500_000_000, timeout=None)
+        response = self.client.get('/api/tags/')
+        self.assertEqual(response['Last-Modified'], http_date(stamp + 1))
+        response = self.client.get(
+            '/api/tags/', HTTP_IF_MODIFIED_SINCE=http_date(stamp))
+        self.assertEqual(response.status_code, 200)
+
+    def test_last_modified_of_current_second_is_omitted(self):
+        response = self.authenticated.get('/api/tags/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+
+    def test_write_changes_etag(self):
+        etag = self.authenticated.get('/api/tags/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Завтрак', color='#E26C2D',
+                               slug='breakfast')
+        response = self.authenticated.get('/api/tags/',
+                                          HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()), 1)
+
+    def test_recipe_change_changes_detail_etag(self):
+        path = f'/api/recipes/{self.recipe.pk}/'
+        etag = self.authenticated.get(path)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.name = 'Новое название'
+            self.recipe.save()
+        response = self.authenticated.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['name'], 'Новое название')
+
+    def test_user_flags_change_etag(self):
+        path = f'/api/recipes/{self.recipe.pk}/'
+        anonymous = self.client.get(path)['ETag']
+        etag = self.authenticated.get(path)['ETag']
+        self.assertNotEqual(anonymous, etag)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.authenticated.post(f'{path}favorite/')
+        response = self.authenticated.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['is_favorited'])
+
+    def test_missing_recipe(self):
+        response = self.client.get('/api/recipes/0/',
+                                   HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 404)
+
+
+def run_now(func, *args, **kwargs):
+    func(*args, **kwargs)
+
+
+class AnonymousResponseCacheTest(TestCase):
+    """Проверяет кеш ответов анонимным пользователям."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='user', email='user@example.com', password='password')
+        cls.recipe = Recipe.objects.create(
+            author=cls.user, name='Рецепт', text='Описание',
+            cooking_time=10, image='recipes/images/test.png')
+        cls.token = Token.objects.create(user=cls.user)
+        cls.path = f'/api/recipes/{cls.recipe.pk}/'
+
+    def setUp(self):
+        cache.clear()
+
+    def rename_recipe(self, name):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.name = name
+            self.recipe.save()
+
+    def test_miss_then_hit(self):
+        first = self.client.get(self.path)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        second = self.client.get(self.path)
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second['Content-Type'], first['Content-Type'])
+
+    def test_query_string_is_normalized(self):
+        self.client.get('/api/recipes/?limit=6&page=1&tags=')
+        response = self.client.get('/api/recipes/?page=1&limit=6')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        response = self.client.get('/api/recipes/?page=1&limit=5')
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_authorized_requests_bypass_cache(self):
+        self.client.get(self.path)
+        response = self.client.get(
+            self.path, HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Cache', response)
+
+    def test_stale_while_revalidate(self):
+        self.client.get(self.path)
+        self.rename_recipe('Новое название')
+        with mock.patch('api.v1.response_cache.run_in_background',
+                        run_now):
+            response = self.client.get(self.path)
+        self.assertEqual(response['X-Cache'], 'STALE')
+        self.assertEqual(response.json()['name'], 'Рецепт')
+        response = self.client.get(self.path)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.json()['name'], 'Новое название')
+
+    def test_stale_entry_expires(self):
+        self.client.get(self.path)
+        self.rename_recipe('Новое название')
+        later = time.time() + RESPONSE_CACHE_STALE_WHILE_REVALIDATE + 1
+        with mock.patch('api.v1.response_cache.time.time',
+                        return_value=later):
+            response = self.client.get(self.path)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['name'], 'Новое название')
+
+
+class MetricsTest(TestCase):
+    """Проверяет сбор метрик и их вывод в формате Prometheus."""
+
+    def setUp(self):
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        settings = override_settings(METRICS_DIR=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # Новый файл процесса в METRICS_DIR теста.
+        metrics._state['pid'] = None
+        self.addCleanup(metrics._state.update, pid=None)
+
+    def test_exposition_format(self):
+        for duration in (0.02, 0.2):
+            metrics.observe('recipes', 'GET', 200, {
+                'http_request_duration_seconds': duration,
+                'http_request_db_queries': 3,
+            })
+        metrics.flush()
+        lines = metrics.render(metrics.collect()).splitlines()
+        self.assertIn('# TYPE tastyverse_http_requests_total counter',
+                      lines)
+        self.assertIn('tastyverse_http_requests_total'
+                      '{view="recipes",method="GET",status="200"} 2', lines)
+        self.assertIn(
+            '# TYPE tastyverse_http_request_duration_seconds histogram',
+            lines)
+        for bound, count in (('0.01', 0), ('0.025', 1), ('0.25', 2),
+                             ('+Inf', 2)):
+            self.assertIn('tastyverse_http_request_duration_seconds_bucket'
+                          f'{{view="recipes",method="GET",le="{bound}"}} '
+                          f'{count}', lines)
+        self.assertIn('tastyverse_http_request_duration_seconds_count'
+                      '{view="recipes",method="GET"} 2', lines)
+        self.assertIn('tastyverse_http_request_db_queries_sum'
+                      '{view="recipes",method="GET"} 6', lines)
+
+    def test_label_values_are_escaped(self):
+        metrics.observe('a"b\\c', 'GET', 200, {})
+        metrics.flush()
+        self.assertIn('view="a\\"b\\\\c"',
+                      metrics.render(metrics.collect()))
+
+    def test_collect_sums_process_files(self):
+        metrics.observe('tags', 'GET', 200,
+                        {'http_response_size_bytes': 50})
+        metrics.flush()
+        (self.directory / 'metrics-1-1.json').write_text(json.dumps({
+            'requests': [['tags', 'GET', '200', 4]],
+            'histograms': [['http_response_size_bytes', 'tags', 'GET', {
+                'buckets': [1, 0, 0, 0, 0, 0, 0], 'sum': 10,
+                'count': 1}]],
+        }))
+        collected = metrics.collect()
+        self.assertEqual(collected['requests'][('tags', 'GET', '200')], 5)
+        histogram = collected['histograms'][
+            ('http_response_size_bytes', 'tags', 'GET')]
+        self.assertEqual(histogram['count'], 2)
+        self.assertEqual(histogram['sum'], 60)
+        self.assertEqual(histogram['buckets'][0], 2)
+
+    def test_retired_processes_are_folded(self):
+        metrics.observe('tags', 'GET', 200, {})
+        metrics.flush()
+        for pid in (1, 2):
+            (self.directory / f'metrics-{pid}-1.json').write_text(
+                json.dumps({'requests': [['tags', 'GET', '200', pid]],
+                            'histograms': []}))
+        expected = metrics.collect()
+        metrics.retire_processes([1])
+        metrics.retire_processes([2])
+        self.assertEqual(metrics.collect(), expected)
+        self.assertEqual(expected['requests'][('tags', 'GET', '200')], 4)
+        self.assertEqual(
+            sorted(path.name for path in self.directory.glob('*.json')),
+            [metrics._state['path'].name, metrics.RETIRED_FILE])
+
+    @modify_settings(MIDDLEWARE={'prepend': 'core.metrics.MetricsMiddleware'})
+    def test_middleware_records_requests(self):
+        self.addCleanup(atexit.unregister, metrics.flush)
+        self.client.get('/api/tags/')
+        self.client.get('/api/missing/')
+        metrics.flush()
+        requests = metrics.collect()['requests']
+        self.assertEqual(requests[('tags', 'GET', '200')], 1)
+        self.assertEqual(
+            requests[(metrics.UNRESOLVED_VIEW, 'GET', '404')], 1)
+
+
+class RepresentationParityTest(TestCase):
+    """
+    Проверяет, что Representer (api.v1.representations) отдает то же,
+    что поля DRF сериализаторов, анонимно и от имени пользователя.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Reader', last_name='User', password='password')
+        authors = [
+            User.objects.create_user(
+                username=f'author{number}', email=f'author{number}@x.com',
+                first_name='Author', last_name=str(number),
+                password='password')
+            for number in range(3)
+        ]
+        tags = [Tag.objects.create(name=f'Тег {number}',
+                                   color=f'#E26C2{number}',
+                                   slug=f'tag-{number}')
+                for number in range(2)]
+        ingredients = [
+            Ingredient.objects.create(name=f'ингредиент {number}',
+                                      measurement_unit='г')
+            for number in range(3)
+        ]
+        cls.recipes = []
+        for number in range(6):
+            recipe = Recipe.objects.create(
+                author=authors[number % len(authors)],
+                name=f'Рецепт {number}', text='Описание',
+                cooking_time=10 + number,
+                image=f'recipes/images/{number}.png')
+            recipe.tags.set(tags[:number % 2 + 1])
+            RecipeEssentials.objects.bulk_create(
+                RecipeEssentials(recipe=recipe, ingredient=ingredient,
+                                 amount=100 + number)
+                for ingredient in ingredients[:number % 3 + 1])
+            cls.recipes.append(recipe)
+        processed = cls.recipes[0]
+        processed.image_width, processed.image_height = 64, 48
+        processed.image_placeholder = 'data:image/webp;base64,AAAA'
+        processed.image_variants = {
+            'small': {'webp': 'recipes/images/0-small.webp',
+                      'jpeg': 'recipes/images/0-small.jpg'}}
+        processed.save()
+        Favorite.objects.create(user=cls.user, recipe=cls.recipes[0])
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.recipes[1])
+        Subscription.objects.bulk_create(
+            Subscription(subscriber=cls.user, target_user=author)
+            for author in authors[:2])
+        reconcile_counters(apps)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.anonymous = APIClient()
+        self.authenticated = APIClient()
+        self.authenticated.credentials(
+            HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def get_both(self, client, path):
+        """Возвращает ответы быстрого пути и полей DRF."""
+        fast = client.get(path)
+        cache.clear()
+        with drf_representation():
+            slow = client.get(path)
+        cache.clear()
+        self.assertEqual(fast.status_code, 200, path)
+        self.assertEqual(slow.status_code, 200, path)
+        return fast.json(), slow.json()
+
+    def assert_parity(self, path, clients=('anonymous', 'authenticated')):
+        for name in clients:
+            with self.subTest(path=path, client=name):
+                fast, slow = self.get_both(getattr(self, name), path)
+                self.assertEqual(fast, slow)
+
+    def test_tags(self):
+        self.assert_parity('/api/tags/')
+        self.assert_parity(f'/api/tags/{self.recipes[0].tags.first().pk}/')
+
+    def test_recipe_list(self):
+        self.assert_parity('/api/recipes/')
+        self.assert_parity('/api/recipes/?pagination=cursor')
+
+    def test_recipe_detail(self):
+        for recipe in self.recipes[:2]:
+            self.assert_parity(f'/api/recipes/{recipe.pk}/')
+
+    def test_user_flags(self):
+        favorited, in_cart = (
+            self.get_both(self.authenticated, f'/api/recipes/{recipe.pk}/')
+            for recipe in self.recipes[:2])
+        for fast, slow in (favorited, in_cart):
+            self.assertEqual(fast, slow)
+        self.assertTrue(favorited[0]['is_favorited'])
+        self.assertTrue(favorited[0]['author']['is_subscribed'])
+        self.assertTrue(in_cart[0]['is_in_shopping_cart'])
+
+    def test_subscriptions(self):
+        self.assert_parity('/api/users/subscriptions/',
+                           clients=('authenticated',))
+        self.assert_parity('/api/users/subscriptions/?recipes_limit=1',
+                           clients=('authenticated',))
+
+    def test_short_recipe(self):
+        for user in (None, self.user):
+            request = APIView().initialize_request(
+                APIRequestFactory().get('/api/recipes/'))
+            if user is not None:
+                request.user = user
+            for recipe in self.recipes[:2]:
+                with self.subTest(user=user, recipe=recipe.pk):
+                    context = {'request': request}
+                    fast = ShortRecipeReadSerializer(
+                        recipe, context=context).data
+                    with drf_representation():
+                        slow = ShortRecipeReadSerializer(
+                            recipe, context=context).data
+                    self.assertEqual(fast, slow)
+
+
+class MembershipCountersTest(TestCase):
+    """Проверяет счетчики избранного и корзины при повторных изменениях."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='user', email='user@example.com', password='password')
+        ingredient = Ingredient.objects.create(name='соль',
+                                               measurement_unit='г')
+        cls.recipes = []
+        for number in range(2):
+            recipe = Recipe.objects.create(
+                author=cls.user, name=f'Рецепт {number}', text='Описание',
+                cooking_time=10, image='recipes/images/test.png')
+            RecipeEssentials.objects.create(recipe=recipe,
+                                            ingredient=ingredient, amount=5)
+            cls.recipes.append(recipe)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_bulk_add_counts_only_new_rows(self):
+        first, second = (recipe.pk for recipe in self.recipes)
+        self.client.post(f'/api/recipes/{first}/shopping_cart/')
+        response = self.client.post('/api/recipes/shopping_cart/',
+                                    {'recipes': [first, second]},
+                                    format='json')
+        self.assertEqual(response.json()['added'], [second])
+        self.assertEqual(
+            list(Recipe.objects.filter(pk__in=(first, second)).order_by(
+                'pk').values_list('carts_count', flat=True)), [1, 1])
+        self.assertEqual(
+            list(ShoppingListItem.objects.filter(
+                user=self.user).values_list('amount', flat=True)), [10])
+
+    def test_repeated_delete_changes_counters_once(self):
+        recipe = self.recipes[0]
+        for kind in ('favorite', 'shopping_cart'):
+            path = f'/api/recipes/{recipe.pk}/{kind}/'
+            self.client.post(path)
+            self.assertEqual(self.client.delete(path).status_code, 204)
+            self.assertEqual(self.client.delete(path).status_code, 404)
+        recipe.refresh_from_db()
+        self.assertEqual((recipe.favorites_count, recipe.carts_count),
+                         (0, 0))
+        self.assertFalse(ShoppingListItem.objects.filter(
+            user=self.user).exists())
+
+
+class ShoppingListJobQueueTest(TestCase):
+    """Проверяет постановку заданий в очередь и их выдачу воркерам."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='user', email='user@example.com', password='password')
+
+    def create_job(self, started_ago):
+        return ShoppingListJob.objects.create(
+            user=self.user, version=1, status=ShoppingListJob.RUNNING,
+            started_at=timezone.now() - timedelta(seconds=started_ago))
+
+    def test_enqueue_locks_user(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        path = '/api/recipes/download_shopping_cart/jobs/'
+        with mock.patch('api.v1.views.lock_user') as lock:
+            first = client.post(path)
+            second = client.post(path)
+        self.assertEqual(lock.call_count, 2)
+        self.assertEqual(first.status_code, 202)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()['id'], first.json()['id'])
+        self.assertEqual(ShoppingListJob.objects.count(), 1)
+
+    def test_running_job_is_not_claimed(self):
+        self.create_job(started_ago=1)
+        self.assertIsNone(claim_shopping_list_job())
+
+    def test_stale_job_is_claimed_once(self):
+        stale = self.create_job(started_ago=SHOPPING_LIST_JOB_TIMEOUT + 1)
+        job = claim_shopping_list_job()
+        self.assertEqual(job.pk, stale.pk)
+        self.assertEqual(job.status, ShoppingListJob.RUNNING)
+        self.assertGreater(job.started_at, stale.started_at)
+        self.assertIsNone(claim_shopping_list_job())
+
+
+class IngredientSearchTest(TestCase):
+    """Проверяет ограничение количества результатов поиска ингредиентов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'соль {number:03}', measurement_unit='г')
+            for number in range(INGREDIENT_SEARCH_MAX_LIMIT + 1))
+
+    def setUp(self):
+        cache.clear()
+        ingredient_index._index = ingredient_index._index_version = None
+        ingredient_index._rebuilding = False
+
+    def search(self, query):
+        response = self.client.get(f'/api/ingredients/?name=соль{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_default_limit(self):
+        self.assertEqual(len(self.search('')), INGREDIENT_SEARCH_LIMIT)
+        self.assertEqual(len(self.search('&limit=-1')),
+                         INGREDIENT_SEARCH_LIMIT)
+
+    def test_limit_is_capped(self):
+        self.assertEqual(len(self.search('&limit=5')), 5)
+        self.assertEqual(len(self.search('&limit=100000')),
+                         INGREDIENT_SEARCH_MAX_LIMIT)
+
+    def find_names(self, name):
+        response = self.client.get('/api/ingredients/', {'name': name})
+        return [ingredient['name'] for ingredient in response.json()]
+
+    def test_prefix_search_until_index_is_built(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(self.find_names('соль 01'),
+                             [f'соль {number:03}' for number in range(10, 20)])
+            self.assertEqual(self.find_names('015'), [])
+        self.assertEqual(len(callbacks), 1)
+        ingredient_index.rebuild_ingredient_index(
+            get_version(INGREDIENTS_VERSION_KEY))
+        self.assertEqual(self.find_names('015'), ['соль 015'])
@@ -3,8 +3,12 @@ from rest_framework.routers import DefaultRouter
 
 from api.v1.views import (TagsAPIView, RecipesAPIView, IngredientsAPIView,
                           FavoritesAPIView, ShoppingCartAPIView,
+                          BulkFavoritesAPIView, BulkShoppingCartAPIView,
                           RecipesDetailAPIView, IngredientsDetailAPIView,
-                          DownloadShoppingCart)
+                          FeedAPIView,
+                          DownloadShoppingCart, ShoppingListJobsAPIView,
+                          ShoppingListJobDetailAPIView,
+                          ShoppingListJobDownloadAPIView)
 from users.views import CustomUserViewSet
 
 router = DefaultRouter()
@@ -22,6 +26,8 @@ urlpatterns = [
          TagsAPIView.as_view(), name='tags-detail'),
     path('recipes/',
          RecipesAPIView.as_view(), name='recipes'),
+    path('recipes/feed/',
+         FeedAPIView.as_view(), name='feed'),
     path('recipes/<int:pk>/',
          RecipesDetailAPIView.as_view(), name='recipe-detail'),
     path('ingredients/',
@@ -32,6 +38,17 @@ urlpatterns = [
          FavoritesAPIView.as_view(), name='favorite'),
     path('recipes/<int:pk>/shopping_cart/',
          ShoppingCartAPIView.as_view(), name='shopping_cart'),
+    path('recipes/favorite/',
+         BulkFavoritesAPIView.as_view(), name='favorite-bulk'),
+    path('recipes/shopping_cart/',
+         BulkShoppingCartAPIView.as_view(), name='shopping_cart-bulk'),
     path('recipes/download_shopping_cart/',
          DownloadShoppingCart.as_view(), name='download_shopping_cart'),
+    path('recipes/download_shopping_cart/jobs/',
+         ShoppingListJobsAPIView.as_view(), name='shopping_list_jobs'),
+    path('recipes/download_shopping_cart/jobs/<uuid:pk>/',
+         ShoppingListJobDetailAPIView.as_view(), name='shopping_list_job'),
+    path('recipes/download_shopping_cart/jobs/<uuid:pk>/download/',
+         ShoppingListJobDownloadAPIView.as_view(),
+         name='shopping_list_job_download'),
 ]
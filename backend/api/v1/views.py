@@ -1,26 +1,62 @@
 from typing import Any
 
+from django.db import transaction
 from django.db.utils import IntegrityError
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status
 from rest_framework.generics import ListAPIView, RetrieveAPIView
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from api.v1.conditional import (conditional_get, ingredient_keys,
+                                recipe_detail_keys, recipe_list_keys,
+                                tag_keys)
 from api.v1.filters import IngredientFilter, RecipeFilter
 from api.v1.permissions import IsAuthorOrAdminOrAuthenticatedOrReadOnly
-from api.v1.serializers import (IngredientSerializer, RecipePostSerializer,
-                                RecipeReadSerializer, TagSerializer)
-from api.v1.shopping_cart_in_pdf import generate_shopping_list_pdf
-from core.pagination import CustomPagination
+from api.v1.renderers import CSVRenderer, PDFRenderer, PlainTextRenderer
+from api.v1.response_cache import AnonymousResponseCacheMixin
+from api.v1.serializers import (IngredientSerializer, RecipeIdsSerializer,
+                                RecipePostSerializer, RecipeReadSerializer,
+                                ShoppingListJobSerializer, TagSerializer)
+from api.v1.shopping_cart_in_pdf import (enqueue_shopping_list_job,
+                                         generate_shopping_list_pdf)
+from api.v1.shopping_list_formats import (SHOPPING_LIST_FORMATS,
+                                          stream_shopping_list)
+from core.background import run_in_background
+from core.constants.recipes import (INGREDIENT_SEARCH_LIMIT,
+                                    INGREDIENT_SEARCH_MAX_LIMIT)
+from core.counters import change_counter, change_counters
+from core.pagination import (CustomPagination, KeysetPagination,
+                             MergedKeysetPagination)
+from recipes.feed import fan_out_recipe, get_feed_sources
+from recipes.ingredient_index import get_ingredient_index
+from recipes.membership import FAVORITES, SHOPPING_CART, update_membership
 from recipes.models import (Favorite, Ingredient, Recipe,
-                            ShoppingCart, Tag)
+                            ShoppingCart, ShoppingListJob, Tag)
+from recipes.shopping_list import (add_recipes_to_shopping_list,
+                                   remove_recipes_from_shopping_list)
+from users.models import User
 from users.serializers import ShortRecipeReadSerializer
 
 
+def lock_user(user) -> None:
+    """
+    Блокирует строку пользователя до конца транзакции.
+
+    Изменения избранного и корзины одного пользователя выполняются по
+    очереди, поэтому состояние, прочитанное после блокировки, остается
+    верным до конца транзакции, и счетчики и список покупок не
+    изменяются дважды.
+    """
+    list(User.objects.select_for_update().filter(
+        pk=user.pk).values_list('pk', flat=True))
+
+
 class TagsAPIView(APIView):
     """
     API endpoint для работы с тегами рецептов.
@@ -37,8 +73,8 @@ class TagsAPIView(APIView):
     """
     permission_classes = (AllowAny,)
 
-    @staticmethod
-    def get(request: Any, pk: Any = None) -> Response:
+    @method_decorator(conditional_get(tag_keys))
+    def get(self, request: Any, pk: Any = None) -> Response:
         if pk is None:
             queryset = Tag.objects.all()
             serializer = TagSerializer(queryset, many=True)
@@ -48,12 +84,13 @@ class TagsAPIView(APIView):
         return Response(serializer.data)
 
 
-class RecipesAPIView(APIView):
+class RecipesAPIView(AnonymousResponseCacheMixin, APIView):
     """
     API endpoint для работы с рецептами.
 
     GET:
-        Получение списка рецептов с возможностью фильтрации.
+        Получение списка рецептов с возможностью фильтрации. Ответы
+        анонимным пользователям кешируются (AnonymousResponseCacheMixin).
 
     POST:
         Создание нового рецепта.
@@ -68,17 +105,32 @@ class RecipesAPIView(APIView):
     """
     permission_classes = (IsAuthorOrAdminOrAuthenticatedOrReadOnly,)
     pagination_class = CustomPagination
+    cursor_pagination_class = KeysetPagination
     filter_backends = (DjangoFilterBackend,)
 
+    def get_paginator(self, request):
+        """
+        Возвращает курсорную пагинацию, если она запрошена параметром
+        `pagination=cursor`, иначе постраничную (page/limit).
+
+        Результаты поиска (`search`) упорядочены по релевантности, а не
+        по ключу курсора, поэтому для них пагинация всегда постраничная.
+        """
+        if (self.cursor_pagination_class.is_requested(request)
+                and not request.query_params.get('search', '').strip()):
+            return self.cursor_pagination_class()
+        return self.pagination_class()
+
     def perform_create(self, serializer, **kwargs: Any) -> None:
         serializer.save(author=self.request.user)
 
+    @method_decorator(conditional_get(recipe_list_keys))
     def get(self, request) -> Response:
-        queryset = Recipe.objects.select_related('author')
+        queryset = Recipe.objects.with_related_data()
         filterset = RecipeFilter(request.query_params, queryset=queryset,
                                  request=request)
         queryset = filterset.qs
-        paginator = self.pagination_class()
+        paginator = self.get_paginator(request)
         queryset = paginator.paginate_queryset(queryset, request)
         serializer_class = RecipeReadSerializer
         serializer = serializer_class(queryset, many=True,
@@ -90,16 +142,46 @@ class RecipesAPIView(APIView):
         serializer = RecipePostSerializer(data=request.data,
                                           context={'request': request})
         serializer.is_valid(raise_exception=True)
-        serializer.save(author=request.user)
+        recipe = serializer.save(author=request.user)
+        run_in_background(fan_out_recipe, recipe.pk)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
-class RecipesDetailAPIView(APIView):
+class FeedAPIView(APIView):
+    """
+    API endpoint ленты подписок.
+
+    GET:
+        Получение рецептов авторов, на которых подписан пользователь,
+        от новых к старым. Новые рецепты раскладываются по лентам
+        подписчиков в фоне (recipes.feed), рецепты авторов с очень
+        большим числом подписчиков читаются напрямую. Пагинация
+        курсорная, параметры `cursor` и `limit`.
+
+    Returns:
+        Response: JSON-сериализованная страница ленты со ссылками
+        next/previous.
+    """
+    permission_classes = (IsAuthenticated,)
+    pagination_class = MergedKeysetPagination
+
+    def get(self, request) -> Response:
+        paginator = self.pagination_class()
+        recipes = paginator.paginate_sources(
+            get_feed_sources(request.user),
+            Recipe.objects.with_related_data(), request)
+        serializer = RecipeReadSerializer(recipes, many=True,
+                                          context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
+
+
+class RecipesDetailAPIView(AnonymousResponseCacheMixin, APIView):
     """
     API endpoint для работы с конкретным рецептом.
 
     GET:
-        Получение информации о конкретном рецепте.
+        Получение информации о конкретном рецепте. Ответы анонимным
+        пользователям кешируются (AnonymousResponseCacheMixin).
 
     DELETE:
         Удаление конкретного рецепта.
@@ -116,9 +198,10 @@ class RecipesDetailAPIView(APIView):
     """
     permission_classes = (IsAuthorOrAdminOrAuthenticatedOrReadOnly,)
 
-    @staticmethod
-    def get(request: Any, pk: Any) -> Response:
-        queryset = get_object_or_404(Recipe, id=pk)
+    @method_decorator(conditional_get(recipe_detail_keys))
+    def get(self, request: Any, pk: Any) -> Response:
+        queryset = get_object_or_404(
+            Recipe.objects.with_related_data(), id=pk)
         serializer_class = RecipeReadSerializer
         serializer = serializer_class(queryset,
                                       context={'request': request})
@@ -127,7 +210,9 @@ class RecipesDetailAPIView(APIView):
     def delete(self, request: Any, pk: Any) -> Response:
         recipe = get_object_or_404(Recipe, id=pk)
         self.check_object_permissions(request, recipe)
-        recipe.delete()
+        with transaction.atomic():
+            recipe.delete()
+            change_counter(User, recipe.author_id, 'recipes_count', -1)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     def patch(self, request, pk: Any) -> Response:
@@ -171,7 +256,11 @@ class FavoritesAPIView(APIView):
     def add_recipe(model, user: Any, pk: Any) -> Response:
         try:
             recipe = get_object_or_404(Recipe, id=pk)
-            model.objects.create(user=user, recipe=recipe)
+            with transaction.atomic():
+                lock_user(user)
+                model.objects.create(user=user, recipe=recipe)
+                change_counter(Recipe, recipe.pk, 'favorites_count', 1)
+                update_membership(user, FAVORITES, added=[recipe.pk])
             serializer = ShortRecipeReadSerializer(recipe)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         except IntegrityError:
@@ -180,13 +269,17 @@ class FavoritesAPIView(APIView):
 
     @staticmethod
     def delete_recipe(model, user: Any, pk: Any) -> Response:
-        try:
-            obj = model.objects.get(user=user, recipe__id=pk)
-            obj.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        except model.DoesNotExist:
+        with transaction.atomic():
+            lock_user(user)
+            deleted, _ = model.objects.filter(user=user,
+                                              recipe_id=pk).delete()
+            if deleted:
+                change_counter(Recipe, pk, 'favorites_count', -1)
+                update_membership(user, FAVORITES, removed=[pk])
+        if not deleted:
             return Response({'errors': 'Такого рецепта нет в избранном!'},
                             status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class ShoppingCartAPIView(APIView):
@@ -216,7 +309,12 @@ class ShoppingCartAPIView(APIView):
     def add_recipe(model, user: Any, pk: Any) -> Response:
         try:
             recipe = get_object_or_404(Recipe, id=pk)
-            model.objects.create(user=user, recipe=recipe)
+            with transaction.atomic():
+                lock_user(user)
+                model.objects.create(user=user, recipe=recipe)
+                change_counter(Recipe, recipe.pk, 'carts_count', 1)
+                add_recipes_to_shopping_list(user, [recipe.pk])
+                update_membership(user, SHOPPING_CART, added=[recipe.pk])
             serializer = ShortRecipeReadSerializer(recipe)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         except IntegrityError:
@@ -225,34 +323,243 @@ class ShoppingCartAPIView(APIView):
 
     @staticmethod
     def delete_recipe(model, user: Any, pk: Any) -> Response:
-        try:
-            recipe = model.objects.get(user=user, recipe__id=pk)
-            recipe.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        except model.DoesNotExist:
+        with transaction.atomic():
+            lock_user(user)
+            deleted, _ = model.objects.filter(user=user,
+                                              recipe_id=pk).delete()
+            if deleted:
+                change_counter(Recipe, pk, 'carts_count', -1)
+                remove_recipes_from_shopping_list(user, [pk])
+                update_membership(user, SHOPPING_CART, removed=[pk])
+        if not deleted:
             return Response({'errors': 'Такого рецепта нет в корзине!'},
                             status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class BulkFavoritesAPIView(APIView):
+    """
+    API endpoint для массового добавления рецептов в избранное и
+    удаления из него.
+
+    POST:
+        Добавление рецептов в избранное. Тело запроса:
+        {"recipes": [id, ...]}. Рецепты добавляются одним INSERT,
+        конфликты (рецепт уже в избранном) игнорируются.
+
+    DELETE:
+        Удаление рецептов из избранного одним DELETE.
+
+    Returns:
+        Response: Идентификаторы добавленных (added) или удаленных
+        (removed) рецептов, рецептов без изменений (unchanged) и
+        несуществующих рецептов (not_found).
+    """
+    model = Favorite
+    membership_kind = FAVORITES
+    counter_field = 'favorites_count'
+
+    def post(self, request) -> Response:
+        recipe_ids = self.get_recipe_ids(request)
+        user = request.user
+        with transaction.atomic():
+            lock_user(user)
+            found = set(Recipe.objects.filter(
+                id__in=recipe_ids).values_list('id', flat=True))
+            existing = set(self.model.objects.filter(
+                user=user, recipe_id__in=found
+            ).values_list('recipe_id', flat=True))
+            added = [pk for pk in recipe_ids
+                     if pk in found and pk not in existing]
+            self.model.objects.bulk_create(
+                [self.model(user=user, recipe_id=pk) for pk in added],
+                ignore_conflicts=True
+            )
+            change_counters(Recipe, added, self.counter_field, 1)
+            self.on_added(user, added)
+            update_membership(user, self.membership_kind, added=added)
+        return Response({
+            'added': added,
+            'unchanged': [pk for pk in recipe_ids if pk in existing],
+            'not_found': [pk for pk in recipe_ids if pk not in found],
+        })
+
+    def delete(self, request) -> Response:
+        recipe_ids = self.get_recipe_ids(request)
+        user = request.user
+        with transaction.atomic():
+            lock_user(user)
+            existing = set(self.model.objects.filter(
+                user=user, recipe_id__in=recipe_ids
+            ).values_list('recipe_id', flat=True))
+            removed = [pk for pk in recipe_ids if pk in existing]
+            if removed:
+                self.model.objects.filter(
+                    user=user, recipe_id__in=removed).delete()
+            change_counters(Recipe, removed, self.counter_field, -1)
+            self.on_removed(user, removed)
+            update_membership(user, self.membership_kind, removed=removed)
+        return Response({
+            'removed': removed,
+            'not_found': [pk for pk in recipe_ids if pk not in existing],
+        })
+
+    @staticmethod
+    def get_recipe_ids(request) -> list:
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data['recipes']
+
+    def on_added(self, user: Any, recipe_ids: list) -> None:
+        """Дополнительные действия после добавления рецептов."""
+
+    def on_removed(self, user: Any, recipe_ids: list) -> None:
+        """Дополнительные действия после удаления рецептов."""
+
+
+class BulkShoppingCartAPIView(BulkFavoritesAPIView):
+    """
+    API endpoint для массового добавления рецептов в корзину и удаления
+    из нее.
+
+    POST:
+        Добавление рецептов в корзину. Тело запроса:
+        {"recipes": [id, ...]}.
+
+    DELETE:
+        Удаление рецептов из корзины.
+
+    Returns:
+        Response: Идентификаторы добавленных (added) или удаленных
+        (removed) рецептов, рецептов без изменений (unchanged) и
+        несуществующих рецептов (not_found).
+    """
+    model = ShoppingCart
+    membership_kind = SHOPPING_CART
+    counter_field = 'carts_count'
+
+    def on_added(self, user: Any, recipe_ids: list) -> None:
+        if recipe_ids:
+            add_recipes_to_shopping_list(user, recipe_ids)
+
+    def on_removed(self, user: Any, recipe_ids: list) -> None:
+        if recipe_ids:
+            remove_recipes_from_shopping_list(user, recipe_ids)
 
 
 class DownloadShoppingCart(APIView):
     """
-    API endpoint для скачивания списка покупок в формате PDF.
+    API endpoint для скачивания списка покупок.
 
     GET:
-    Получение списка покупок в формате PDF.
+    Получение списка покупок в формате PDF (по умолчанию) или в
+    формате txt, csv, json. Формат выбирается параметром `?format=`
+    или заголовком Accept. Текстовые форматы отдаются потоком без
+    генерации PDF.
 
     Returns:
-        Response: PDF-файл списка покупок.
+        Response: Файл списка покупок.
     """
-    @staticmethod
-    def get(request) -> HttpResponse:
+    renderer_classes = (PDFRenderer, PlainTextRenderer, CSVRenderer,
+                        JSONRenderer)
+
+    def get(self, request) -> HttpResponse:
+        output_format = request.accepted_renderer.format
+        if output_format in SHOPPING_LIST_FORMATS:
+            return stream_shopping_list(request.user, output_format)
         return generate_shopping_list_pdf(request.user)
 
+    def handle_exception(self, exc):
+        """Ошибки всегда возвращаются в формате JSON."""
+        self.request.accepted_renderer = JSONRenderer()
+        self.request.accepted_media_type = JSONRenderer.media_type
+        return super().handle_exception(exc)
+
+
+class ShoppingListJobsAPIView(APIView):
+    """
+    API endpoint для фоновой генерации списка покупок в формате PDF.
+
+    POST:
+        Постановка в очередь задания на генерацию PDF. Если актуальное
+        задание уже есть, возвращается оно. Строка пользователя
+        блокируется, поэтому одновременные запросы не создадут два
+        задания.
+
+    Returns:
+        Response: JSON-сериализованная информация о задании.
+    """
+
+    @staticmethod
+    def post(request) -> Response:
+        with transaction.atomic():
+            lock_user(request.user)
+            job, created = enqueue_shopping_list_job(request.user)
+        serializer = ShoppingListJobSerializer(job,
+                                               context={'request': request})
+        return Response(serializer.data,
+                        status=(status.HTTP_202_ACCEPTED if created
+                                else status.HTTP_200_OK))
+
+
+class ShoppingListJobDetailAPIView(APIView):
+    """
+    API endpoint для проверки статуса задания на генерацию PDF.
+
+    GET:
+        Получение статуса задания и ссылки на готовый файл.
+
+    Args:
+        pk (uuid): Идентификатор задания.
+
+    Returns:
+        Response: JSON-сериализованная информация о задании.
+    """
+
+    @staticmethod
+    def get(request, pk: Any) -> Response:
+        job = get_object_or_404(ShoppingListJob, id=pk, user=request.user)
+        serializer = ShoppingListJobSerializer(job,
+                                               context={'request': request})
+        return Response(serializer.data)
+
+
+class ShoppingListJobDownloadAPIView(APIView):
+    """
+    API endpoint для скачивания PDF, сгенерированного в фоне.
+
+    GET:
+        Получение готового PDF-файла списка покупок.
+
+    Args:
+        pk (uuid): Идентификатор задания.
+
+    Returns:
+        FileResponse: PDF-файл списка покупок.
+    """
+
+    @staticmethod
+    def get(request, pk: Any):
+        job = get_object_or_404(ShoppingListJob, id=pk, user=request.user)
+        if job.status != ShoppingListJob.DONE:
+            return Response({'errors': 'Список покупок еще не готов!'},
+                            status=status.HTTP_409_CONFLICT)
+        return FileResponse(job.file.open('rb'), as_attachment=True,
+                            filename='shopping_list.pdf',
+                            content_type='application/pdf')
+
 
 class IngredientsAPIView(ListAPIView):
     """
     API endpoint для работы с ингредиентами.
 
+    Поиск по параметру `name` выполняется по индексу в памяти
+    (IngredientIndex): сначала совпадения по началу названия, затем по
+    подстроке. Пока индекс процесса не построен, ищутся только
+    совпадения по началу названия в БД. Параметр `limit` ограничивает
+    количество результатов (по умолчанию INGREDIENT_SEARCH_LIMIT, не
+    больше INGREDIENT_SEARCH_MAX_LIMIT).
+
     Returns:
         Response: JSON-сериализованный список ингредиентов.
     """
@@ -263,6 +570,36 @@ class IngredientsAPIView(ListAPIView):
     filterset_class = IngredientFilter
     pagination_class = None
 
+    @method_decorator(conditional_get(ingredient_keys))
+    def get(self, request, *args: Any, **kwargs: Any) -> Response:
+        return super().get(request, *args, **kwargs)
+
+    def list(self, request, *args: Any, **kwargs: Any) -> Response:
+        name = request.query_params.get('name')
+        if not name:
+            return super().list(request, *args, **kwargs)
+        try:
+            limit = int(request.query_params['limit'])
+        except (KeyError, ValueError):
+            limit = INGREDIENT_SEARCH_LIMIT
+        if limit < 0:
+            limit = INGREDIENT_SEARCH_LIMIT
+        limit = min(limit, INGREDIENT_SEARCH_MAX_LIMIT)
+        index = get_ingredient_index()
+        if index is not None:
+            ingredients = index.search(name, limit)
+        elif name.strip():
+            ingredients = Ingredient.objects.filter(
+                name__istartswith=name.strip()
+            ).order_by('name').values_list(
+                'id', 'name', 'measurement_unit')[:limit]
+        else:
+            ingredients = []
+        return Response([
+            {'id': pk, 'name': title, 'measurement_unit': measurement_unit}
+            for pk, title, measurement_unit in ingredients
+        ])
+
 
 class IngredientsDetailAPIView(RetrieveAPIView):
     """
@@ -278,3 +615,7 @@ class IngredientsDetailAPIView(RetrieveAPIView):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
+
+    @method_decorator(conditional_get(ingredient_keys))
+    def get(self, request, *args: Any, **kwargs: Any) -> Response:
+        return super().get(request, *args, **kwargs)
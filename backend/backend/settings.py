@@ -1,4 +1,6 @@
 import os
+import tempfile
+from importlib.util import find_spec
 from pathlib import Path
 
 from django.core.management.utils import get_random_secret_key
@@ -33,6 +35,15 @@ if IS_LOGGING:
         },
     }
 
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'False') == 'True'
+
+METRICS_DIR = os.getenv('METRICS_DIR',
+                        os.path.join(tempfile.gettempdir(), 'tastyverse-metrics'))
+
+# Количество потоков воркера ASGI (core.asgi) для синхронного кода
+# запросов; столько же соединений с БД на воркер.
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', '8'))
+
 INSTALLED_APPS = [
     'django.contrib.admin',
     'django.contrib.auth',
@@ -62,6 +73,9 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+if METRICS_ENABLED:
+    MIDDLEWARE.insert(0, 'core.metrics.MetricsMiddleware')
+
 ROOT_URLCONF = 'backend.urls'
 
 TEMPLATES = [
@@ -102,6 +116,23 @@ if DB_ENGINE == 'postgresql':
         }
     }
 
+# Версии ресурсов (ETag, кеш ответов), кеш токенов и множества
+# пользователя должны быть общими для всех воркеров и команд управления,
+# поэтому в продакшене по умолчанию используется Memcached (сервис cache).
+if DB_ENGINE == 'postgresql':
+    DEFAULT_CACHE_BACKEND = 'django.core.cache.backends.memcached.PyMemcacheCache'
+    DEFAULT_CACHE_LOCATION = 'cache:11211'
+else:
+    DEFAULT_CACHE_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+    DEFAULT_CACHE_LOCATION = ''
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', DEFAULT_CACHE_BACKEND),
+        'LOCATION': os.getenv('CACHE_LOCATION', DEFAULT_CACHE_LOCATION),
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -139,13 +170,33 @@ AUTH_USER_MODEL = 'users.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# Быстрые кодеки подключаются, если установлены orjson и msgpack.
+if find_spec('orjson') is not None:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'][0] = (
+        'api.v1.renderers.ORJSONRenderer')
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'][0] = 'api.v1.parsers.ORJSONParser'
+if find_spec('msgpack') is not None:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append(
+        'api.v1.renderers.MessagePackRenderer')
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].append(
+        'api.v1.parsers.MessagePackParser')
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'HIDE_USERS': False,
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 
@@ -5,3 +6,8 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.v1.urls')),
 ]
+
+if settings.METRICS_ENABLED:
+    from core.metrics import metrics_view
+
+    urlpatterns.append(path('metrics', metrics_view, name='metrics'))
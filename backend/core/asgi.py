@@ -0,0 +1,143 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional
+
+import django
+from asgiref.sync import SyncToAsync, ThreadSensitiveContext, sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connections
+
+
+class PooledASGIHandler(ASGIHandler):
+    """
+    ASGIHandler, в котором синхронный код запроса выполняется в
+    ограниченном пуле потоков процесса.
+
+    Django 3.2 вызывает синхронные middleware и представления (DRF, ORM,
+    WeasyPrint, Pillow) через sync_to_async(thread_sensitive=True), и
+    без отдельного контекста все они делят один поток процесса: один
+    медленный PDF останавливает все запросы воркера. Здесь запрос на
+    время обработки получает один из ASGI_THREADS потоков (свой
+    однопоточный исполнитель), поэтому запросы выполняются параллельно,
+    а число потоков и соединений с БД ограничено. Пока все потоки
+    заняты, новые запросы ждут в цикле событий, не занимая поток.
+
+    Потоковые ответы (списки покупок, FileResponse) читаются в потоке
+    запроса, а не в цикле событий: их итераторы обращаются к БД и диску.
+
+    Атрибуты:
+        - threads (int): Размер пула потоков.
+    """
+
+    def __init__(self, threads: int):
+        super().__init__()
+        self.threads = threads
+        self.executors: List[ThreadPoolExecutor] = []
+        self.idle: Optional[asyncio.Queue] = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if self.idle is None:
+            self.start()
+        executor = await self.idle.get()
+        # Внутренние атрибуты asgiref: версия закреплена в
+        # requirements.txt, при обновлении их нужно перепроверить.
+        context = ThreadSensitiveContext()
+        token = SyncToAsync.thread_sensitive_context.set(context)
+        SyncToAsync.context_to_thread_executor[context] = executor
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            SyncToAsync.context_to_thread_executor.pop(context, None)
+            SyncToAsync.thread_sensitive_context.reset(token)
+            self.idle.put_nowait(executor)
+
+    def start(self) -> None:
+        """Создает пул потоков в цикле событий воркера."""
+        self.idle = asyncio.Queue()
+        for number in range(self.threads):
+            executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix=f'asgi-{number}')
+            self.executors.append(executor)
+            self.idle.put_nowait(executor)
+
+    async def stop(self) -> None:
+        """Закрывает соединения с БД потоков пула и останавливает их."""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(executor, connections.close_all)
+            for executor in self.executors))
+        for executor in self.executors:
+            executor.shutdown(wait=False)
+        self.executors, self.idle = [], None
+
+    async def lifespan(self, receive, send) -> None:
+        """Обрабатывает события запуска и остановки воркера (lifespan)."""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                if self.idle is None:
+                    self.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.stop()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        headers = [
+            (str(header).encode('ascii'), str(value).encode('latin1'))
+            for header, value in response.items()
+        ]
+        headers += [
+            (b'Set-Cookie', cookie.output(header='').encode('ascii').strip())
+            for cookie in response.cookies.values()
+        ]
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': headers,
+        })
+        read = sync_to_async(self.read_chunk, thread_sensitive=True)
+        parts = iter(response)
+        while True:
+            chunk = await read(parts)
+            if chunk is None:
+                break
+            await send({'type': 'http.response.body', 'body': chunk,
+                        'more_body': True})
+        await send({'type': 'http.response.body'})
+        await sync_to_async(response.close, thread_sensitive=True)()
+        return None
+
+    def read_chunk(self, parts: Iterator[bytes]) -> Optional[bytes]:
+        """
+        Читает части потокового ответа, пока не наберется chunk_size
+        байт, чтобы не переключать поток на каждую строку.
+
+        Returns:
+            bytes | None: Данные или None, если ответ закончился.
+        """
+        chunk, size = [], 0
+        for part in parts:
+            chunk.append(part)
+            size += len(part)
+            if size >= self.chunk_size:
+                break
+        else:
+            if not chunk:
+                return None
+        return b''.join(chunk)
+
+
+def get_asgi_application() -> PooledASGIHandler:
+    """
+    Возвращает ASGI-приложение Django с пулом из ASGI_THREADS потоков
+    (аналог django.core.asgi.get_asgi_application).
+    """
+    django.setup(set_prefix=False)
+    return PooledASGIHandler(settings.ASGI_THREADS)
@@ -0,0 +1,51 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from django.db import connections, transaction
+
+from core.constants.settings import BACKGROUND_WORKERS
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Возвращает общий для процесса пул потоков ограниченного размера
+    для фоновой работы, которую не нужно выполнять в потоке запроса.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=BACKGROUND_WORKERS,
+                    thread_name_prefix='background')
+    return _executor
+
+
+def _run(func, args, kwargs) -> None:
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Ошибка фоновой задачи %s', func.__name__)
+    finally:
+        connections.close_all()
+
+
+def run_in_background(func, *args, **kwargs) -> None:
+    """
+    Выполняет функцию в фоновом пуле после фиксации текущей транзакции.
+
+    Задачи не переживают перезапуск процесса, поэтому их результат
+    должен восстанавливаться отдельной командой управления.
+
+    Args:
+        func (callable): Функция.
+        *args, **kwargs: Аргументы функции.
+    """
+    transaction.on_commit(
+        lambda: get_executor().submit(_run, func, args, kwargs))
@@ -10,3 +10,23 @@ MIN_COOKING_TIME: int = 1
 MAX_COOKING_TIME: int = 1440
 RECIPE_NAME_LENGTH: int = 200
 TAG_LENGTH: int = 200
+SHOPPING_LIST_JOB_STATUS_LENGTH: int = 10
+SHOPPING_LIST_WORKER_POLL_INTERVAL: float = 1.0
+SHOPPING_LIST_JOB_TIMEOUT: int = 300
+SHOPPING_LIST_PDF_CACHE_TIMEOUT: int = 60 * 60 * 24
+SHOPPING_LIST_BATCH_SIZE: int = 500
+SEARCH_CONFIG: str = 'russian'
+IMAGE_MAX_SIZE: int = 2048
+IMAGE_VARIANT_WIDTHS: dict = {'small': 320, 'medium': 640, 'large': 1280}
+IMAGE_PLACEHOLDER_WIDTH: int = 16
+IMAGE_JPEG_QUALITY: int = 82
+IMAGE_WEBP_QUALITY: int = 80
+MEMBERSHIP_CACHE_TIMEOUT: int = 60 * 60
+BULK_RECIPES_MAX_LENGTH: int = 100
+SEED_BATCH_SIZE: int = 10000
+INGREDIENT_IMPORT_BATCH_SIZE: int = 5000
+INGREDIENT_SEARCH_LIMIT: int = 50
+INGREDIENT_SEARCH_MAX_LIMIT: int = 200
+FEED_FANOUT_MAX_FOLLOWERS: int = 10000
+FEED_FANOUT_BATCH_SIZE: int = 1000
+FEED_BACKFILL_LIMIT: int = 100
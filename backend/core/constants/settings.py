@@ -3,3 +3,17 @@
 # -------------------------
 
 PAGINATION_PAGE_SIZE: int = 6
+PAGINATION_MAX_PAGE_SIZE: int = 100
+PAGINATION_MODE_QUERY_PARAM: str = 'pagination'
+CURSOR_PAGINATION_MODE: str = 'cursor'
+BACKGROUND_WORKERS: int = 2
+RESPONSE_CACHE_TIMEOUT: int = 60 * 10
+RESPONSE_CACHE_STALE_WHILE_REVALIDATE: int = 30
+RESPONSE_CACHE_STALE_IF_ERROR: int = 60 * 60 * 24
+RESPONSE_CACHE_REFRESH_LOCK_TIMEOUT: int = 30
+METRICS_FLUSH_INTERVAL: int = 5
+METRICS_DURATION_BUCKETS: tuple = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                                   0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_QUERY_BUCKETS: tuple = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+METRICS_SIZE_BUCKETS: tuple = (100, 1000, 10000, 100000, 1000000,
+                               10000000)
@@ -6,3 +6,8 @@ EMAIL_LENGTH: int = 254
 NAME_LENGTH: int = 150
 ROLE_LENGTH: int = 20
 USERNAME_LENGTH: int = 150
+AUTH_TOKEN_CACHE_TIMEOUT: int = 60 * 5
+AUTH_TOKEN_LOCAL_TIMEOUT: int = 5
+AUTH_TOKEN_LOCAL_SIZE: int = 1024
+SUBSCRIPTION_RECIPES_LIMIT: int = 10
+SUBSCRIPTION_RECIPES_MAX_LIMIT: int = 50
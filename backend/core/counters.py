@@ -0,0 +1,116 @@
+from typing import Iterable
+
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+class CounterFieldsMixin:
+    """
+    Примесь для моделей с денормализованными счетчиками.
+
+    Счетчики изменяются только F-выражениями (change_counter), поэтому
+    при обычном сохранении объекта (например, закешированного
+    пользователя запроса) они не перезаписываются устаревшими
+    значениями.
+
+    Атрибуты:
+        - counter_fields (tuple): Поля счетчиков.
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and not args
+                and kwargs.get('update_fields') is None
+                and not kwargs.get('force_insert')):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+def change_counter(model, pk: int, field: str, delta: int) -> None:
+    """
+    Атомарно изменяет денормализованный счетчик на delta.
+
+    Изменение выполняется F-выражением в одном UPDATE, поэтому
+    параллельные запросы не теряют обновлений. Счетчик не уменьшается
+    ниже нуля: расхождение исправит команда reconcile_counters.
+
+    Args:
+        model (Model): Модель со счетчиком.
+        pk (int): Идентификатор объекта.
+        field (str): Поле счетчика.
+        delta (int): Изменение.
+    """
+    change_counters(model, [pk], field, delta)
+
+
+def change_counters(model, pks: Iterable[int], field: str,
+                    delta: int) -> None:
+    """То же, что change_counter, для нескольких объектов одним UPDATE."""
+    pks = list(pks)
+    if not pks:
+        return
+    queryset = model.objects.filter(pk__in=pks)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def reconcile_counter(model, field: str, related_model,
+                      related_field: str) -> int:
+    """
+    Пересчитывает счетчик по связанным объектам и исправляет объекты,
+    у которых он разошелся с фактическим значением.
+
+    Args:
+        model (Model): Модель со счетчиком.
+        field (str): Поле счетчика.
+        related_model (Model): Модель, объекты которой считаются.
+        related_field (str): Поле related_model, ссылающееся на model.
+
+    Returns:
+        int: Количество исправленных объектов.
+    """
+    actual = Coalesce(Subquery(
+        related_model.objects.filter(**{related_field: OuterRef('pk')})
+        .order_by().values(related_field)
+        .annotate(total=Count('pk')).values('total'),
+        output_field=IntegerField()
+    ), 0)
+    drifted = list(model.objects.annotate(actual=actual).exclude(
+        **{field: F('actual')}).values_list('pk', flat=True))
+    if drifted:
+        model.objects.filter(pk__in=drifted).update(**{field: actual})
+    return len(drifted)
+
+
+# (модель со счетчиком, поле счетчика, считаемая модель, поле связи)
+COUNTERS = (
+    ('users.User', 'recipes_count', 'recipes.Recipe', 'author'),
+    ('users.User', 'followers_count', 'users.Subscription', 'target_user'),
+    ('users.User', 'following_count', 'users.Subscription', 'subscriber'),
+    ('recipes.Recipe', 'favorites_count', 'recipes.Favorite', 'recipe'),
+    ('recipes.Recipe', 'carts_count', 'recipes.ShoppingCart', 'recipe'),
+)
+
+
+def reconcile_counters(apps) -> dict:
+    """
+    Пересчитывает все денормализованные счетчики.
+
+    Args:
+        apps (Apps): Реестр моделей (django.apps.apps или реестр
+        миграции).
+
+    Returns:
+        dict: {'модель.поле': количество исправленных объектов}.
+    """
+    return {
+        f'{model}.{field}': reconcile_counter(
+            apps.get_model(model), field,
+            apps.get_model(related_model), related_field)
+        for model, field, related_model, related_field in COUNTERS
+    }
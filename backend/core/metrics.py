@@ -0,0 +1,447 @@
+import asyncio
+import atexit
+import fcntl
+import json
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from threading import Lock
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.serializers import BaseSerializer
+
+from core.constants.settings import (METRICS_DURATION_BUCKETS,
+                                     METRICS_FLUSH_INTERVAL,
+                                     METRICS_QUERY_BUCKETS,
+                                     METRICS_SIZE_BUCKETS)
+
+METRIC_PREFIX = 'tastyverse'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+UNRESOLVED_VIEW = 'unresolved'
+# Сумма метрик завершившихся процессов.
+RETIRED_FILE = 'metrics-retired.json'
+LOCK_FILE = 'metrics.lock'
+
+# Гистограммы: имя -> (описание, границы корзин).
+HISTOGRAMS = {
+    'http_request_duration_seconds': (
+        'Время обработки запроса.', METRICS_DURATION_BUCKETS),
+    'http_request_db_queries': (
+        'Количество запросов к БД за запрос.', METRICS_QUERY_BUCKETS),
+    'http_request_db_duration_seconds': (
+        'Время запросов к БД за запрос.', METRICS_DURATION_BUCKETS),
+    'http_request_serializer_duration_seconds': (
+        'Время работы сериализаторов за запрос.', METRICS_DURATION_BUCKETS),
+    'http_response_size_bytes': (
+        'Размер тела ответа.', METRICS_SIZE_BUCKETS),
+}
+REQUESTS_TOTAL = 'http_requests_total'
+# Счетчики вне запросов: имя -> описание.
+COUNTERS = {
+    'auth_token_lookups_total': (
+        'Поиск токенов аутентификации по источнику: локальный кеш '
+        'процесса, общий кеш или БД.'),
+}
+
+_current = ContextVar('metrics_request', default=None)
+_lock = Lock()
+_state = {'pid': None, 'path': None, 'flushed_at': 0.0,
+          'histograms': {}, 'requests': {}, 'counters': {}}
+
+
+class RequestStats:
+    """Счетчики одного запроса: запросы к БД и время сериализации."""
+    __slots__ = ('queries', 'db_time', 'serializer_time', 'depth')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.depth = 0
+
+
+def get_metrics_dir() -> Path:
+    return Path(settings.METRICS_DIR)
+
+
+def _get_state() -> dict:
+    """
+    Возвращает накопленные метрики текущего процесса.
+
+    После fork (воркер gunicorn с preload) метрики, унаследованные от
+    родителя, сбрасываются: их уже учитывает файл родителя.
+    """
+    pid = os.getpid()
+    if _state['pid'] != pid:
+        _state.update(
+            pid=pid, flushed_at=time.monotonic(), histograms={},
+            requests={}, counters={},
+            path=get_metrics_dir() / f'metrics-{pid}-{time.time_ns()}.json')
+    return _state
+
+
+def observe(view: str, method: str, status: int, values: dict) -> None:
+    """
+    Учитывает завершенный запрос.
+
+    Args:
+        view (str): Имя URL.
+        method (str): HTTP-метод.
+        status (int): Код ответа.
+        values (dict): Значения гистограмм по их именам.
+    """
+    with _lock:
+        state = _get_state()
+        requests = state['requests']
+        key = (view, method, str(status))
+        requests[key] = requests.get(key, 0) + 1
+        for name, value in values.items():
+            buckets = HISTOGRAMS[name][1]
+            histogram = state['histograms'].setdefault(
+                (name, view, method),
+                {'buckets': [0] * (len(buckets) + 1), 'sum': 0, 'count': 0})
+            histogram['buckets'][bisect_left(buckets, value)] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+        due = time.monotonic() - state['flushed_at'] >= METRICS_FLUSH_INTERVAL
+    if due:
+        flush()
+
+
+def increment(name: str, value: int = 1, **labels) -> None:
+    """
+    Увеличивает счетчик из COUNTERS (если метрики включены).
+
+    Args:
+        name (str): Имя счетчика.
+        value (int): Прирост.
+        **labels: Метки счетчика.
+    """
+    if not settings.METRICS_ENABLED:
+        return
+    with _lock:
+        state = _get_state()
+        counters = state['counters']
+        key = (name, tuple(sorted(labels.items())))
+        counters[key] = counters.get(key, 0) + value
+        due = time.monotonic() - state['flushed_at'] >= METRICS_FLUSH_INTERVAL
+    if due:
+        flush()
+
+
+def _dump(metrics: dict) -> str:
+    """Сериализует метрики (формат collect) для записи в файл."""
+    return json.dumps({
+        'histograms': [[*key, value]
+                       for key, value in metrics['histograms'].items()],
+        'requests': [[*key, value]
+                     for key, value in metrics['requests'].items()],
+        'counters': [[name, dict(labels), value]
+                     for (name, labels), value
+                     in metrics['counters'].items()],
+    })
+
+
+def _write(path: Path, content: str) -> None:
+    """Перезаписывает файл целиком через временный файл."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_suffix('.tmp')
+    temporary.write_text(content)
+    os.replace(temporary, path)
+
+
+def _merge(metrics: dict, data: dict) -> None:
+    """Добавляет к metrics значения, прочитанные из файла."""
+    requests, histograms = metrics['requests'], metrics['histograms']
+    counters = metrics['counters']
+    for view, method, status, value in data['requests']:
+        key = (view, method, status)
+        requests[key] = requests.get(key, 0) + value
+    for name, view, method, value in data['histograms']:
+        if name not in HISTOGRAMS:
+            continue
+        histogram = histograms.setdefault(
+            (name, view, method),
+            {'buckets': [0] * len(value['buckets']), 'sum': 0, 'count': 0})
+        for index, count in enumerate(value['buckets']):
+            histogram['buckets'][index] += count
+        histogram['sum'] += value['sum']
+        histogram['count'] += value['count']
+    for name, labels, value in data.get('counters', []):
+        key = (name, tuple(sorted(labels.items())))
+        counters[key] = counters.get(key, 0) + value
+
+
+def _read_files(paths) -> dict:
+    metrics = {'histograms': {}, 'requests': {}, 'counters': {}}
+    for path in paths:
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        _merge(metrics, data)
+    return metrics
+
+
+@contextmanager
+def _directory_lock(shared: bool):
+    """
+    Блокировка METRICS_DIR между процессами: сводка файлов завершившихся
+    процессов (retire_processes) не должна пересекаться с чтением
+    (collect), иначе значения на время попадут в сумму дважды или не
+    попадут совсем.
+    """
+    directory = get_metrics_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / LOCK_FILE, 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield directory
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def flush() -> None:
+    """
+    Записывает метрики процесса в его файл в METRICS_DIR.
+
+    У каждого процесса свой файл, который перезаписывается целиком
+    через временный файл, поэтому читатель никогда не видит частично
+    записанных данных. Файлы завершившихся процессов сводятся в общий
+    файл RETIRED_FILE (retire_processes), поэтому счетчики не
+    уменьшаются после перезапуска воркера, а число файлов не растет.
+    """
+    with _lock:
+        state = _get_state()
+        state['flushed_at'] = time.monotonic()
+        content = _dump(state)
+        path = state['path']
+    _write(path, content)
+
+
+def collect() -> dict:
+    """Суммирует метрики из файлов всех процессов."""
+    with _directory_lock(shared=True) as directory:
+        return _read_files(directory.glob('metrics-*.json'))
+
+
+def retire_processes(pids: Optional[Iterable[int]] = None) -> None:
+    """
+    Сводит файлы завершившихся процессов в общий файл RETIRED_FILE и
+    удаляет их. Вызывается мастер-процессом gunicorn: при запуске для
+    всех файлов прошлого запуска и при завершении каждого воркера
+    (см. gunicorn.conf.py).
+
+    Args:
+        pids (Iterable[int], optional): Идентификаторы процессов,
+        None - все процессы.
+    """
+    pids = None if pids is None else {str(pid) for pid in pids}
+    with _directory_lock(shared=False) as directory:
+        retired = directory / RETIRED_FILE
+        paths = [path for path in directory.glob('metrics-*-*.json')
+                 if pids is None or path.name.split('-')[1] in pids]
+        if not paths:
+            return
+        _write(retired, _dump(_read_files([retired, *paths])))
+        for path in paths:
+            path.unlink()
+
+
+def _escape(value: str) -> str:
+    return (value.replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+def _labels(**labels) -> str:
+    return '{%s}' % ','.join(f'{key}="{_escape(str(value))}"'
+                             for key, value in labels.items())
+
+
+def render(metrics: dict) -> str:
+    """Возвращает метрики в текстовом формате Prometheus."""
+    lines = [
+        f'# HELP {METRIC_PREFIX}_{REQUESTS_TOTAL} Количество запросов.',
+        f'# TYPE {METRIC_PREFIX}_{REQUESTS_TOTAL} counter',
+    ]
+    for (view, method, status), value in sorted(
+            metrics['requests'].items()):
+        lines.append(f'{METRIC_PREFIX}_{REQUESTS_TOTAL}'
+                     f'{_labels(view=view, method=method, status=status)}'
+                     f' {value}')
+    for name, description in COUNTERS.items():
+        metric = f'{METRIC_PREFIX}_{name}'
+        lines.append(f'# HELP {metric} {description}')
+        lines.append(f'# TYPE {metric} counter')
+        for (counter_name, labels), value in sorted(
+                metrics['counters'].items()):
+            if counter_name == name:
+                lines.append(f'{metric}{_labels(**dict(labels))} {value}')
+    for name, (description, buckets) in HISTOGRAMS.items():
+        metric = f'{METRIC_PREFIX}_{name}'
+        lines.append(f'# HELP {metric} {description}')
+        lines.append(f'# TYPE {metric} histogram')
+        for (histogram_name, view, method), histogram in sorted(
+                metrics['histograms'].items()):
+            if histogram_name != name:
+                continue
+            cumulative = 0
+            bounds = [*map(repr, buckets), '+Inf']
+            for bound, count in zip(bounds, histogram['buckets']):
+                cumulative += count
+                lines.append(f'{metric}_bucket'
+                             f'{_labels(view=view, method=method, le=bound)}'
+                             f' {cumulative}')
+            labels = _labels(view=view, method=method)
+            lines.append(f'{metric}_sum{labels} {histogram["sum"]}')
+            lines.append(f'{metric}_count{labels} {histogram["count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request) -> HttpResponse:
+    """
+    Отдает метрики всех процессов в текстовом формате Prometheus.
+
+    Адрес не проксируется nginx и доступен только из внутренней сети
+    (backend:8000/metrics).
+    """
+    flush()
+    return HttpResponse(render(collect()), content_type=CONTENT_TYPE)
+
+
+def _instrumented_data(self):
+    stats = _current.get()
+    if stats is None:
+        return _serializer_data.fget(self)
+    stats.depth += 1
+    started = time.perf_counter()
+    try:
+        return _serializer_data.fget(self)
+    finally:
+        stats.depth -= 1
+        if not stats.depth:
+            stats.serializer_time += time.perf_counter() - started
+
+
+_serializer_data = BaseSerializer.data
+
+
+def instrument_serializers() -> None:
+    """
+    Включает измерение времени BaseSerializer.data: в нем выполняется
+    to_representation всех вложенных сериализаторов.
+    """
+    BaseSerializer.data = property(_instrumented_data)
+
+
+def count_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - started
+
+
+def _add_query_counter(connection, **kwargs) -> None:
+    # Первым в списке, чтобы не мешать execute_wrapper(), который
+    # снимает последнюю обертку.
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, count_query)
+
+
+def instrument_connections() -> None:
+    """
+    Включает подсчет запросов к БД на соединениях всех потоков.
+
+    Счетчики запроса берутся из контекста (ContextVar), поэтому запросы
+    учитываются и в потоках пула ASGI (core.asgi).
+    """
+    connection_created.connect(_add_query_counter)
+    for connection in connections.all():
+        _add_query_counter(connection)
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    """
+    Собирает метрики запросов по имени URL и HTTP-методу: время
+    обработки, количество и время запросов к БД, время сериализации и
+    размер ответа.
+
+    Работает и в WSGI, и в ASGI (не добавляет переключений потока).
+    Метрики накапливаются в памяти процесса и раз в
+    METRICS_FLUSH_INTERVAL секунд сбрасываются в файл процесса в
+    METRICS_DIR, откуда metrics_view суммирует их по всем воркерам
+    gunicorn.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        instrument_serializers()
+        instrument_connections()
+        atexit.register(flush)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, stats, started)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, stats, started)
+        return response
+
+    def record(self, request, response, stats: RequestStats,
+               started: float) -> None:
+        values = {
+            'http_request_duration_seconds': time.perf_counter() - started,
+            'http_request_db_queries': stats.queries,
+            'http_request_db_duration_seconds': stats.db_time,
+            'http_request_serializer_duration_seconds':
+                stats.serializer_time,
+        }
+        size = self.get_response_size(response)
+        if size is not None:
+            values['http_response_size_bytes'] = size
+        observe(self.get_view_name(request), request.method,
+                response.status_code, values)
+
+    @staticmethod
+    def get_view_name(request) -> str:
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return UNRESOLVED_VIEW
+        return match.view_name or match.route or UNRESOLVED_VIEW
+
+    @staticmethod
+    def get_response_size(response):
+        if not response.streaming:
+            return len(response.content)
+        if response.has_header('Content-Length'):
+            return int(response['Content-Length'])
+        return None
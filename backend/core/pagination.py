@@ -1,6 +1,20 @@
-from rest_framework.pagination import PageNumberPagination
+import heapq
+import json
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+from collections import OrderedDict
 
-from core.constants.settings import PAGINATION_PAGE_SIZE
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from core.constants.settings import (CURSOR_PAGINATION_MODE,
+                                     PAGINATION_MAX_PAGE_SIZE,
+                                     PAGINATION_MODE_QUERY_PARAM,
+                                     PAGINATION_PAGE_SIZE)
 
 
 class CustomPagination(PageNumberPagination):
@@ -24,3 +38,198 @@ class CustomPagination(PageNumberPagination):
     """
     page_size_query_param = 'limit'
     page_size = PAGINATION_PAGE_SIZE
+
+
+class KeysetPagination(BasePagination):
+    """
+    Курсорная (keyset) пагинация для API.
+
+    В отличие от CustomPagination не выполняет COUNT(*) и OFFSET: следующая
+    страница выбирается условием по ключу сортировки последнего элемента,
+    поэтому стоимость запроса не зависит от глубины страницы. Последнее
+    поле в ordering должно быть уникальным (стабильный tie-breaker).
+    Сортировка исходного queryset заменяется на ordering.
+
+    Включается параметром запроса `pagination=cursor`, ссылки next и
+    previous содержат непрозрачный курсор в параметре `cursor`.
+
+    Опции пагинации:
+        - ordering (tuple): Поля сортировки, '-' означает убывание.
+        - cursor_query_param (str): Параметр запроса с курсором.
+        - page_size_query_param (str): Параметр запроса для указания
+        количества элементов на странице.
+        - page_size (int): Количество элементов на странице по умолчанию.
+        - max_page_size (int): Максимальное количество элементов
+        на странице.
+
+    Методы:
+        - is_requested(request): Проверяет, запрошен ли курсорный режим.
+        - paginate_queryset(queryset, request, view): Возвращает
+        страницу объектов.
+        - get_paginated_response(data): Возвращает ответ с данными и
+        ссылками next/previous (без count).
+    """
+    ordering = ('-pub_date', '-id')
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = PAGINATION_PAGE_SIZE
+    max_page_size = PAGINATION_MAX_PAGE_SIZE
+    invalid_cursor_message = 'Неверный курсор.'
+
+    @staticmethod
+    def is_requested(request) -> bool:
+        return (request.query_params.get(PAGINATION_MODE_QUERY_PARAM)
+                == CURSOR_PAGINATION_MODE)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        model = queryset.model
+        position, reverse = self.decode_cursor(request, model)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(self.invert(field) for field in ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.keyset_filter(ordering, position))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+        self.set_positions(results, position, reverse, has_more)
+        return results
+
+    def set_positions(self, results, position, reverse: bool,
+                      has_more: bool) -> None:
+        """Запоминает позиции для ссылок next и previous."""
+        self.next_position = self.previous_position = None
+        if results and (has_more if not reverse else position is not None):
+            self.next_position = self.get_position(results[-1])
+        if results and (has_more if reverse else position is not None):
+            self.previous_position = self.get_position(results[0])
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_link(self.next_position, reverse=False)),
+            ('previous', self.get_link(self.previous_position, reverse=True)),
+            ('results', data),
+        ]))
+
+    def get_page_size(self, request) -> int:
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_position(self, instance) -> list:
+        return [
+            instance._meta.get_field(field.lstrip('-')).value_to_string(
+                instance)
+            for field in self.ordering
+        ]
+
+    def get_link(self, position, reverse: bool):
+        if position is None:
+            return None
+        cursor = b64encode(json.dumps(
+            {'p': position, 'r': int(reverse)}).encode()).decode()
+        url = remove_query_param(self.base_url, 'page')
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(b64decode(encoded.encode()).decode())
+            reverse = bool(cursor['r'])
+            if len(cursor['p']) != len(self.ordering):
+                raise ValueError
+            position = [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, cursor['p'])
+            ]
+        except (BinasciiError, UnicodeDecodeError, ValueError, TypeError,
+                KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    @staticmethod
+    def invert(field: str) -> str:
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def keyset_filter(ordering, position) -> Q:
+        """
+        Строит условие «строго после позиции» для лексикографического
+        порядка: (a > x) OR (a = x AND b > y) OR ...
+        """
+        condition = Q()
+        for index, field in enumerate(ordering):
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            step = Q(**{f'{field.lstrip("-")}__{lookup}': position[index]})
+            for previous, value in zip(ordering[:index], position[:index]):
+                step &= Q(**{previous.lstrip('-'): value})
+            condition |= step
+        return condition
+
+
+class MergedKeysetPagination(KeysetPagination):
+    """
+    Курсорная пагинация по нескольким упорядоченным источникам.
+
+    Источник - пара (queryset, ordering), где ordering задает те же
+    значения ключа, что и ordering пагинации, но может называть поля
+    иначе (например, '-recipe_id' вместо '-id'). Из каждого источника
+    выбирается не больше page_size + 1 ключей после курсора, ключи
+    сливаются без повторов, и объекты страницы загружаются из queryset
+    одним запросом по последнему полю ключа (первичному ключу).
+    Стоимость страницы не зависит от ее глубины и размера источников.
+    Все поля ordering должны сортироваться в одном направлении.
+
+    Методы:
+        - paginate_sources(sources, queryset, request): Возвращает
+        страницу объектов.
+    """
+
+    def paginate_sources(self, sources, queryset, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request, queryset.model)
+
+        streams = []
+        for source, ordering in sources:
+            if reverse:
+                ordering = tuple(self.invert(field) for field in ordering)
+            source = source.order_by(*ordering)
+            if position is not None:
+                source = source.filter(
+                    self.keyset_filter(ordering, position))
+            streams.append(list(source.values_list(
+                *(field.lstrip('-') for field in ordering)
+            )[:self.page_size + 1]))
+        descending = self.ordering[0].startswith('-') != reverse
+        keys = []
+        for key in heapq.merge(*streams, reverse=descending):
+            if keys and keys[-1] == key:
+                continue
+            keys.append(key)
+            if len(keys) > self.page_size:
+                break
+        has_more = len(keys) > self.page_size
+        keys = keys[:self.page_size]
+        if reverse:
+            keys.reverse()
+
+        objects = queryset.in_bulk([key[-1] for key in keys])
+        results = [objects[key[-1]] for key in keys if key[-1] in objects]
+        self.set_positions(results, position, reverse, has_more)
+        return results
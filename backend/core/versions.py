@@ -0,0 +1,61 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY_PREFIX = 'version'
+
+
+def get_version(key: str) -> int:
+    """
+    Возвращает текущую версию ресурса.
+
+    Версии хранятся в кеше, общем для воркеров и команд управления (в
+    продакшене - Memcached, см. CACHES), поэтому изменения видны всем
+    процессам; LocMemCache подходит только для одного процесса. Если
+    версия отсутствует (например, вытеснена из кеша), создается новая:
+    это безопасно, так как новая версия не совпадет ни с одной из
+    прежних.
+
+    Args:
+        key (str): Имя ресурса, например 'ingredients' или 'recipe:1'.
+
+    Returns:
+        int: Версия (время последнего изменения в наносекундах).
+    """
+    cache_key = f'{VERSION_KEY_PREFIX}:{key}'
+    version = cache.get(cache_key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(cache_key, version, timeout=None):
+            version = cache.get(cache_key, version)
+    return version
+
+
+def get_versions(*keys: str) -> dict:
+    """Возвращает версии нескольких ресурсов одним обращением к кешу."""
+    cache_keys = {f'{VERSION_KEY_PREFIX}:{key}': key for key in keys}
+    found = cache.get_many(cache_keys)
+    versions = {cache_keys[cache_key]: version
+                for cache_key, version in found.items()}
+    for key in keys:
+        if key not in versions:
+            versions[key] = get_version(key)
+    return versions
+
+
+def bump_version(*keys: str) -> None:
+    """
+    Увеличивает версии ресурсов после фиксации текущей транзакции,
+    чтобы читатели не получили новую версию раньше новых данных.
+
+    Args:
+        *keys (str): Имена ресурсов.
+    """
+    def bump():
+        version = time.time_ns()
+        cache.set_many(
+            {f'{VERSION_KEY_PREFIX}:{key}': version for key in keys},
+            timeout=None)
+
+    transaction.on_commit(bump)
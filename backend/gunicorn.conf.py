@@ -0,0 +1,42 @@
+import os
+
+# Режим работы: wsgi - синхронные воркеры gunicorn, asgi - воркеры
+# uvicorn с пулом потоков core.asgi (ASGI_THREADS на воркер).
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', '1'))
+
+if SERVER_MODE == 'asgi':
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    wsgi_app = 'backend.asgi:application'
+else:
+    wsgi_app = 'backend.wsgi:application'
+
+
+def post_worker_init(worker):
+    """Запускает построение индекса ингредиентов при старте воркера."""
+    from recipes.ingredient_index import get_ingredient_index
+
+    get_ingredient_index()
+
+
+def on_starting(server):
+    """
+    Сводит файлы метрик процессов прошлого запуска в общий файл
+    (core.metrics.retire_processes).
+    """
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    django.setup()
+    from core.metrics import retire_processes
+
+    retire_processes()
+
+
+def child_exit(server, worker):
+    """Сводит файл метрик завершившегося воркера в общий файл."""
+    from core.metrics import retire_processes
+
+    retire_processes([worker.pid])
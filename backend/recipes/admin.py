@@ -3,7 +3,8 @@ from import_export import resources
 from import_export.admin import ImportExportModelAdmin
 
 from recipes.models import (Ingredient, Tag, Recipe,
-                            RecipeEssentials, Favorite, ShoppingCart)
+                            RecipeEssentials, Favorite, ShoppingCart,
+                            ShoppingListJob)
 
 
 @admin.register(Tag)
@@ -47,6 +48,7 @@ class RecipeAdmin(admin.ModelAdmin):
         - image
         - text
         - cooking_time
+        - favorites_count
 
     Поле "Пусто" отображается как "-пусто-".
 
@@ -65,7 +67,8 @@ class RecipeAdmin(admin.ModelAdmin):
         'name',
         'image',
         'text',
-        'cooking_time'
+        'cooking_time',
+        'favorites_count'
     )
 
     empty_value_display = '-пусто-'
@@ -184,3 +187,29 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     )
     list_filter = ('user', 'recipe')
     search_fields = ('user',)
+
+
+@admin.register(ShoppingListJob)
+class ShoppingListJobAdmin(admin.ModelAdmin):
+    """
+    Настроенная админ-панель заданий на генерацию PDF-списков покупок.
+
+    Список отображаемых полей:
+        - id
+        - user
+        - status
+        - created_at
+        - finished_at
+
+    Фильтры:
+        - status
+    """
+    list_display = (
+        'id',
+        'user',
+        'status',
+        'created_at',
+        'finished_at'
+    )
+    list_filter = ('status',)
+    search_fields = ('user__username',)
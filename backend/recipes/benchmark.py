@@ -0,0 +1,425 @@
+import base64
+import json
+import math
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from io import BytesIO
+from typing import Dict, List, NamedTuple, Optional
+
+from django.apps import apps
+from django.db import connection
+from django.test import Client
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.v1.parsers import MessagePackParser, ORJSONParser
+from api.v1.renderers import (MessagePackRenderer, ORJSONRenderer, msgpack,
+                              orjson)
+
+from core.counters import reconcile_counters
+from recipes.feed import rebuild_timeline, update_feed_modes
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from recipes.seeding import SyntheticDataGenerator
+from users.models import Subscription, User
+
+PASSWORD = 'benchmark-password'
+BENCH_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'bench-api',
+    }
+}
+# Разница p95, меньшая этого порога (в секундах), считается шумом.
+LATENCY_NOISE_FLOOR = 0.001
+
+
+class Scenario(NamedTuple):
+    """
+    Запрос к одному адресу API.
+
+    Атрибуты:
+        - name (str): Имя сценария в отчете.
+        - method (str): HTTP-метод.
+        - path (str): Адрес; поля в фигурных скобках подставляются из
+        контекста прогона.
+        - anonymous (bool): Выполнять без аутентификации.
+        - authenticated (bool): Выполнять от имени пользователя.
+        - data (str | None): Имя поля контекста с телом запроса.
+        - capture (str | None): Поле контекста, в которое сохраняется
+        id из ответа.
+    """
+    name: str
+    method: str
+    path: str
+    anonymous: bool = True
+    authenticated: bool = True
+    data: Optional[str] = None
+    capture: Optional[str] = None
+
+
+def auth_only(name, method, path, **kwargs) -> Scenario:
+    return Scenario(name, method, path, anonymous=False, **kwargs)
+
+
+# Сценарии выполняются по порядку на каждой итерации; парные запросы
+# (добавление и удаление) возвращают данные в исходное состояние.
+SCENARIOS = (
+    Scenario('tags', 'get', '/api/tags/'),
+    Scenario('tags-detail', 'get', '/api/tags/{tag}/'),
+    Scenario('ingredients', 'get', '/api/ingredients/'),
+    Scenario('ingredients-search', 'get',
+             '/api/ingredients/?name={ingredient_prefix}'),
+    Scenario('ingredients-detail', 'get', '/api/ingredients/{ingredient}/'),
+    Scenario('recipes', 'get', '/api/recipes/'),
+    Scenario('recipes-cursor', 'get', '/api/recipes/?pagination=cursor'),
+    Scenario('recipes-tags', 'get', '/api/recipes/?tags={tag_slug}'),
+    Scenario('recipes-search', 'get', '/api/recipes/?search={recipe_word}'),
+    auth_only('recipes-favorited', 'get', '/api/recipes/?is_favorited=1'),
+    auth_only('recipes-in-cart', 'get',
+              '/api/recipes/?is_in_shopping_cart=1'),
+    Scenario('recipe-detail', 'get', '/api/recipes/{recipe}/'),
+    Scenario('users', 'get', '/api/users/'),
+    Scenario('user-detail', 'get', '/api/users/{author}/'),
+    auth_only('users-me', 'get', '/api/users/me/'),
+    auth_only('subscriptions', 'get', '/api/users/subscriptions/'),
+    auth_only('feed', 'get', '/api/recipes/feed/'),
+    auth_only('subscribe', 'post', '/api/users/{author}/subscribe/'),
+    auth_only('unsubscribe', 'delete', '/api/users/{author}/subscribe/'),
+    auth_only('favorite-add', 'post', '/api/recipes/{free_recipe}/favorite/'),
+    auth_only('favorite-remove', 'delete',
+              '/api/recipes/{free_recipe}/favorite/'),
+    auth_only('cart-add', 'post', '/api/recipes/{free_recipe}/shopping_cart/'),
+    auth_only('cart-remove', 'delete',
+              '/api/recipes/{free_recipe}/shopping_cart/'),
+    auth_only('favorite-bulk-add', 'post', '/api/recipes/favorite/',
+              data='bulk_recipes'),
+    auth_only('favorite-bulk-remove', 'delete', '/api/recipes/favorite/',
+              data='bulk_recipes'),
+    auth_only('cart-bulk-add', 'post', '/api/recipes/shopping_cart/',
+              data='bulk_recipes'),
+    auth_only('cart-bulk-remove', 'delete', '/api/recipes/shopping_cart/',
+              data='bulk_recipes'),
+    auth_only('download-pdf', 'get', '/api/recipes/download_shopping_cart/'),
+    auth_only('download-txt', 'get',
+              '/api/recipes/download_shopping_cart/?format=txt'),
+    auth_only('download-csv', 'get',
+              '/api/recipes/download_shopping_cart/?format=csv'),
+    auth_only('download-json', 'get',
+              '/api/recipes/download_shopping_cart/?format=json'),
+    auth_only('pdf-job-create', 'post',
+              '/api/recipes/download_shopping_cart/jobs/', capture='job'),
+    auth_only('pdf-job-detail', 'get',
+              '/api/recipes/download_shopping_cart/jobs/{job}/'),
+    auth_only('pdf-job-download', 'get',
+              '/api/recipes/download_shopping_cart/jobs/{job}/download/'),
+    auth_only('recipe-create', 'post', '/api/recipes/',
+              data='new_recipe', capture='created_recipe'),
+    auth_only('recipe-update', 'patch', '/api/recipes/{created_recipe}/',
+              data='recipe_update'),
+    auth_only('recipe-delete', 'delete', '/api/recipes/{created_recipe}/'),
+)
+
+
+def make_image() -> str:
+    """Возвращает небольшое PNG-изображение в формате data URI."""
+    buffer = BytesIO()
+    Image.new('RGB', (64, 64), (200, 120, 40)).save(buffer, 'PNG')
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/png;base64,{encoded}'
+
+
+def seed_dataset(users: int, recipes: int, ingredients: int, tags: int,
+                 ingredients_per_recipe: int, favorites_per_user: int,
+                 carts_per_user: int, subscriptions_per_user: int,
+                 seed: int) -> dict:
+    """
+    Заполняет пустую БД набором данных для прогона
+    (SyntheticDataGenerator) и создает пользователя, от имени которого
+    выполняются аутентифицированные запросы.
+
+    Returns:
+        dict: Контекст прогона (идентификаторы для адресов и тела
+        запросов).
+    """
+    created = SyntheticDataGenerator(
+        users=users, recipes=recipes, tags=tags, ingredients=ingredients,
+        min_ingredients=ingredients_per_recipe,
+        max_ingredients=ingredients_per_recipe,
+        favorites_per_user=favorites_per_user, carts_per_user=carts_per_user,
+        subscriptions_per_user=subscriptions_per_user, seed=seed,
+    ).generate()
+    recipe_ids, tag_ids = created['recipes'], created['tags']
+    ingredient_ids = created['ingredients']
+    rng = random.Random(seed)
+    user = User.objects.create_user(
+        username='benchmark', email='benchmark@example.com',
+        first_name='Benchmark', last_name='User', password=PASSWORD)
+    # Рецепты, которые пользователь добавляет и удаляет во время
+    # прогона, не попадают в его избранное и корзину.
+    free_recipes = recipe_ids[:11]
+    taken = recipe_ids[11:]
+    for model, count in ((Favorite, favorites_per_user),
+                         (ShoppingCart, carts_per_user)):
+        model.objects.bulk_create(
+            model(user=user, recipe_id=recipe_id)
+            for recipe_id in rng.sample(taken, min(count, len(taken))))
+    # Автор с наибольшим количеством подписчиков, на которого
+    # пользователь подписывается и отписывается во время прогона.
+    author, *others = User.objects.filter(
+        id__in=created['users']).order_by('-followers_count').values_list(
+        'id', flat=True)[:subscriptions_per_user + 1]
+    Subscription.objects.bulk_create(
+        Subscription(subscriber=user, target_user_id=target_id)
+        for target_id in others)
+    reconcile_counters(apps)
+    update_feed_modes()
+    rebuild_timeline(user)
+    return {
+        'token': Token.objects.create(user=user).key,
+        'author': author,
+        'recipe': recipe_ids[0],
+        'free_recipe': free_recipes[0],
+        'tag': tag_ids[0],
+        'tag_slug': Tag.objects.get(id=tag_ids[0]).slug,
+        'ingredient': ingredient_ids[0],
+        'ingredient_prefix': Ingredient.objects.get(
+            id=ingredient_ids[0]).name[:4],
+        'recipe_word': Recipe.objects.get(id=recipe_ids[0]).name.split()[0],
+        'bulk_recipes': {'recipes': list(free_recipes[1:])},
+        'new_recipe': {
+            'tags': tag_ids[:2],
+            'ingredients': [{'id': pk, 'amount': 100}
+                            for pk in ingredient_ids[:5]],
+            'image': make_image(),
+            'name': 'Новый рецепт',
+            'text': 'Описание нового рецепта',
+            'cooking_time': 30,
+        },
+        'recipe_update': {'cooking_time': 45},
+    }
+
+
+@contextmanager
+def benchmark_database(shared: bool = False):
+    """
+    Создает отдельную тестовую БД, временный каталог media и локальный
+    кеш на время прогона и удаляет их после него.
+
+    Args:
+        shared (bool): Создать SQLite в файле, а не в памяти, чтобы к
+        тестовой БД могли подключиться другие процессы.
+    """
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    test_settings = connection.settings_dict['TEST']
+    old_test_name = test_settings['NAME']
+    with tempfile.TemporaryDirectory() as directory:
+        if shared and connection.vendor == 'sqlite':
+            test_settings['NAME'] = os.path.join(directory, 'db.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(
+                    MEDIA_ROOT=os.path.join(directory, 'media'),
+                    CACHES=BENCH_CACHES):
+                yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            test_settings['NAME'] = old_test_name
+            teardown_test_environment()
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """Процентиль по методу ближайшего ранга."""
+    values = sorted(values)
+    index = max(math.ceil(percent / 100 * len(values)) - 1, 0)
+    return values[index]
+
+
+def perform(client: Client, scenario: Scenario, context: dict):
+    """
+    Выполняет запрос сценария и читает тело ответа целиком (в том
+    числе потокового).
+    """
+    kwargs = {}
+    if scenario.data is not None:
+        kwargs = {'data': json.dumps(context[scenario.data]),
+                  'content_type': 'application/json'}
+    path = scenario.path.format(**context)
+    response = getattr(client, scenario.method)(path, **kwargs)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    response.close()
+    if scenario.capture and response.status_code < 300:
+        context[scenario.capture] = response.json()['id']
+    return response
+
+
+def run(context: dict, iterations: int, warmup: int,
+        names: Optional[List[str]] = None) -> Dict[str, dict]:
+    """
+    Прогоняет сценарии через тестовый клиент Django.
+
+    Каждый сценарий выполняется warmup раз без измерений и iterations
+    раз с измерением времени и количества запросов к БД. Пиковая
+    память (tracemalloc) измеряется отдельным запросом, чтобы
+    трассировка не искажала время.
+
+    Returns:
+        dict: {сценарий: {'p50', 'p95', 'p99', 'queries',
+        'peak_memory', 'status'}}; время в секундах, память в байтах.
+    """
+    clients = {
+        'anon': Client(raise_request_exception=False),
+        'auth': Client(raise_request_exception=False,
+                       HTTP_AUTHORIZATION=f'Token {context["token"]}'),
+    }
+    runs = [
+        (f'{scenario.name}[{kind}]', scenario, clients[kind])
+        for scenario in SCENARIOS
+        for kind, enabled in (('anon', scenario.anonymous),
+                              ('auth', scenario.authenticated))
+        if enabled and (not names or scenario.name in names)
+    ]
+    timings = {name: [] for name, _, _ in runs}
+    queries = {name: [] for name, _, _ in runs}
+    statuses = {}
+    counter = {'queries': 0}
+
+    def count_query(execute, sql, params, many, query_context):
+        counter['queries'] += 1
+        return execute(sql, params, many, query_context)
+
+    with connection.execute_wrapper(count_query):
+        for iteration in range(warmup + iterations):
+            for name, scenario, client in runs:
+                counter['queries'] = 0
+                started = time.perf_counter()
+                response = perform(client, scenario, context)
+                elapsed = time.perf_counter() - started
+                statuses[name] = response.status_code
+                if iteration >= warmup:
+                    timings[name].append(elapsed)
+                    queries[name].append(counter['queries'])
+
+    peak_memory = {}
+    for name, scenario, client in runs:
+        tracemalloc.start()
+        try:
+            perform(client, scenario, context)
+            peak_memory[name] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return {
+        name: {
+            'p50': percentile(timings[name], 50),
+            'p95': percentile(timings[name], 95),
+            'p99': percentile(timings[name], 99),
+            'queries': max(queries[name]),
+            'peak_memory': peak_memory[name],
+            'status': statuses[name],
+        }
+        for name, _, _ in runs
+    }
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict],
+            threshold: float) -> List[str]:
+    """
+    Сравнивает результаты с сохраненными ранее.
+
+    Регрессией считается рост p95 или пиковой памяти больше чем на
+    threshold процентов (для времени - и больше чем на
+    LATENCY_NOISE_FLOOR), рост количества запросов к БД или смена
+    кода ответа.
+
+    Returns:
+        list: Описания регрессий.
+    """
+    factor = 1 + threshold / 100
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if (result['p95'] > previous['p95'] * factor
+                and result['p95'] - previous['p95'] > LATENCY_NOISE_FLOOR):
+            regressions.append(
+                f'{name}: p95 {previous["p95"] * 1000:.1f} -> '
+                f'{result["p95"] * 1000:.1f} мс')
+        if result['queries'] > previous['queries']:
+            regressions.append(
+                f'{name}: запросов к БД {previous["queries"]} -> '
+                f'{result["queries"]}')
+        if result['peak_memory'] > previous['peak_memory'] * factor:
+            regressions.append(
+                f'{name}: пиковая память {previous["peak_memory"]} -> '
+                f'{result["peak_memory"]} байт')
+        if result['status'] != previous['status']:
+            regressions.append(
+                f'{name}: код ответа {previous["status"]} -> '
+                f'{result["status"]}')
+    return regressions
+
+
+# Самые большие ответы API, на которых сравниваются кодеки.
+CODEC_PAYLOADS = (
+    ('ingredients', '/api/ingredients/'),
+    ('recipes', '/api/recipes/?limit=100'),
+    ('recipe-detail', '/api/recipes/{recipe}/'),
+    ('subscriptions', '/api/users/subscriptions/?limit=100&recipes_limit=50'),
+)
+
+
+def get_codecs() -> List[tuple]:
+    """
+    Возвращает установленные кодеки: пары (имя, рендерер, парсер).
+    Первым идет стандартный JSON, с которым сравниваются остальные.
+    """
+    codecs = [('json', JSONRenderer(), JSONParser())]
+    if orjson is not None:
+        codecs.append(('orjson', ORJSONRenderer(), ORJSONParser()))
+    if msgpack is not None:
+        codecs.append(('msgpack', MessagePackRenderer(),
+                       MessagePackParser()))
+    return codecs
+
+
+def run_codecs(context: dict, iterations: int) -> Dict[str, dict]:
+    """
+    Замеряет кодирование и разбор данных самых больших ответов API
+    каждым установленным кодеком (без запросов к БД и сериализации).
+
+    Returns:
+        dict: {ответ[кодек]: {'size', 'encode_p50', 'encode_p95',
+        'decode_p50'}}; время в секундах, размер в байтах.
+    """
+    client = Client(HTTP_AUTHORIZATION=f'Token {context["token"]}')
+    results = {}
+    for name, path in CODEC_PAYLOADS:
+        data = client.get(path.format(**context)).data
+        for codec, renderer, parser in get_codecs():
+            content = renderer.render(data, renderer.media_type, {})
+            encode, decode = [], []
+            for _ in range(iterations):
+                started = time.perf_counter()
+                renderer.render(data, renderer.media_type, {})
+                encode.append(time.perf_counter() - started)
+                started = time.perf_counter()
+                parser.parse(BytesIO(content), parser.media_type, {})
+                decode.append(time.perf_counter() - started)
+            results[f'{name}[{codec}]'] = {
+                'size': len(content),
+                'encode_p50': percentile(encode, 50),
+                'encode_p95': percentile(encode, 95),
+                'decode_p50': percentile(decode, 50),
+            }
+    return results
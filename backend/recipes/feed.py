@@ -0,0 +1,210 @@
+from typing import Iterator, List, Tuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from core.constants.recipes import (FEED_BACKFILL_LIMIT,
+                                    FEED_FANOUT_BATCH_SIZE,
+                                    FEED_FANOUT_MAX_FOLLOWERS)
+from recipes.models import PulledAuthor, Recipe, TimelineEntry
+from users.models import Subscription, User
+
+TIMELINE_ORDERING = ('-pub_date', '-recipe_id')
+RECIPE_ORDERING = ('-pub_date', '-id')
+
+
+def is_pulled(followers_count: int) -> bool:
+    """
+    Проверяет, читаются ли рецепты автора напрямую при чтении ленты.
+
+    Рецепты автора с очень большим числом подписчиков не раскладываются
+    по лентам: такая запись заняла бы пул фоновых задач надолго. Запись
+    лент следует этой проверке, а чтение - таблице PulledAuthor, которую
+    приводит в соответствие update_feed_mode.
+    """
+    return followers_count > FEED_FANOUT_MAX_FOLLOWERS
+
+
+def follower_batches(author_id: int) -> Iterator[List[int]]:
+    """
+    Возвращает id подписчиков автора по возрастанию пачками по
+    FEED_FANOUT_BATCH_SIZE.
+    """
+    followers = Subscription.objects.filter(
+        target_user_id=author_id
+    ).order_by('subscriber_id').values_list('subscriber_id', flat=True)
+    last_id = 0
+    while True:
+        batch = list(followers.filter(
+            subscriber_id__gt=last_id)[:FEED_FANOUT_BATCH_SIZE])
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1]
+
+
+def fan_out_recipe(recipe_id: int) -> None:
+    """
+    Добавляет новый рецепт в ленты подписчиков автора.
+
+    Подписчики выбираются пачками (follower_batches), каждая пачка
+    записывается одним запросом в своей транзакции. Выполняется в фоне
+    (run_in_background).
+
+    Args:
+        recipe_id (int): Идентификатор рецепта.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id).values_list(
+        'pub_date', 'author_id', 'author__followers_count').first()
+    if recipe is None or is_pulled(recipe[2]):
+        return
+    pub_date, author_id, _ = recipe
+    for batch in follower_batches(author_id):
+        try:
+            TimelineEntry.objects.bulk_create(
+                (TimelineEntry(user_id=user_id, recipe_id=recipe_id,
+                               author_id=author_id, pub_date=pub_date)
+                 for user_id in batch),
+                ignore_conflicts=True)
+        except IntegrityError:
+            # Рецепт удален, пока раскладывались предыдущие пачки.
+            return
+
+
+def update_feed_mode(author_id: int) -> None:
+    """
+    Приводит режим чтения рецептов автора (PulledAuthor) в соответствие
+    с числом его подписчиков (is_pulled).
+
+    При переходе к чтению напрямую сначала включается чтение, затем
+    записи автора удаляются из лент. При переходе к раскладке ленты
+    подписчиков сначала пополняются последними FEED_BACKFILL_LIMIT
+    рецептами автора, как при подписке, и только затем чтение напрямую
+    выключается. Пока автор в PulledAuthor, его записи в лентах не
+    читаются, поэтому рецепты не пропадают и не дублируются.
+    Проверка повторяется, если число подписчиков снова пересекло порог
+    за время переключения. Выполняется в фоне (run_in_background).
+
+    Args:
+        author_id (int): Идентификатор автора.
+    """
+    while True:
+        followers_count = User.objects.filter(pk=author_id).values_list(
+            'followers_count', flat=True).first()
+        if followers_count is None:
+            return
+        pulled = PulledAuthor.objects.filter(author_id=author_id).exists()
+        if is_pulled(followers_count) == pulled:
+            return
+        if not pulled:
+            PulledAuthor.objects.get_or_create(author_id=author_id)
+            TimelineEntry.objects.filter(author_id=author_id).delete()
+            continue
+        recipes = list(Recipe.objects.filter(author_id=author_id).order_by(
+            *RECIPE_ORDERING).values_list(
+            'id', 'pub_date')[:FEED_BACKFILL_LIMIT])
+        for batch in follower_batches(author_id):
+            try:
+                TimelineEntry.objects.bulk_create(
+                    (TimelineEntry(user_id=user_id, recipe_id=recipe_id,
+                                   author_id=author_id, pub_date=pub_date)
+                     for user_id in batch
+                     for recipe_id, pub_date in recipes),
+                    ignore_conflicts=True)
+            except IntegrityError:
+                # Рецепт удален во время пополнения: берем рецепты заново.
+                break
+        else:
+            PulledAuthor.objects.filter(author_id=author_id).delete()
+
+
+def update_feed_modes() -> int:
+    """
+    Приводит режим чтения в соответствие с числом подписчиков для всех
+    авторов, у которых он может расходиться: подписки и счетчики,
+    измененные в обход API (seed_data, reconcile_counters), не
+    запускают update_feed_mode.
+
+    Returns:
+        int: Количество проверенных авторов.
+    """
+    authors = User.objects.filter(
+        Q(followers_count__gt=FEED_FANOUT_MAX_FOLLOWERS)
+        | Q(pulled_feed__isnull=False)
+    ).values_list('pk', flat=True)
+    checked = 0
+    for author_id in authors.iterator():
+        update_feed_mode(author_id)
+        checked += 1
+    return checked
+
+
+def backfill_timeline(user_id: int, author) -> None:
+    """
+    Добавляет в ленту пользователя последние FEED_BACKFILL_LIMIT
+    рецептов автора после подписки на него.
+
+    Args:
+        user_id (int): Идентификатор подписчика.
+        author (User): Автор.
+    """
+    if is_pulled(author.followers_count):
+        return
+    recipes = Recipe.objects.filter(author=author).order_by(
+        *RECIPE_ORDERING).values_list('id', 'pub_date')[:FEED_BACKFILL_LIMIT]
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, recipe_id=recipe_id,
+                       author_id=author.pk, pub_date=pub_date)
+         for recipe_id, pub_date in recipes),
+        ignore_conflicts=True)
+
+
+def prune_timeline(user_id: int, author_id: int) -> None:
+    """
+    Удаляет из ленты пользователя рецепты автора после отписки.
+
+    Args:
+        user_id (int): Идентификатор бывшего подписчика.
+        author_id (int): Идентификатор автора.
+    """
+    TimelineEntry.objects.filter(user_id=user_id,
+                                 author_id=author_id).delete()
+
+
+def rebuild_timeline(user) -> None:
+    """
+    Пересобирает ленту пользователя по его текущим подпискам.
+
+    Args:
+        user (User): Пользователь.
+    """
+    with transaction.atomic():
+        TimelineEntry.objects.filter(user=user).delete()
+        for subscription in Subscription.objects.filter(
+                subscriber=user).select_related('target_user'):
+            backfill_timeline(user.pk, subscription.target_user)
+
+
+def get_feed_sources(user) -> List[Tuple]:
+    """
+    Возвращает упорядоченные источники ленты пользователя для
+    MergedKeysetPagination: его записи TimelineEntry и рецепты авторов,
+    которые читаются напрямую (PulledAuthor). Записи таких авторов в
+    ленте пропускаются.
+
+    Args:
+        user (User): Пользователь.
+
+    Returns:
+        list: Пары (queryset, ordering).
+    """
+    pulled_ids = list(Subscription.objects.filter(
+        subscriber=user, target_user__pulled_feed__isnull=False
+    ).values_list('target_user_id', flat=True))
+    timeline = TimelineEntry.objects.filter(user=user)
+    if not pulled_ids:
+        return [(timeline, TIMELINE_ORDERING)]
+    return [
+        (timeline.exclude(author_id__in=pulled_ids), TIMELINE_ORDERING),
+        (Recipe.objects.filter(author_id__in=pulled_ids), RECIPE_ORDERING),
+    ]
@@ -0,0 +1,114 @@
+import base64
+import io
+import os
+from typing import Iterable
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from core.constants.recipes import (IMAGE_JPEG_QUALITY, IMAGE_MAX_SIZE,
+                                    IMAGE_PLACEHOLDER_WIDTH,
+                                    IMAGE_VARIANT_WIDTHS, IMAGE_WEBP_QUALITY)
+from recipes.models import Recipe
+from recipes.versions import bump_recipes
+
+VARIANTS_DIR = 'variants'
+
+
+def encode(image: Image.Image, image_format: str, **options) -> bytes:
+    """Кодирует изображение в заданный формат."""
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def resize(image: Image.Image, width: int) -> Image.Image:
+    """Уменьшает изображение до заданной ширины с сохранением пропорций."""
+    if image.width <= width:
+        return image
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def get_variant_files(variants: dict) -> list:
+    """Возвращает имена файлов всех вариантов изображения."""
+    return [name for formats in variants.values() for name in formats.values()]
+
+
+def delete_image_files(names: Iterable[str]) -> None:
+    """Удаляет файлы изображений рецептов из хранилища."""
+    storage = Recipe.image.field.storage
+    for name in names:
+        storage.delete(name)
+
+
+def process_recipe_image(recipe_id: int,
+                         stale_files: Iterable[str] = ()) -> None:
+    """
+    Обрабатывает изображение рецепта после загрузки.
+
+    Ограничивает разрешение оригинала (IMAGE_MAX_SIZE), создает
+    уменьшенные варианты в форматах WebP и JPEG для каждой ширины из
+    IMAGE_VARIANT_WIDTHS, миниатюру-заглушку в виде data URI и
+    сохраняет размеры изображения.
+
+    Если за время обработки изображение рецепта заменили, результат
+    отбрасывается (его обработает задача для нового изображения).
+
+    Args:
+        recipe_id (int): Идентификатор рецепта.
+        stale_files (Iterable[str]): Файлы вариантов прежнего
+        изображения, которые нужно удалить.
+    """
+    delete_image_files(stale_files)
+    storage = Recipe.image.field.storage
+    recipe = Recipe.objects.filter(pk=recipe_id).only('image').first()
+    if recipe is None or not recipe.image:
+        return
+    source_name = recipe.image.name
+    with storage.open(source_name, 'rb') as source:
+        image = Image.open(source)
+        image_format = image.format
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    image_name = source_name
+    if max(image.size) > IMAGE_MAX_SIZE:
+        image.thumbnail((IMAGE_MAX_SIZE, IMAGE_MAX_SIZE), Image.LANCZOS)
+        image_name = storage.save(source_name, ContentFile(encode(
+            image, image_format,
+            **({'quality': IMAGE_JPEG_QUALITY}
+               if image_format == 'JPEG' else {}))))
+
+    rgb = image.convert('RGB')
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    variants = {}
+    for variant, width in IMAGE_VARIANT_WIDTHS.items():
+        resized = resize(rgb, width)
+        variants[variant] = {
+            'webp': storage.save(
+                f'{VARIANTS_DIR}/{stem}_{width}.webp',
+                ContentFile(encode(resized, 'WEBP',
+                                   quality=IMAGE_WEBP_QUALITY))),
+            'jpeg': storage.save(
+                f'{VARIANTS_DIR}/{stem}_{width}.jpg',
+                ContentFile(encode(resized, 'JPEG',
+                                   quality=IMAGE_JPEG_QUALITY,
+                                   optimize=True, progressive=True))),
+        }
+    placeholder = base64.b64encode(encode(
+        resize(rgb, IMAGE_PLACEHOLDER_WIDTH), 'JPEG', quality=50)).decode()
+
+    updated = Recipe.objects.filter(pk=recipe_id, image=source_name).update(
+        image=image_name,
+        image_width=image.width,
+        image_height=image.height,
+        image_variants=variants,
+        image_placeholder=f'data:image/jpeg;base64,{placeholder}'
+    )
+    if updated:
+        bump_recipes([recipe_id])
+    else:
+        delete_image_files(get_variant_files(variants))
+    if image_name != source_name:
+        storage.delete(image_name if not updated else source_name)
@@ -0,0 +1,222 @@
+import csv
+import io
+import json
+from collections import Counter
+from typing import Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from django.db import connection, transaction
+
+from core.constants.recipes import INGREDIENT_LENGTH
+from recipes.models import Ingredient
+from recipes.seeding import escape_copy
+
+STAGING_TABLE = 'recipes_ingredient_import'
+JSON_READ_SIZE = 64 * 1024
+
+Row = Tuple[str, str]
+
+
+def read_csv(file: TextIO) -> Iterator[Optional[Row]]:
+    """
+    Читает строки "название,единица измерения".
+
+    Вместо некорректных строк возвращается None.
+    """
+    for row in csv.reader(file):
+        yield tuple(row) if len(row) == 2 else None
+
+
+def iter_json_values(file: TextIO) -> Iterator:
+    """
+    Читает JSON-массив объектов или объекты, записанные подряд
+    (JSON Lines), не загружая файл в память целиком.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,[]':
+            position += 1
+        if position == len(buffer):
+            if eof:
+                return
+            buffer, position = file.read(JSON_READ_SIZE), 0
+            eof = not buffer
+            continue
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = file.read(JSON_READ_SIZE)
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        # Значение могло оборваться на границе прочитанного фрагмента.
+        if end == len(buffer) and not eof:
+            chunk = file.read(JSON_READ_SIZE)
+            if chunk:
+                buffer, position = buffer[position:] + chunk, 0
+                continue
+            eof = True
+        yield value
+        position = end
+
+
+def read_json(file: TextIO) -> Iterator[Optional[Row]]:
+    """
+    Читает объекты {"name": ..., "measurement_unit": ...}.
+
+    Вместо некорректных объектов возвращается None.
+    """
+    for value in iter_json_values(file):
+        if (isinstance(value, dict)
+                and isinstance(value.get('name'), str)
+                and isinstance(value.get('measurement_unit'), str)):
+            yield value['name'], value['measurement_unit']
+        else:
+            yield None
+
+
+READERS = {'csv': read_csv, 'json': read_json}
+
+
+def clean(row: Optional[Row]) -> Optional[Row]:
+    """Убирает пробелы по краям; None, если строка некорректна."""
+    if row is None:
+        return None
+    name, unit = (value.strip() for value in row)
+    if not name or not unit or max(len(name), len(unit)) > INGREDIENT_LENGTH:
+        return None
+    return name, unit
+
+
+def deduplicate(rows: List[Row], update_units: bool) -> List[Row]:
+    """
+    Убирает повторы внутри пачки: одинаковые пары, а при update_units -
+    повторы названия (остается последняя единица измерения).
+    """
+    if update_units:
+        return list(dict(rows).items())
+    return list(dict.fromkeys(rows))
+
+
+def upsert_postgresql(rows: List[Row], update_units: bool) -> Tuple[int, int]:
+    """
+    Загружает пачку во временную таблицу командой COPY и переносит ее
+    в каталог двумя запросами.
+
+    Returns:
+        tuple: Количество добавленных и обновленных ингредиентов.
+    """
+    table = connection.ops.quote_name(Ingredient._meta.db_table)
+    buffer = io.StringIO(''.join(
+        f'{escape_copy(name)}\t{escape_copy(unit)}\n' for name, unit in rows))
+    updated = 0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE {STAGING_TABLE} '
+            f'(name varchar({INGREDIENT_LENGTH}), '
+            f'measurement_unit varchar({INGREDIENT_LENGTH})) '
+            f'ON COMMIT DROP')
+        cursor.copy_expert(
+            f'COPY {STAGING_TABLE} (name, measurement_unit) FROM STDIN',
+            buffer)
+        if update_units:
+            cursor.execute(
+                f'UPDATE {table} i '
+                f'SET measurement_unit = s.measurement_unit '
+                f'FROM {STAGING_TABLE} s '
+                f'WHERE i.name = s.name '
+                f'AND i.measurement_unit <> s.measurement_unit '
+                f'AND NOT EXISTS (SELECT 1 FROM {table} o '
+                f'WHERE o.name = i.name AND o.id <> i.id)')
+            updated = cursor.rowcount
+        cursor.execute(
+            f'INSERT INTO {table} (name, measurement_unit) '
+            f'SELECT name, measurement_unit FROM {STAGING_TABLE} '
+            f'ON CONFLICT (name, measurement_unit) DO NOTHING')
+        inserted = cursor.rowcount
+    return inserted, updated
+
+
+def upsert_orm(rows: List[Row], update_units: bool) -> Tuple[int, int]:
+    """
+    То же, что upsert_postgresql, через ORM: одна выборка существующих
+    ингредиентов с этими названиями, bulk_update и bulk_create.
+    """
+    units_by_name = {}
+    for pk, name, unit in Ingredient.objects.filter(
+            name__in={name for name, _ in rows}
+    ).values_list('id', 'name', 'measurement_unit'):
+        units_by_name.setdefault(name, []).append((pk, unit))
+    to_create, to_update = [], []
+    for name, unit in rows:
+        existing = units_by_name.get(name, [])
+        if any(existing_unit == unit for _, existing_unit in existing):
+            continue
+        if update_units and len(existing) == 1:
+            to_update.append(Ingredient(id=existing[0][0],
+                                        measurement_unit=unit))
+        else:
+            to_create.append(Ingredient(name=name, measurement_unit=unit))
+    Ingredient.objects.bulk_update(to_update, ['measurement_unit'])
+    Ingredient.objects.bulk_create(to_create, ignore_conflicts=True)
+    return len(to_create), len(to_update)
+
+
+def import_ingredients(rows: Iterable[Optional[Row]], batch_size: int,
+                       update_units: bool = False,
+                       progress=None) -> Counter:
+    """
+    Импортирует ингредиенты пачками по batch_size строк.
+
+    Ключ ингредиента - пара (название, единица измерения): новые пары
+    добавляются, существующие пропускаются, поэтому импорт можно
+    повторять. При update_units единица измерения существующего
+    ингредиента заменяется, если в каталоге ровно один ингредиент с
+    таким названием. Каждая пачка обрабатывается в своей транзакции,
+    в памяти одновременно находится не больше одной пачки.
+
+    Args:
+        rows (Iterable): Пары (название, единица измерения) или None
+        для некорректных строк.
+        batch_size (int): Размер пачки.
+        update_units (bool): Обновлять единицы измерения.
+        progress (callable, optional): Вызывается со счетчиками после
+        каждой пачки.
+
+    Returns:
+        Counter: Количество прочитанных (read), добавленных (inserted),
+        обновленных (updated), пропущенных (skipped) и некорректных
+        (invalid) строк.
+    """
+    upsert = (upsert_postgresql if connection.vendor == 'postgresql'
+              else upsert_orm)
+    stats = Counter(read=0, inserted=0, updated=0, skipped=0, invalid=0)
+    batch = []
+
+    def flush():
+        unique = deduplicate(batch, update_units)
+        with transaction.atomic():
+            inserted, updated = upsert(unique, update_units)
+        stats['inserted'] += inserted
+        stats['updated'] += updated
+        stats['skipped'] += len(batch) - inserted - updated
+        batch.clear()
+        if progress is not None:
+            progress(stats)
+
+    for row in rows:
+        stats['read'] += 1
+        row = clean(row)
+        if row is None:
+            stats['invalid'] += 1
+            continue
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return stats
@@ -0,0 +1,172 @@
+import re
+from array import array
+from bisect import bisect_left
+from threading import Lock
+from typing import Iterable, List, Optional, Tuple
+
+from core.background import run_in_background
+from core.constants.recipes import INGREDIENT_SEARCH_LIMIT
+from core.versions import get_version
+from recipes.models import Ingredient
+
+INGREDIENTS_VERSION_KEY = 'ingredients'
+TRIGRAM_LENGTH = 3
+WORD_SEPARATOR = re.compile(r'[\W_]+')
+
+
+def add_postings(index: dict, position: int, grams: Iterable[str]) -> None:
+    """Добавляет позицию в списки позиций подстрок grams."""
+    for gram in grams:
+        postings = index.get(gram)
+        if postings is None:
+            postings = index[gram] = array('I')
+        postings.append(position)
+
+
+class IngredientIndex:
+    """
+    Индекс для автодополнения названий ингредиентов в памяти процесса.
+
+    Названия хранятся в отсортированном массиве, поэтому совпадения по
+    префиксу находятся бинарным поиском. Для поиска по подстроке
+    используется триграммный индекс: кандидаты берутся из самого
+    короткого списка позиций для триграмм запроса и затем проверяются.
+    Запрос короче трех символов ищется по началу названия и по началу
+    остальных слов названия (индекс префиксов слов): списки позиций
+    для всех одно- и двухсимвольных подстрок занимали бы в несколько
+    раз больше памяти, чем сами названия. Совпадения по префиксу
+    выдаются первыми, затем остальные; внутри каждой группы - в
+    алфавитном порядке.
+
+    Attributes:
+        - keys (list): Названия в нижнем регистре, отсортированные.
+        - rows (list): Кортежи (id, name, measurement_unit) в том же порядке.
+        - trigrams (dict): Триграмма -> массив позиций в keys.
+        - word_prefixes (dict): Первые один и два символа слова (кроме
+        первого слова названия) -> массив позиций в keys.
+    """
+
+    def __init__(self, rows: Iterable[Tuple[int, str, str]]):
+        entries = sorted(((name.casefold(), pk, name, unit)
+                          for pk, name, unit in rows))
+        self.keys = [entry[0] for entry in entries]
+        self.rows = [entry[1:] for entry in entries]
+        self.trigrams = {}
+        self.word_prefixes = {}
+        for position, key in enumerate(self.keys):
+            add_postings(self.trigrams, position, {
+                key[index:index + TRIGRAM_LENGTH]
+                for index in range(len(key) - TRIGRAM_LENGTH + 1)})
+            add_postings(self.word_prefixes, position, {
+                word[:length] for word in WORD_SEPARATOR.split(key)[1:]
+                for length in range(1, TRIGRAM_LENGTH)})
+
+    def __len__(self):
+        return len(self.keys)
+
+    def search(self, query: str,
+               limit: Optional[int] = INGREDIENT_SEARCH_LIMIT
+               ) -> List[Tuple[int, str, str]]:
+        """
+        Ищет ингредиенты по префиксу, а затем по подстроке названия.
+
+        Args:
+            query (str): Строка поиска (без учета регистра).
+            limit (int, optional): Максимальное количество результатов,
+            None - без ограничения.
+
+        Returns:
+            list: Кортежи (id, name, measurement_unit).
+        """
+        query = query.strip().casefold()
+        if not query or limit == 0:
+            return []
+        found = []
+        start = bisect_left(self.keys, query)
+        for position in range(start, len(self.keys)):
+            if not self.keys[position].startswith(query):
+                break
+            found.append(position)
+            if len(found) == limit:
+                return [self.rows[position] for position in found]
+        prefix_end = start + len(found)
+        for position in self.substring_positions(query):
+            if start <= position < prefix_end:
+                continue
+            found.append(position)
+            if len(found) == limit:
+                break
+        return [self.rows[position] for position in found]
+
+    def substring_positions(self, query: str) -> Iterable[int]:
+        """
+        Возвращает позиции названий, содержащих query, по порядку
+        (для запроса короче трех символов - названий, в которых с query
+        начинается одно из слов).
+        """
+        if len(query) < TRIGRAM_LENGTH:
+            yield from self.word_prefixes.get(query, ())
+            return
+        postings = []
+        for index in range(len(query) - TRIGRAM_LENGTH + 1):
+            trigram = self.trigrams.get(query[index:index + TRIGRAM_LENGTH])
+            if trigram is None:
+                return
+            postings.append(trigram)
+        for position in min(postings, key=len):
+            if query in self.keys[position]:
+                yield position
+
+
+_index = None
+_index_version = None
+_index_lock = Lock()
+_rebuilding = False
+
+
+def load_ingredient_index() -> IngredientIndex:
+    """Строит индекс по текущему каталогу ингредиентов."""
+    return IngredientIndex(
+        Ingredient.objects.order_by().values_list(
+            'id', 'name', 'measurement_unit').iterator())
+
+
+def rebuild_ingredient_index(version) -> None:
+    """
+    Строит индекс для версии каталога version и подменяет им текущий.
+
+    Версия читается до чтения каталога, поэтому если каталог изменился
+    во время построения, следующий запрос снова запустит перестроение.
+    """
+    global _index, _index_version, _rebuilding
+    try:
+        index = load_ingredient_index()
+        with _index_lock:
+            _index, _index_version = index, version
+    finally:
+        _rebuilding = False
+
+
+def get_ingredient_index() -> Optional[IngredientIndex]:
+    """
+    Возвращает индекс ингредиентов.
+
+    Индекс строится в фоновом пуле (run_in_background): первый раз -
+    при запуске воркера (post_worker_init в gunicorn.conf.py) или при
+    первом обращении, затем - каждый раз, когда каталог изменился
+    (версия 'ingredients' увеличивается при записи). Пока идет
+    перестроение, запросы получают прежний индекс.
+
+    Returns:
+        IngredientIndex: Индекс каталога или None, если первый индекс
+        процесса еще не построен.
+    """
+    global _rebuilding
+    version = get_version(INGREDIENTS_VERSION_KEY)
+    if _index is not None and _index_version == version:
+        return _index
+    with _index_lock:
+        if _index_version != version and not _rebuilding:
+            _rebuilding = True
+            run_in_background(rebuild_ingredient_index, version)
+        return _index
@@ -0,0 +1,131 @@
+import json
+from datetime import datetime, timezone
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from recipes.benchmark import (SCENARIOS, benchmark_database, compare, run,
+                               seed_dataset)
+
+DATASET_OPTIONS = (
+    'users', 'recipes', 'ingredients', 'tags', 'ingredients_per_recipe',
+    'favorites_per_user', 'carts_per_user', 'subscriptions_per_user', 'seed')
+
+
+def add_dataset_arguments(parser, ingredients: int = 300) -> None:
+    """Добавляет параметры набора данных (seed_dataset)."""
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--recipes', type=int, default=500)
+    parser.add_argument('--ingredients', type=int, default=ingredients)
+    parser.add_argument('--tags', type=int, default=6)
+    parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+    parser.add_argument('--favorites-per-user', type=int, default=20)
+    parser.add_argument('--carts-per-user', type=int, default=5)
+    parser.add_argument('--subscriptions-per-user', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Начальное значение генератора данных.')
+
+
+def get_dataset(options: dict) -> dict:
+    """Возвращает параметры набора данных из опций команды."""
+    if options['users'] < 3 or options['recipes'] < 12:
+        raise CommandError('Нужно не меньше 3 пользователей '
+                           'и 12 рецептов.')
+    return {key: options[key] for key in DATASET_OPTIONS}
+
+
+class Command(BaseCommand):
+    """
+    Команда управления Django для замера производительности API.
+
+    Создает отдельную тестовую БД, заполняет ее набором данных
+    заданного размера и прогоняет все адреса api/v1/urls.py через
+    тестовый клиент Django анонимно и от имени пользователя. Для
+    каждого адреса выводятся p50/p95/p99 времени ответа, количество
+    запросов к БД и пиковая память. Рабочая БД, кеш и каталог media
+    не затрагиваются.
+
+    Пример использования:
+        python manage.py bench_api --recipes 5000 --save baseline.json
+        python manage.py bench_api --compare baseline.json --threshold 15
+
+    Вывод:
+        - Таблица результатов.
+        - Список регрессий относительно --compare; при их наличии
+        команда завершается с ошибкой.
+    """
+    help = 'Benchmark API endpoints on a seeded test database'
+
+    def add_arguments(self, parser):
+        add_dataset_arguments(parser)
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument(
+            '--scenario', action='append',
+            choices=[scenario.name for scenario in SCENARIOS],
+            help='Прогнать только этот сценарий (можно несколько раз).')
+        parser.add_argument('--save', help='Сохранить результаты в JSON.')
+        parser.add_argument('--compare',
+                            help='Сравнить с результатами из JSON.')
+        parser.add_argument(
+            '--threshold', type=float, default=20.0,
+            help='Допустимый рост p95 и памяти, в процентах.')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """
+        Обработка команды замера производительности.
+
+        Args:
+            *args (Any): Позиционные аргументы.
+            **options (Any): Ключевые аргументы.
+        """
+        dataset = get_dataset(options)
+        baseline = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                baseline = json.load(file)
+
+        with benchmark_database():
+            self.stdout.write('Заполнение БД...')
+            context = seed_dataset(**dataset)
+            self.stdout.write('Прогон сценариев...')
+            results = run(context, options['iterations'],
+                          options['warmup'], options['scenario'])
+
+        self.print_results(results)
+        if options['save']:
+            with open(options['save'], 'w', encoding='utf-8') as file:
+                json.dump({
+                    'created_at': datetime.now(timezone.utc).isoformat(),
+                    'vendor': connection.vendor,
+                    'dataset': dataset,
+                    'iterations': options['iterations'],
+                    'results': results,
+                }, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Результаты сохранены в {options["save"]}.')
+        if baseline is None:
+            return
+        if baseline.get('dataset') != dataset:
+            self.stdout.write(self.style.WARNING(
+                'Набор данных отличается от сохраненного.'))
+        regressions = compare(results, baseline['results'],
+                              options['threshold'])
+        if regressions:
+            for regression in regressions:
+                self.stdout.write(self.style.ERROR(regression))
+            raise CommandError(f'Регрессий: {len(regressions)}.')
+        self.stdout.write(self.style.SUCCESS('Регрессий нет.'))
+
+    def print_results(self, results: dict) -> None:
+        self.stdout.write(
+            f'{"сценарий":<32}{"код":>5}{"p50 мс":>10}{"p95 мс":>10}'
+            f'{"p99 мс":>10}{"запросы":>9}{"память КиБ":>12}')
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<32}{result["status"]:>5}'
+                f'{result["p50"] * 1000:>10.2f}'
+                f'{result["p95"] * 1000:>10.2f}'
+                f'{result["p99"] * 1000:>10.2f}'
+                f'{result["queries"]:>9}'
+                f'{result["peak_memory"] / 1024:>12.1f}')
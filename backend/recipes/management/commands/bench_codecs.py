@@ -0,0 +1,60 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from recipes.benchmark import benchmark_database, run_codecs, seed_dataset
+from recipes.management.commands.bench_api import (add_dataset_arguments,
+                                                   get_dataset)
+
+
+class Command(BaseCommand):
+    """
+    Команда управления Django для сравнения кодеков ответов API.
+
+    Как и bench_api, заполняет отдельную тестовую БД, получает данные
+    самых больших ответов (каталог ингредиентов, страница из 100
+    рецептов, рецепт, подписки с превью) и замеряет их кодирование и
+    разбор стандартным JSONRenderer, orjson и MessagePack (если
+    установлены).
+
+    Пример использования:
+        python manage.py bench_codecs --ingredients 2000 --iterations 100
+
+    Вывод:
+        - Таблица с размером ответа, временем кодирования и разбора и
+        ускорением кодирования относительно стандартного JSON.
+    """
+    help = 'Compare JSON, orjson and MessagePack encoding of API responses'
+
+    def add_arguments(self, parser):
+        add_dataset_arguments(parser, ingredients=2000)
+        parser.add_argument('--iterations', type=int, default=50)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """
+        Обработка команды сравнения кодеков.
+
+        Args:
+            *args (Any): Позиционные аргументы.
+            **options (Any): Ключевые аргументы.
+        """
+        dataset = get_dataset(options)
+        with benchmark_database():
+            self.stdout.write('Заполнение БД...')
+            context = seed_dataset(**dataset)
+            self.stdout.write('Замер кодеков...')
+            results = run_codecs(context, options['iterations'])
+
+        self.stdout.write(
+            f'{"ответ":<32}{"КиБ":>9}{"кодир. p50":>12}{"p95 мс":>9}'
+            f'{"разбор p50":>12}{"ускорение":>11}')
+        baseline = {}
+        for name, result in results.items():
+            payload = name.split('[')[0]
+            baseline.setdefault(payload, result['encode_p50'])
+            self.stdout.write(
+                f'{name:<32}{result["size"] / 1024:>9.1f}'
+                f'{result["encode_p50"] * 1000:>12.2f}'
+                f'{result["encode_p95"] * 1000:>9.2f}'
+                f'{result["decode_p50"] * 1000:>12.2f}'
+                f'{baseline[payload] / result["encode_p50"]:>10.1f}x')
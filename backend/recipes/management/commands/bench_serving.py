@@ -0,0 +1,88 @@
+import tempfile
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.benchmark import benchmark_database, seed_dataset
+from recipes.management.commands.bench_api import (add_dataset_arguments,
+                                                   get_dataset)
+from recipes.serving_benchmark import (SERVER_MODES, run_serving,
+                                       write_server_settings)
+
+
+class Command(BaseCommand):
+    """
+    Команда управления Django для сравнения режимов работы сервера.
+
+    Как и bench_api, заполняет отдельную тестовую БД, затем по очереди
+    запускает gunicorn с gunicorn.conf.py в режимах wsgi (синхронные
+    воркеры) и asgi (воркеры uvicorn с пулом потоков core.asgi) и
+    нагружает каждый смешанным потоком запросов из --concurrency
+    соединений: списки и карточки рецептов, поиск ингредиентов,
+    подписки, лента, PDF списка покупок и создание рецепта с
+    изображением. На PostgreSQL результаты ближе к боевым: SQLite
+    блокирует БД на время каждой записи.
+
+    Пример использования:
+        python manage.py bench_serving --concurrency 16 --requests 50
+        python manage.py bench_serving --mode asgi --threads 4
+
+    Вывод:
+        - Таблица с пропускной способностью, количеством ошибок и
+        p50/p95/p99 времени ответа по режимам и сценариям.
+    """
+    help = 'Compare WSGI and ASGI serving modes under a mixed workload'
+
+    def add_arguments(self, parser):
+        add_dataset_arguments(parser)
+        parser.add_argument('--mode', action='append', choices=SERVER_MODES,
+                            help='Режим сервера (можно несколько раз).')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Количество воркеров gunicorn.')
+        parser.add_argument('--threads', type=int, default=8,
+                            help='ASGI_THREADS воркера в режиме asgi.')
+        parser.add_argument('--concurrency', type=int, default=16,
+                            help='Количество одновременных соединений.')
+        parser.add_argument('--requests', type=int, default=30,
+                            help='Пачек запросов на соединение.')
+        parser.add_argument('--warmup', type=int, default=2)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """
+        Обработка команды сравнения режимов сервера.
+
+        Args:
+            *args (Any): Позиционные аргументы.
+            **options (Any): Ключевые аргументы.
+        """
+        dataset = get_dataset(options)
+        results = {}
+        with benchmark_database(shared=True):
+            self.stdout.write('Заполнение БД...')
+            context = seed_dataset(**dataset)
+            with tempfile.TemporaryDirectory() as directory:
+                write_server_settings(directory)
+                for mode in options['mode'] or SERVER_MODES:
+                    self.stdout.write(f'Прогон в режиме {mode}...')
+                    try:
+                        results[mode] = run_serving(
+                            context, mode, directory, options['workers'],
+                            options['threads'], options['concurrency'],
+                            options['requests'], options['warmup'])
+                    except RuntimeError as error:
+                        raise CommandError(
+                            f'Ошибка сервера {mode}: {error}')
+
+        self.stdout.write(
+            f'{"режим/сценарий":<28}{"запросы":>9}{"ошибки":>8}'
+            f'{"p50 мс":>10}{"p95 мс":>10}{"p99 мс":>10}{"запр./с":>10}')
+        for mode, mode_results in results.items():
+            for name, result in mode_results.items():
+                throughput = result.get('throughput')
+                self.stdout.write(
+                    f'{mode + "/" + name:<28}{result["requests"]:>9}'
+                    f'{result["errors"]:>8}'
+                    f'{result["p50"] * 1000:>10.1f}'
+                    f'{result["p95"] * 1000:>10.1f}'
+                    f'{result["p99"] * 1000:>10.1f}'
+                    + (f'{throughput:>10.1f}' if throughput else ''))
@@ -1,72 +1,90 @@
 import csv
+import json
+from pathlib import Path
 from typing import Any
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
-from recipes.models import Ingredient
+from core.constants.recipes import INGREDIENT_IMPORT_BATCH_SIZE
+from core.versions import bump_version
+from recipes.ingredient_import import READERS, import_ingredients
+from recipes.ingredient_index import INGREDIENTS_VERSION_KEY
 
 
 class Command(BaseCommand):
     """
-    Команда управления Django для импорта данных из CSV-файла в
-    модель Ingredient.
+    Команда управления Django для импорта ингредиентов из CSV- или
+    JSON-файла в модель Ingredient.
 
-    Эта команда читает данные из CSV-файла и импортирует их в модель Ingredient
-    в базе данных.
+    Файл читается потоком и импортируется пачками по --batch-size
+    строк, поэтому память не зависит от размера каталога. В PostgreSQL
+    пачка загружается командой COPY во временную таблицу и переносится
+    в каталог запросом INSERT ... ON CONFLICT. Ингредиенты с уже
+    существующей парой (название, единица измерения) пропускаются,
+    поэтому импорт можно запускать повторно.
+
+    Форматы:
+        - CSV: строки "название,единица измерения".
+        - JSON: массив объектов {"name": ..., "measurement_unit": ...}
+        или такие объекты по одному в строке (JSON Lines).
 
     Пример использования:
         python manage.py import_ingredients
-
-    Эта команда будет обновлять существующие ингредиенты или создавать новые на
-    основе данных в CSV-файле.
+        python manage.py import_ingredients --file data/ingredients.json
+        python manage.py import_ingredients --file units.csv --update-units
 
     Вывод:
-        - Успешный импорт: Выводит сообщение об успешном выполнении.
-        - Ошибка импорта: Выводит сообщение об ошибке.
-
-    Примечание:
-        - Убедитесь, что файл 'ingredients.csv' лежит в правильной
-        директории 'core/ingredients.csv'.
+        - Прогресс после каждой пачки.
+        - Количество добавленных, обновленных, пропущенных и
+        некорректных строк.
     """
-    help = 'Import data from a CSV file into the Ingredient model'
+    help = 'Import ingredients from a CSV or JSON file into the catalog'
 
-    def handle(self, *args: Any, **options: Any) -> str:
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default='core/ingredients.csv',
+                            help='Путь к файлу с ингредиентами.')
+        parser.add_argument(
+            '--format', choices=sorted(READERS),
+            help='Формат файла (по умолчанию - по расширению).')
+        parser.add_argument('--batch-size', type=int,
+                            default=INGREDIENT_IMPORT_BATCH_SIZE)
+        parser.add_argument(
+            '--update-units', action='store_true',
+            help='Заменять единицу измерения, если в каталоге ровно один '
+                 'ингредиент с таким названием.')
+
+    def handle(self, *args: Any, **options: Any) -> None:
         """
         Обработка команды для импорта ингредиентов.
 
         Args:
             *args (Any): Позиционные аргументы.
             **options (Any): Ключевые аргументы.
-
-        Returns:
-            str: Результат выполнения операции импорта.
         """
-        try:
-            self.import_ingredients()
-            self.stdout.write(self.style.SUCCESS(
-                'Ингредиенты успешно импортированы в БД.'))
-        except Exception as error:
-            self.stderr.write('Ошибка при импорте ингредиентов:', str(error))
-        return self.stdout.write(self.style.SUCCESS(
-            'Операция импорта завершена.'))
+        path = Path(options['file'])
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        if file_format == 'jsonl':
+            file_format = 'json'
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {path}. '
+                               f'Укажите --format.')
 
-    @staticmethod
-    def import_ingredients(file: str = 'core/ingredients.csv') -> None:
-        """
-        Импорт ингредиентов из CSV-файла и сохранение их в базу данных.
+        def progress(stats):
+            self.stdout.write(
+                f'Обработано строк: {stats["read"]} (добавлено '
+                f'{stats["inserted"]}, обновлено {stats["updated"]}).')
 
-        Args:
-            file (str): Путь к CSV-файлу с ингредиентами.
-            По умолчанию, 'core/ingredients.csv'.
-        """
-        ingredients_to_create = []
-        with open(file, 'r', newline='', encoding='utf-8') as csv_file:
-            reader = csv.reader(csv_file)
-            for row in reader:
-                name, measurement_unit = row
-                ingredient = Ingredient(name=name,
-                                        measurement_unit=measurement_unit)
-                ingredients_to_create.append(ingredient)
-
-        Ingredient.objects.bulk_create(ingredients_to_create,
-                                       ignore_conflicts=True)
+        try:
+            with open(path, newline='', encoding='utf-8') as file:
+                stats = import_ingredients(
+                    READERS[file_format](file), options['batch_size'],
+                    update_units=options['update_units'], progress=progress)
+        except (OSError, UnicodeDecodeError, csv.Error,
+                json.JSONDecodeError) as error:
+            raise CommandError(f'Ошибка при импорте ингредиентов: {error}')
+        if stats['inserted'] or stats['updated']:
+            bump_version(INGREDIENTS_VERSION_KEY)
+        self.stdout.write(self.style.SUCCESS(
+            f'Импорт завершен: добавлено {stats["inserted"]}, обновлено '
+            f'{stats["updated"]}, пропущено {stats["skipped"]}, '
+            f'некорректных строк {stats["invalid"]}.'))
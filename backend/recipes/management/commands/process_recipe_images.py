@@ -0,0 +1,57 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from recipes.images import get_variant_files, process_recipe_image
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """
+    Команда управления Django для обработки изображений рецептов.
+
+    Изображения обрабатываются в фоне после сохранения рецепта. Команда
+    обрабатывает рецепты, для которых варианты изображения еще не созданы
+    (например, созданные до появления обработки или если процесс был
+    перезапущен до завершения фоновой задачи).
+
+    Пример использования:
+        python manage.py process_recipe_images
+        python manage.py process_recipe_images --all
+
+    Вывод:
+        - Количество обработанных изображений.
+    """
+    help = 'Create resized variants and placeholders for recipe images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Обработать заново изображения всех рецептов.'
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """
+        Обработка команды для обработки изображений.
+
+        Args:
+            *args (Any): Позиционные аргументы.
+            **options (Any): Ключевые аргументы.
+        """
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(image_width__isnull=True)
+        processed = 0
+        for recipe in recipes.only('id', 'image_variants').iterator():
+            try:
+                process_recipe_image(recipe.pk,
+                                     get_variant_files(recipe.image_variants)
+                                     if options['all'] else ())
+                processed += 1
+            except Exception as error:
+                self.stderr.write(
+                    f'Ошибка при обработке изображения рецепта '
+                    f'{recipe.pk}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {processed}.'))
@@ -0,0 +1,60 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from recipes.feed import rebuild_timeline, update_feed_modes
+from users.models import Subscription, User
+
+
+class Command(BaseCommand):
+    """
+    Команда управления Django для пересборки лент подписок.
+
+    Ленты (TimelineEntry) пополняются в фоне при создании рецептов
+    через API. Фоновые задачи не переживают перезапуск процесса, а
+    рецепты и подписки, созданные в обход API (админ-панель,
+    seed_data), в ленты не попадают. Команда пересобирает ленты по
+    текущим подпискам: в каждую попадают последние рецепты авторов,
+    как при подписке. Перед этим режим чтения авторов (PulledAuthor)
+    приводится в соответствие с числом их подписчиков.
+
+    Пример использования:
+        python manage.py rebuild_feeds
+        python manage.py rebuild_feeds --user 1 --user 2
+
+    Вывод:
+        - Количество авторов, для которых проверен режим чтения.
+        - Количество пересобранных лент.
+    """
+    help = 'Rebuild subscription feed timelines from subscriptions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            help='Пересобрать ленту только для пользователя с этим id.'
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """
+        Обработка команды пересборки лент подписок.
+
+        Args:
+            *args (Any): Позиционные аргументы.
+            **options (Any): Ключевые аргументы.
+        """
+        checked = update_feed_modes()
+        self.stdout.write(f'Проверен режим чтения авторов: {checked}.')
+        users = User.objects.all()
+        if options['user']:
+            users = users.filter(id__in=options['user'])
+        else:
+            users = users.filter(
+                id__in=Subscription.objects.values('subscriber'))
+        rebuilt = 0
+        for user in users.iterator():
+            rebuild_timeline(user)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано лент: {rebuilt}.'))
@@ -0,0 +1,54 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from recipes.models import ShoppingList
+from recipes.shopping_list import rebuild_shopping_list
+from users.models import User
+
+
+class Command(BaseCommand):
+    """
+    Команда управления Django для пересборки сводных списков покупок.
+
+    Списки покупок (ShoppingListItem) поддерживаются инкрементально при
+    работе через API. Если корзины или рецепты менялись в обход API
+    (например, через админ-панель), команда пересобирает списки по
+    текущему содержимому корзин и увеличивает их версии.
+
+    Пример использования:
+        python manage.py rebuild_shopping_lists
+        python manage.py rebuild_shopping_lists --user 1 --user 2
+
+    Вывод:
+        - Количество пересобранных списков.
+    """
+    help = 'Rebuild materialized shopping lists from shopping carts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            help='Пересобрать список только для пользователя с этим id.'
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """
+        Обработка команды пересборки списков покупок.
+
+        Args:
+            *args (Any): Позиционные аргументы.
+            **options (Any): Ключевые аргументы.
+        """
+        users = User.objects.all()
+        if options['user']:
+            users = users.filter(id__in=options['user'])
+        else:
+            users = users.filter(id__in=ShoppingList.objects.values('user'))
+        rebuilt = 0
+        for user in users.iterator():
+            rebuild_shopping_list(user)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано списков покупок: {rebuilt}.'))
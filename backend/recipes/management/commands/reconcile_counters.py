@@ -0,0 +1,37 @@
+from typing import Any
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from core.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    """
+    Команда управления Django для сверки денормализованных счетчиков.
+
+    Счетчики (рецепты автора, подписчики и подписки пользователя,
+    добавления рецепта в избранное и корзину) поддерживаются при каждом
+    изменении через API. Изменения в обход API (админка, удаление
+    пользователя) могут привести к расхождению, которое исправляет эта
+    команда.
+
+    Пример использования:
+        python manage.py reconcile_counters
+
+    Вывод:
+        - Количество исправленных объектов для каждого счетчика.
+    """
+    help = 'Recalculate denormalized counters and fix drifted rows'
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """
+        Обработка команды для сверки счетчиков.
+
+        Args:
+            *args (Any): Позиционные аргументы.
+            **options (Any): Ключевые аргументы.
+        """
+        for counter, fixed in reconcile_counters(apps).items():
+            self.stdout.write(f'{counter}: исправлено {fixed}.')
+        self.stdout.write(self.style.SUCCESS('Счетчики сверены.'))
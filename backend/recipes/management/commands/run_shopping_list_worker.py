@@ -0,0 +1,66 @@
+import time
+from typing import Any
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.v1.shopping_cart_in_pdf import (claim_shopping_list_job,
+                                         process_shopping_list_job)
+from core.constants.recipes import SHOPPING_LIST_WORKER_POLL_INTERVAL
+
+
+class Command(BaseCommand):
+    """
+    Команда управления Django для фоновой генерации PDF-списков покупок.
+
+    Воркер забирает задания из таблицы ShoppingListJob, генерирует PDF и
+    сохраняет его в MEDIA_ROOT/shopping_lists/. Запускается отдельным
+    процессом (или контейнером), внешний брокер сообщений не нужен.
+    Можно запускать несколько воркеров одновременно. Задания
+    остановленного воркера забираются повторно по истечении
+    SHOPPING_LIST_JOB_TIMEOUT.
+
+    Пример использования:
+        python manage.py run_shopping_list_worker
+        python manage.py run_shopping_list_worker --once
+
+    Вывод:
+        - Сообщение о каждом обработанном задании.
+    """
+    help = 'Render queued shopping list PDFs in a background process'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Обработать все задания в очереди и завершиться.'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=SHOPPING_LIST_WORKER_POLL_INTERVAL,
+            help='Пауза между опросами пустой очереди (в секундах).'
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """
+        Обработка команды запуска воркера.
+
+        Args:
+            *args (Any): Позиционные аргументы.
+            **options (Any): Ключевые аргументы.
+        """
+        while True:
+            close_old_connections()
+            job = claim_shopping_list_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+            try:
+                process_shopping_list_job(job)
+                self.stdout.write(f'Список покупок {job.pk} готов.')
+            except Exception as error:
+                self.stderr.write(
+                    f'Ошибка при генерации списка покупок {job.pk}: {error}')
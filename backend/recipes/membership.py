@@ -0,0 +1,199 @@
+from array import array
+from bisect import bisect_left, insort
+from typing import Dict, Iterable
+
+from django.core.cache import cache
+from django.db import transaction
+
+from core.constants.recipes import MEMBERSHIP_CACHE_TIMEOUT
+from core.versions import bump_version, get_version
+from recipes.models import Favorite, ShoppingCart
+from recipes.versions import membership_version_key
+from users.models import Subscription
+
+FAVORITES = 'favorites'
+SHOPPING_CART = 'shopping_cart'
+SUBSCRIPTIONS = 'subscriptions'
+
+MEMBERSHIP_SOURCES = {
+    FAVORITES: (Favorite, 'user', 'recipe_id'),
+    SHOPPING_CART: (ShoppingCart, 'user', 'recipe_id'),
+    SUBSCRIPTIONS: (Subscription, 'subscriber', 'target_user_id'),
+}
+ARRAY_TYPECODE = 'q'
+
+
+class IdSet:
+    """
+    Компактное множество идентификаторов.
+
+    Хранится как отсортированный массив 64-битных целых (8 байт на
+    элемент), проверка принадлежности выполняется бинарным поиском.
+
+    Методы:
+        - from_bytes(data): Восстанавливает множество из байтов.
+        - to_bytes(): Возвращает компактное представление для кеша.
+        - add(ids), discard(ids): Изменяют множество.
+    """
+
+    def __init__(self, ids: Iterable[int] = ()):
+        self.ids = array(ARRAY_TYPECODE, sorted(set(ids)))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'IdSet':
+        id_set = cls()
+        id_set.ids.frombytes(data)
+        return id_set
+
+    def to_bytes(self) -> bytes:
+        return self.ids.tobytes()
+
+    def __contains__(self, pk) -> bool:
+        index = bisect_left(self.ids, pk)
+        return index < len(self.ids) and self.ids[index] == pk
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, ids: Iterable[int]) -> None:
+        for pk in ids:
+            if pk not in self:
+                insort(self.ids, pk)
+
+    def discard(self, ids: Iterable[int]) -> None:
+        for pk in ids:
+            index = bisect_left(self.ids, pk)
+            if index < len(self.ids) and self.ids[index] == pk:
+                del self.ids[index]
+
+
+def get_cache_key(kind: str, user_id: int) -> str:
+    """Возвращает ключ кеша множества пользователя."""
+    return f'membership:{kind}:{user_id}'
+
+
+def load_membership(user_id: int) -> Dict[str, IdSet]:
+    """
+    Загружает множества пользователя из общего кеша.
+
+    Множества в кеше помечены версией множеств пользователя
+    (membership_version_key), при которой они собраны. Версия
+    увеличивается после фиксации каждого изменения (update_membership),
+    поэтому множества другой версии, как и отсутствующие, собираются
+    заново из базы данных (по одному запросу на множество) и
+    сохраняются в кеш. Версия читается до базы данных: множество,
+    собранное до фиксации параллельного изменения, получит прежнюю
+    версию и не будет использовано.
+
+    Args:
+        user_id (int): Идентификатор пользователя.
+
+    Returns:
+        dict: {вид множества: IdSet}.
+    """
+    version = get_version(membership_version_key(user_id))
+    cache_keys = {get_cache_key(kind, user_id): kind
+                  for kind in MEMBERSHIP_SOURCES}
+    membership = {
+        cache_keys[key]: IdSet.from_bytes(data)
+        for key, (data_version, data) in cache.get_many(cache_keys).items()
+        if data_version == version
+    }
+    missing = {}
+    for kind, (model, owner, field) in MEMBERSHIP_SOURCES.items():
+        if kind in membership:
+            continue
+        membership[kind] = IdSet(model.objects.filter(
+            **{f'{owner}_id': user_id}).values_list(field, flat=True))
+        missing[get_cache_key(kind, user_id)] = (
+            version, membership[kind].to_bytes())
+    if missing:
+        cache.set_many(missing, MEMBERSHIP_CACHE_TIMEOUT)
+    return membership
+
+
+class Membership:
+    """
+    Множества избранных рецептов, рецептов в корзине и авторов, на
+    которых подписан пользователь.
+
+    Загружается один раз за запрос (см. get_membership), после чего
+    флаги is_favorited, is_in_shopping_cart и is_subscribed вычисляются
+    в памяти без запросов к базе данных.
+
+    Методы:
+        - is_favorited(recipe_id): Рецепт в избранном.
+        - is_in_shopping_cart(recipe_id): Рецепт в корзине.
+        - is_subscribed(author_id): Пользователь подписан на автора.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._sets = None
+
+    @property
+    def sets(self) -> Dict[str, IdSet]:
+        if self._sets is None:
+            if self.user.is_authenticated:
+                self._sets = load_membership(self.user.pk)
+            else:
+                self._sets = {kind: IdSet() for kind in MEMBERSHIP_SOURCES}
+        return self._sets
+
+    def is_favorited(self, recipe_id: int) -> bool:
+        return recipe_id in self.sets[FAVORITES]
+
+    def is_in_shopping_cart(self, recipe_id: int) -> bool:
+        return recipe_id in self.sets[SHOPPING_CART]
+
+    def is_subscribed(self, author_id: int) -> bool:
+        return author_id in self.sets[SUBSCRIPTIONS]
+
+
+def get_membership(user) -> Membership:
+    """
+    Возвращает множества пользователя, загруженные один раз на объект
+    пользователя (то есть на запрос).
+
+    Args:
+        user (User | AnonymousUser): Пользователь запроса.
+
+    Returns:
+        Membership: Множества пользователя.
+    """
+    membership = getattr(user, '_membership', None)
+    if membership is None:
+        membership = Membership(user)
+        user._membership = membership
+    return membership
+
+
+def update_membership(user, kind: str, added: Iterable[int] = (),
+                      removed: Iterable[int] = ()) -> None:
+    """
+    Отмечает изменение избранного, корзины или подписок пользователя.
+
+    Вызывается внутри транзакции, в которой выполнено изменение. После
+    ее фиксации (transaction.on_commit) обновляется множество в памяти
+    текущего запроса и увеличивается версия множеств пользователя, и
+    множества в общем кеше перестают использоваться (см.
+    load_membership): так параллельные изменения не теряются, а при
+    откате транзакции множества не меняются. Новая версия используется
+    и для условных GET-запросов.
+
+    Args:
+        user (User): Пользователь.
+        kind (str): FAVORITES, SHOPPING_CART или SUBSCRIPTIONS.
+        added (Iterable[int]): Добавленные идентификаторы.
+        removed (Iterable[int]): Удаленные идентификаторы.
+    """
+    added, removed = list(added), list(removed)
+
+    def update_sets():
+        membership = getattr(user, '_membership', None)
+        if membership is not None and membership._sets is not None:
+            membership._sets[kind].add(added)
+            membership._sets[kind].discard(removed)
+
+    transaction.on_commit(update_sets)
+    bump_version(membership_version_key(user.pk))
@@ -0,0 +1,61 @@
+from django.db import migrations
+
+# Миграция не импортирует recipes.search: схема поискового индекса и
+# его первичное заполнение зафиксированы здесь на момент создания.
+SEARCH_TABLE = 'recipes_recipe_search'
+SEARCH_CONFIG = 'russian'
+
+POSTGRESQL_FORWARDS = (
+    f'CREATE TABLE {SEARCH_TABLE} ('
+    f'recipe_id bigint PRIMARY KEY REFERENCES recipes_recipe (id) '
+    f'ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+    f'document tsvector NOT NULL)',
+    f'CREATE INDEX {SEARCH_TABLE}_document ON {SEARCH_TABLE} '
+    f'USING GIN (document)',
+    f'INSERT INTO {SEARCH_TABLE} (recipe_id, document) '
+    f'SELECT r.id, '
+    f'setweight(to_tsvector(\'{SEARCH_CONFIG}\', r.name), \'A\') || '
+    f'setweight(to_tsvector(\'{SEARCH_CONFIG}\', '
+    f'COALESCE(string_agg(i.name, \' \'), \'\')), \'B\') || '
+    f'setweight(to_tsvector(\'{SEARCH_CONFIG}\', r.text), \'C\') '
+    f'FROM recipes_recipe r '
+    f'LEFT JOIN recipes_recipeessentials e ON e.recipe_id = r.id '
+    f'LEFT JOIN recipes_ingredient i ON i.id = e.ingredient_id '
+    f'GROUP BY r.id',
+)
+
+SQLITE_FORWARDS = (
+    f'CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5('
+    f'name, ingredients, text, tokenize="unicode61")',
+    f'INSERT INTO {SEARCH_TABLE} (rowid, name, ingredients, text) '
+    f'SELECT r.id, r.name, '
+    f'COALESCE(group_concat(i.name, \' \'), \'\'), r.text '
+    f'FROM recipes_recipe r '
+    f'LEFT JOIN recipes_recipeessentials e ON e.recipe_id = r.id '
+    f'LEFT JOIN recipes_ingredient i ON i.id = e.ingredient_id '
+    f'GROUP BY r.id',
+)
+
+
+def forwards(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'postgresql': POSTGRESQL_FORWARDS,
+                  'sqlite': SQLITE_FORWARDS}.get(vendor, ())
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def backwards(apps, schema_editor):
+    if schema_editor.connection.vendor in ('postgresql', 'sqlite'):
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_shoppinglist'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 3.2.3 on 2026-10-16 23:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from core.constants.recipes import FEED_FANOUT_MAX_FOLLOWERS
+
+
+def forwards(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    PulledAuthor = apps.get_model('recipes', 'PulledAuthor')
+    PulledAuthor.objects.bulk_create(
+        PulledAuthor(author_id=author_id)
+        for author_id in User.objects.filter(
+            followers_count__gt=FEED_FANOUT_MAX_FOLLOWERS
+        ).values_list('pk', flat=True))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_counters'),
+        ('recipes', '0007_timelineentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PulledAuthor',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='pulled_feed', serialize=False, to='users.user', verbose_name='Автор')),
+            ],
+            options={
+                'verbose_name': 'Автор без раскладки по лентам',
+                'verbose_name_plural': 'Авторы без раскладки по лентам',
+            },
+        ),
+        migrations.RunPython(forwards, migrations.RunPython.noop),
+    ]
@@ -1,14 +1,18 @@
+from uuid import uuid4
+
 from colorfield.fields import ColorField
 from django.core.validators import (MinValueValidator, MaxValueValidator,
                                     RegexValidator)
-from django.db import models
-from django.db.models import UniqueConstraint
+from django.db import models, transaction
+from django.db.models import Prefetch, UniqueConstraint
 
 from core.constants.recipes import (COLORFIELD_LENGTH, INGREDIENT_LENGTH,
                                     RECIPE_NAME_LENGTH, TAG_LENGTH,
                                     MIN_COOKING_TIME, MAX_COOKING_TIME,
                                     MIN_INGREDIENT_AMOUNT,
-                                    MAX_INGREDIENT_AMOUNT)
+                                    MAX_INGREDIENT_AMOUNT,
+                                    SHOPPING_LIST_JOB_STATUS_LENGTH)
+from core.counters import CounterFieldsMixin
 from users.models import User
 
 
@@ -115,7 +119,30 @@ class Tag(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+    """
+    QuerySet рецептов с методами для выборки связанных данных.
+
+    Методы:
+        - with_related_data(): Загружает автора, теги и ингредиенты
+        фиксированным числом запросов, независимо от размера выборки.
+        Флаги пользователя (избранное, корзина, подписка на автора)
+        вычисляются по его множествам (recipes.membership).
+    """
+
+    def with_related_data(self):
+        return self.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredient',
+                queryset=RecipeEssentials.objects.select_related(
+                    'ingredient').order_by('ingredient__name'),
+                to_attr='prefetched_essentials'
+            )
+        )
+
+
+class Recipe(CounterFieldsMixin, models.Model):
     """
     Модель рецепта.
 
@@ -126,17 +153,31 @@ class Recipe(models.Model):
         модель RecipeEssentials).
         - name (CharField): Название рецепта.
         - image (ImageField): Изображение рецепта.
+        - image_width, image_height (PositiveIntegerField): Размеры
+        изображения (заполняются после обработки).
+        - image_variants (JSONField): Файлы уменьшенных вариантов
+        изображения {размер: {формат: файл}}.
+        - image_placeholder (TextField): Миниатюра-заглушка (data URI).
         - pub_date (DateTimeField): Дата публикации рецепта.
         - text (TextField): Описание рецепта.
         - cooking_time (PositiveSmallIntegerField): Время приготовления.
+        - favorites_count (PositiveIntegerField): Сколько раз рецепт
+        добавлен в избранное.
+        - carts_count (PositiveIntegerField): Сколько раз рецепт
+        добавлен в корзину.
 
     Мета:
         - verbose_name (str): Название модели в единственном числе.
         - verbose_name_plural (str): Название модели во множественном числе.
         - ordering (list): Сортировка объектов модели по умолчанию.
 
+    Менеджер:
+        - objects (RecipeQuerySet): Менеджер с методом with_related_data.
+
     Методы:
         - __str__(): Возвращает строковое представление рецепта.
+        - save(): Сохраняет рецепт в транзакции (вместе с сигналами
+        pre_save и post_save).
     """
     tags = models.ManyToManyField(
         Tag,
@@ -163,6 +204,29 @@ class Recipe(models.Model):
     image = models.ImageField(
         verbose_name='Изображение',
     )
+    image_width = models.PositiveIntegerField(
+        verbose_name='Ширина изображения',
+        null=True,
+        blank=True,
+        editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        verbose_name='Высота изображения',
+        null=True,
+        blank=True,
+        editable=False
+    )
+    image_variants = models.JSONField(
+        verbose_name='Уменьшенные варианты изображения',
+        default=dict,
+        blank=True,
+        editable=False
+    )
+    image_placeholder = models.TextField(
+        verbose_name='Миниатюра-заглушка изображения',
+        blank=True,
+        editable=False
+    )
     pub_date = models.DateTimeField(
         verbose_name='Дата публикации',
         auto_now_add=True,
@@ -184,6 +248,20 @@ class Recipe(models.Model):
                                       f'более {MAX_COOKING_TIME} мин.'),
         ]
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+        editable=False
+    )
+    carts_count = models.PositiveIntegerField(
+        verbose_name='В корзине',
+        default=0,
+        editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
+
+    counter_fields = ('favorites_count', 'carts_count')
 
     class Meta:
         verbose_name = 'Рецепт'
@@ -193,6 +271,12 @@ class Recipe(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # Сигналы сохранения выполняются в транзакции сохранения:
+        # reset_replaced_image блокирует строку рецепта до ее конца.
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+
 
 class RecipeEssentials(models.Model):
     """
@@ -339,3 +423,288 @@ class ShoppingCart(UserRecipeRelation):
                 name='Рецепт уже в корзине!',
             )
         ]
+
+
+class ShoppingList(models.Model):
+    """
+    Модель состояния материализованного списка покупок пользователя.
+
+    Наличие записи означает, что позиции ShoppingListItem пользователя
+    актуальны и поддерживаются инкрементально при изменении корзины и
+    состава рецептов. Версия увеличивается при каждом изменении списка
+    и служит ключом кеша для PDF и других форматов выгрузки.
+
+    Поля:
+        - user (OneToOneField): Пользователь.
+        - version (PositiveIntegerField): Версия списка покупок.
+
+    Мета:
+        - verbose_name (str): Название модели в единственном числе.
+        - verbose_name_plural (str): Название модели во множественном числе.
+
+    Методы:
+        - __str__(): Возвращает строковое представление списка покупок.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    version = models.PositiveIntegerField(
+        verbose_name='Версия',
+        default=0
+    )
+
+    class Meta:
+        verbose_name = 'Сводный список покупок'
+        verbose_name_plural = 'Сводные списки покупок'
+
+    def __str__(self):
+        return f'{self.user} – v{self.version}'
+
+
+class ShoppingListItem(models.Model):
+    """
+    Модель позиции материализованного списка покупок.
+
+    Поля:
+        - user (ForeignKey): Пользователь.
+        - ingredient (ForeignKey): Ингредиент.
+        - amount (IntegerField): Суммарное количество ингредиента во всех
+        рецептах корзины.
+
+    Мета:
+        - verbose_name (str): Название модели в единственном числе.
+        - verbose_name_plural (str): Название модели во множественном числе.
+        - constraints (list): Ограничения для уникальности записей.
+
+    Методы:
+        - __str__(): Возвращает строковое представление позиции.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент'
+    )
+    amount = models.IntegerField(
+        verbose_name='Количество',
+        default=0
+    )
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Позиции списков покупок'
+        constraints = [
+            UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='Ингредиент уже в списке покупок!',
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient} – {self.amount}'
+
+
+class TimelineEntry(models.Model):
+    """
+    Модель записи ленты подписок пользователя.
+
+    Новые рецепты раскладываются по лентам подписчиков автора в фоне
+    (recipes.feed), поэтому лента читается одним диапазонным запросом
+    по индексу (user, pub_date, recipe). Дата публикации копируется из
+    рецепта, автор хранится для очистки ленты при отписке.
+
+    Поля:
+        - user (ForeignKey): Владелец ленты.
+        - recipe (ForeignKey): Рецепт.
+        - author (ForeignKey): Автор рецепта.
+        - pub_date (DateTimeField): Дата публикации рецепта.
+
+    Мета:
+        - verbose_name (str): Название модели в единственном числе.
+        - verbose_name_plural (str): Название модели во множественном числе.
+        - constraints (list): Ограничения для уникальности записей.
+        - indexes (list): Индексы для чтения ленты и очистки по автору.
+
+    Методы:
+        - __str__(): Возвращает строковое представление записи ленты.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Пользователь'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Рецепт'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации'
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи лент'
+        constraints = [
+            UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='Рецепт уже в ленте!',
+            )
+        ]
+        indexes = [
+            models.Index(fields=('user', '-pub_date', '-recipe'),
+                         name='recipes_timeline_feed_idx'),
+            models.Index(fields=('user', 'author'),
+                         name='recipes_timeline_author_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} <- {self.recipe}'
+
+
+class PulledAuthor(models.Model):
+    """
+    Модель автора, рецепты которого читаются напрямую при чтении лент.
+
+    Режим чтения хранится отдельно от followers_count: запись лент
+    (раскладка и пополнение при подписке) следует числу подписчиков, а
+    чтение - этой таблице. Режим переключается в фоне после того, как
+    ленты подписчиков пополнены или очищены (recipes.feed), поэтому
+    рецепты автора не пропадают из лент при пересечении порога
+    FEED_FANOUT_MAX_FOLLOWERS.
+
+    Поля:
+        - author (OneToOneField): Автор.
+
+    Мета:
+        - verbose_name (str): Название модели в единственном числе.
+        - verbose_name_plural (str): Название модели во множественном числе.
+
+    Методы:
+        - __str__(): Возвращает строковое представление записи.
+    """
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='pulled_feed',
+        verbose_name='Автор'
+    )
+
+    class Meta:
+        verbose_name = 'Автор без раскладки по лентам'
+        verbose_name_plural = 'Авторы без раскладки по лентам'
+
+    def __str__(self):
+        return str(self.author)
+
+
+class ShoppingListJob(models.Model):
+    """
+    Модель задания на генерацию PDF-списка покупок.
+
+    Задания создаются API и выполняются отдельным процессом
+    (команда run_shopping_list_worker). Таблица служит очередью,
+    внешний брокер не нужен.
+
+    Поля:
+        - id (UUIDField): Идентификатор задания.
+        - user (ForeignKey): Пользователь, для которого генерируется список.
+        - status (CharField): Статус задания (из выбора в STATUSES).
+        - version (PositiveIntegerField): Версия списка покупок, для
+        которой создано задание.
+        - file (FileField): Готовый PDF-файл.
+        - error (TextField): Текст ошибки, если генерация не удалась.
+        - created_at (DateTimeField): Дата постановки в очередь.
+        - started_at (DateTimeField): Дата начала генерации.
+        - finished_at (DateTimeField): Дата завершения генерации.
+
+    Мета:
+        - verbose_name (str): Название модели в единственном числе.
+        - verbose_name_plural (str): Название модели во множественном числе.
+        - ordering (list): Сортировка объектов модели по умолчанию.
+
+    Методы:
+        - __str__(): Возвращает строковое представление задания.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    STATUSES = (
+        (PENDING, PENDING),
+        (RUNNING, RUNNING),
+        (DONE, DONE),
+        (FAILED, FAILED),
+    )
+
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid4,
+        editable=False
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_jobs',
+        verbose_name='Пользователь'
+    )
+    status = models.CharField(
+        verbose_name='Статус',
+        max_length=SHOPPING_LIST_JOB_STATUS_LENGTH,
+        choices=STATUSES,
+        default=PENDING,
+        db_index=True
+    )
+    version = models.PositiveIntegerField(
+        verbose_name='Версия списка покупок',
+        default=0
+    )
+    file = models.FileField(
+        verbose_name='PDF-файл',
+        upload_to='shopping_lists/',
+        blank=True
+    )
+    error = models.TextField(
+        verbose_name='Ошибка',
+        blank=True
+    )
+    created_at = models.DateTimeField(
+        verbose_name='Дата постановки в очередь',
+        auto_now_add=True
+    )
+    started_at = models.DateTimeField(
+        verbose_name='Дата начала генерации',
+        null=True,
+        blank=True
+    )
+    finished_at = models.DateTimeField(
+        verbose_name='Дата завершения генерации',
+        null=True,
+        blank=True
+    )
+
+    class Meta:
+        verbose_name = 'Задание на список покупок'
+        verbose_name_plural = 'Задания на списки покупок'
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f'{self.user} – {self.status}'
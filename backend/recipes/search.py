@@ -0,0 +1,120 @@
+import re
+from typing import Iterable
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from core.constants.recipes import SEARCH_CONFIG
+from recipes.models import Ingredient, Recipe, RecipeEssentials
+
+SEARCH_TABLE = 'recipes_recipe_search'
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def index_recipes(recipe_ids: Iterable[int]) -> None:
+    """
+    Обновляет поисковые документы рецептов (название, описание и
+    названия ингредиентов). Вызывается после каждой записи рецепта.
+
+    Args:
+        recipe_ids (Iterable[int] | QuerySet): Идентификаторы рецептов.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids or connection.vendor not in ('postgresql', 'sqlite'):
+        return
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    recipes = Recipe._meta.db_table
+    essentials = RecipeEssentials._meta.db_table
+    ingredients = Ingredient._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                f'INSERT INTO {SEARCH_TABLE} (recipe_id, document) '
+                f'SELECT r.id, '
+                f'setweight(to_tsvector(%s::regconfig, r.name), \'A\') || '
+                f'setweight(to_tsvector(%s::regconfig, '
+                f'COALESCE(string_agg(i.name, \' \'), \'\')), \'B\') || '
+                f'setweight(to_tsvector(%s::regconfig, r.text), \'C\') '
+                f'FROM {recipes} r '
+                f'LEFT JOIN {essentials} e ON e.recipe_id = r.id '
+                f'LEFT JOIN {ingredients} i ON i.id = e.ingredient_id '
+                f'WHERE r.id IN ({placeholders}) GROUP BY r.id '
+                f'ON CONFLICT (recipe_id) DO UPDATE '
+                f'SET document = EXCLUDED.document',
+                [SEARCH_CONFIG] * 3 + recipe_ids)
+        else:
+            cursor.execute(
+                f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})',
+                recipe_ids)
+            cursor.execute(
+                f'INSERT INTO {SEARCH_TABLE} (rowid, name, ingredients, text) '
+                f'SELECT r.id, r.name, '
+                f'COALESCE(group_concat(i.name, \' \'), \'\'), r.text '
+                f'FROM {recipes} r '
+                f'LEFT JOIN {essentials} e ON e.recipe_id = r.id '
+                f'LEFT JOIN {ingredients} i ON i.id = e.ingredient_id '
+                f'WHERE r.id IN ({placeholders}) GROUP BY r.id',
+                recipe_ids)
+
+
+def remove_recipes_from_index(recipe_ids: Iterable[int]) -> None:
+    """Удаляет поисковые документы рецептов."""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids or connection.vendor not in ('postgresql', 'sqlite'):
+        return
+    column = 'recipe_id' if connection.vendor == 'postgresql' else 'rowid'
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE {column} IN ({placeholders})',
+            recipe_ids)
+
+
+def search_recipes(queryset, query: str):
+    """
+    Фильтрует рецепты по поисковому запросу и сортирует их по
+    релевантности (совпадения в названии весят больше, чем в
+    ингредиентах, а в ингредиентах - больше, чем в описании).
+
+    Каждое слово запроса ищется как префикс, все слова обязательны.
+
+    Args:
+        queryset (QuerySet): Рецепты.
+        query (str): Поисковый запрос.
+
+    Returns:
+        QuerySet: Найденные рецепты, отсортированные по релевантности.
+    """
+    tokens = TOKEN_PATTERN.findall(query.casefold())
+    if not tokens:
+        return queryset
+    table = Recipe._meta.db_table
+    if connection.vendor == 'postgresql':
+        ts_query = ' & '.join(f'{token}:*' for token in tokens)
+        matches = RawSQL(
+            f'SELECT recipe_id FROM {SEARCH_TABLE} '
+            f'WHERE document @@ to_tsquery(%s::regconfig, %s)',
+            (SEARCH_CONFIG, ts_query))
+        rank = RawSQL(
+            f'SELECT ts_rank(document, to_tsquery(%s::regconfig, %s)) '
+            f'FROM {SEARCH_TABLE} WHERE recipe_id = {table}.id',
+            (SEARCH_CONFIG, ts_query))
+        return queryset.filter(id__in=matches).annotate(
+            search_rank=rank).order_by('-search_rank', '-pub_date')
+    if connection.vendor == 'sqlite':
+        fts_query = ' '.join(f'"{token}"*' for token in tokens)
+        matches = RawSQL(
+            f'SELECT rowid FROM {SEARCH_TABLE} '
+            f'WHERE {SEARCH_TABLE} MATCH %s', (fts_query,))
+        rank = RawSQL(
+            f'SELECT bm25({SEARCH_TABLE}, 10.0, 5.0, 1.0) '
+            f'FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s '
+            f'AND rowid = {table}.id', (fts_query,))
+        return queryset.filter(id__in=matches).annotate(
+            search_rank=rank).order_by('search_rank', '-pub_date')
+    condition = Q()
+    for token in tokens:
+        condition &= (Q(name__icontains=token) | Q(text__icontains=token)
+                      | Q(ingredients__name__icontains=token))
+    return queryset.filter(condition).distinct()
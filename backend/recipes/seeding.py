@@ -0,0 +1,356 @@
+import io
+import math
+import random
+from contextlib import ExitStack
+from typing import Callable, List, Optional, Sequence
+
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management.color import no_style
+from django.db import connection
+from django.db.models import Max
+from PIL import Image
+
+from core.constants.recipes import (IMAGE_JPEG_QUALITY, MAX_COOKING_TIME,
+                                    MAX_INGREDIENT_AMOUNT, SEED_BATCH_SIZE)
+from core.counters import reconcile_counters
+from core.versions import bump_version
+from recipes.ingredient_index import INGREDIENTS_VERSION_KEY
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeEssentials,
+                            ShoppingCart, Tag)
+from recipes.search import index_recipes
+from recipes.versions import (AUTHORS_VERSION_KEY, RECIPE_SET_VERSION_KEY,
+                              RECIPES_VERSION_KEY, TAGS_VERSION_KEY)
+from users.models import Subscription, User
+
+PLACEHOLDER_DIR = 'seed'
+PLACEHOLDER_SIZE = (640, 480)
+WORDS = ('суп', 'салат', 'пирог', 'рагу', 'паста', 'омлет', 'каша',
+         'запеканка', 'котлеты', 'блины', 'плов', 'соус', 'десерт')
+# Попыток выбрать различные элементы на каждый нужный элемент (при
+# сильной асимметрии распределения повторы неизбежны).
+DISTINCT_ATTEMPTS = 10
+
+
+def zipf_index(rng: random.Random, size: int, skew: float) -> int:
+    """
+    Возвращает индекс от 0 до size - 1 с вероятностью, убывающей как
+    1 / (индекс + 1) ** skew (skew = 0 - равномерное распределение).
+
+    Используется обратная функция распределения непрерывного степенного
+    закона, поэтому выбор не требует памяти, пропорциональной size.
+    """
+    uniform = rng.random()
+    if math.isclose(skew, 1.0):
+        value = (size + 1) ** uniform
+    else:
+        power = 1 - skew
+        value = (1 + uniform * ((size + 1) ** power - 1)) ** (1 / power)
+    return min(int(value) - 1, size - 1)
+
+
+def get_stride(size: int) -> int:
+    """
+    Шаг перестановки (rank * stride) % size, взаимно простой с size:
+    популярные объекты распределяются по всему диапазону id, а не
+    собираются в его начале.
+    """
+    stride = 2654435761 % size or 1
+    while math.gcd(stride, size) != 1:
+        stride += 1
+    return stride
+
+
+def escape_copy(value) -> str:
+    """Значение в текстовом формате COPY PostgreSQL."""
+    if value is None:
+        return '\\N'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+class RowWriter:
+    """
+    Запись объектов модели пачками по batch_size.
+
+    В PostgreSQL пачка загружается командой COPY, в остальных БД -
+    bulk_create. В памяти одновременно находится не больше одной пачки.
+    Значения полей подготавливаются так же, как в bulk_create (включая
+    auto_now_add и значения по умолчанию).
+    """
+
+    def __init__(self, model, batch_size: int):
+        self.model = model
+        self.batch_size = batch_size
+        self.batch = []
+        self.written = 0
+
+    def __enter__(self) -> 'RowWriter':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if exc_info[0] is None:
+            self.flush()
+
+    def write(self, obj) -> None:
+        self.batch.append(obj)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.batch:
+            return
+        if connection.vendor == 'postgresql':
+            self.copy(self.batch)
+        else:
+            self.model.objects.bulk_create(self.batch)
+        self.written += len(self.batch)
+        self.batch = []
+
+    def copy(self, objects: list) -> None:
+        # Первичный ключ передается, только если он задан явно.
+        fields = [field for field in self.model._meta.concrete_fields
+                  if not field.primary_key or objects[0].pk is not None]
+        buffer = io.StringIO()
+        for obj in objects:
+            buffer.write('\t'.join(
+                escape_copy(field.get_db_prep_save(
+                    field.pre_save(obj, True), connection))
+                for field in fields))
+            buffer.write('\n')
+        buffer.seek(0)
+        columns = ', '.join(connection.ops.quote_name(field.column)
+                            for field in fields)
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(f'COPY {table} ({columns}) FROM STDIN',
+                               buffer)
+
+
+class SyntheticDataGenerator:
+    """
+    Генератор воспроизводимого набора данных: пользователи, рецепты с
+    ингредиентами и тегами, избранное, корзины и подписки.
+
+    Все случайные значения берутся из random.Random(seed), поэтому
+    одинаковые параметры на пустой БД дают одинаковые данные.
+    Идентификаторы новых объектов назначаются явно подряд после
+    существующих, поэтому связи строятся без чтения id из БД, а память
+    не зависит от количества строк.
+
+    Асимметрия (skew) задается показателем закона Ципфа:
+        - author_skew: сколько рецептов у авторов;
+        - recipe_skew: популярность рецептов в избранном и корзинах;
+        - follower_skew: количество подписчиков у пользователей;
+        - ingredient_skew: частота ингредиентов в рецептах.
+    Количество избранного, рецептов в корзине и подписок у каждого
+    пользователя распределено экспоненциально с заданным средним.
+
+    Существующие данные не изменяются: избранное, корзины и подписки
+    создаются только для новых пользователей и новых рецептов.
+    """
+
+    def __init__(self, users: int, recipes: int, tags: int = 0,
+                 ingredients: int = 0, min_ingredients: int = 3,
+                 max_ingredients: int = 10, favorites_per_user: float = 10,
+                 carts_per_user: float = 2, subscriptions_per_user: float = 5,
+                 author_skew: float = 1.1, recipe_skew: float = 1.2,
+                 follower_skew: float = 1.3, ingredient_skew: float = 1.0,
+                 images: int = 0, password: str = 'seed-password',
+                 seed: int = 0, batch_size: int = SEED_BATCH_SIZE,
+                 log: Callable[[str], None] = lambda message: None):
+        self.users = users
+        self.recipes = recipes
+        self.tags = tags
+        self.ingredients = ingredients
+        self.min_ingredients = min_ingredients
+        self.max_ingredients = max_ingredients
+        self.favorites_per_user = favorites_per_user
+        self.carts_per_user = carts_per_user
+        self.subscriptions_per_user = subscriptions_per_user
+        self.author_skew = author_skew
+        self.recipe_skew = recipe_skew
+        self.follower_skew = follower_skew
+        self.ingredient_skew = ingredient_skew
+        self.images = images
+        self.password = password
+        self.batch_size = batch_size
+        self.log = log
+        self.rng = random.Random(seed)
+        self.strides = {}
+
+    @staticmethod
+    def next_id(model) -> int:
+        return (model.objects.aggregate(value=Max('id'))['value'] or 0) + 1
+
+    def writer(self, model) -> RowWriter:
+        return RowWriter(model, self.batch_size)
+
+    def pick(self, ids: Sequence[int], skew: float) -> int:
+        """Случайный id из последовательности с асимметрией skew."""
+        size = len(ids)
+        if size not in self.strides:
+            self.strides[size] = get_stride(size)
+        rank = zipf_index(self.rng, size, skew)
+        return ids[rank * self.strides[size] % size]
+
+    def pick_distinct(self, ids: Sequence[int], skew: float, count: int,
+                      exclude: Optional[int] = None) -> List[int]:
+        count = min(count, len(ids) - (exclude is not None))
+        picked = {}
+        for _ in range(count * DISTINCT_ATTEMPTS):
+            if len(picked) >= count:
+                break
+            pk = self.pick(ids, skew)
+            if pk != exclude:
+                picked[pk] = None
+        return list(picked)
+
+    def count(self, mean: float) -> int:
+        if mean <= 0:
+            return 0
+        return int(self.rng.expovariate(1 / mean))
+
+    def generate(self) -> dict:
+        """
+        Создает данные и возвращает диапазоны id созданных объектов
+        {'users': range, 'recipes': range, 'tags': list,
+        'ingredients': list}.
+        """
+        ingredient_ids = self.generate_ingredients()
+        if not ingredient_ids:
+            raise ValueError('Нет ингредиентов: импортируйте каталог '
+                             '(import_ingredients) или задайте их количество.')
+        tag_ids = self.generate_tags()
+        user_ids = self.generate_users()
+        recipe_ids = self.generate_recipes(user_ids)
+        self.generate_essentials(recipe_ids, tag_ids, ingredient_ids)
+        self.generate_relations(user_ids, recipe_ids)
+        self.finish(recipe_ids)
+        return {'users': user_ids, 'recipes': recipe_ids, 'tags': tag_ids,
+                'ingredients': ingredient_ids}
+
+    def generate_tags(self) -> list:
+        start = self.next_id(Tag)
+        with self.writer(Tag) as writer:
+            for pk in range(start, start + self.tags):
+                writer.write(Tag(id=pk, name=f'Тег {pk}', slug=f'tag-{pk}',
+                                 color=f'#{pk:06X}'))
+        self.log(f'Тегов: {self.tags}.')
+        return list(Tag.objects.order_by('id').values_list('id', flat=True))
+
+    def generate_ingredients(self) -> list:
+        start = self.next_id(Ingredient)
+        with self.writer(Ingredient) as writer:
+            for pk in range(start, start + self.ingredients):
+                writer.write(Ingredient(id=pk, name=f'ингредиент {pk}',
+                                        measurement_unit='г'))
+        self.log(f'Ингредиентов: {self.ingredients}.')
+        return list(Ingredient.objects.order_by('id').values_list(
+            'id', flat=True))
+
+    def generate_users(self) -> range:
+        start = self.next_id(User)
+        password = make_password(self.password)
+        with self.writer(User) as writer:
+            for pk in range(start, start + self.users):
+                writer.write(User(
+                    id=pk, username=f'seed{pk}', email=f'seed{pk}@example.com',
+                    first_name=f'Имя{pk}', last_name=f'Фамилия{pk}',
+                    password=password))
+        self.log(f'Пользователей: {self.users}.')
+        return range(start, start + self.users)
+
+    def generate_images(self) -> List[tuple]:
+        """Создает заглушки изображений: [(файл, ширина, высота)]."""
+        storage = Recipe.image.field.storage
+        images = []
+        for index in range(self.images):
+            color = tuple(self.rng.randrange(256) for _ in range(3))
+            buffer = io.BytesIO()
+            Image.new('RGB', PLACEHOLDER_SIZE, color).save(
+                buffer, 'JPEG', quality=IMAGE_JPEG_QUALITY)
+            name = storage.save(f'{PLACEHOLDER_DIR}/placeholder_{index}.jpg',
+                                ContentFile(buffer.getvalue()))
+            images.append((name, *PLACEHOLDER_SIZE))
+        return images
+
+    def generate_recipes(self, user_ids: range) -> range:
+        start = self.next_id(Recipe)
+        images = self.generate_images() or [('', None, None)]
+        with self.writer(Recipe) as writer:
+            for pk in range(start, start + self.recipes):
+                image, width, height = images[pk % len(images)]
+                writer.write(Recipe(
+                    id=pk, author_id=self.pick(user_ids, self.author_skew),
+                    name=f'{self.rng.choice(WORDS).capitalize()} {pk}',
+                    text=' '.join(self.rng.choices(WORDS, k=20)),
+                    cooking_time=self.rng.randint(1, MAX_COOKING_TIME // 8),
+                    image=image, image_width=width, image_height=height))
+        self.log(f'Рецептов: {self.recipes}.')
+        return range(start, start + self.recipes)
+
+    def generate_essentials(self, recipe_ids: range, tag_ids: list,
+                            ingredient_ids: list) -> None:
+        recipe_tags = Recipe.tags.through
+        with ExitStack() as stack:
+            essentials = stack.enter_context(self.writer(RecipeEssentials))
+            tags = stack.enter_context(self.writer(recipe_tags))
+            for recipe_id in recipe_ids:
+                count = self.rng.randint(self.min_ingredients,
+                                         self.max_ingredients)
+                for ingredient_id in self.pick_distinct(
+                        ingredient_ids, self.ingredient_skew, count):
+                    essentials.write(RecipeEssentials(
+                        recipe_id=recipe_id, ingredient_id=ingredient_id,
+                        amount=self.rng.randint(
+                            1, MAX_INGREDIENT_AMOUNT // 2)))
+                for tag_id in self.rng.sample(
+                        tag_ids, min(len(tag_ids), self.rng.randint(1, 3))):
+                    tags.write(recipe_tags(recipe_id=recipe_id,
+                                           tag_id=tag_id))
+        self.log(f'Ингредиентов в рецептах: {essentials.written}.')
+
+    def generate_relations(self, user_ids: range, recipe_ids: range) -> None:
+        with ExitStack() as stack:
+            favorites = stack.enter_context(self.writer(Favorite))
+            carts = stack.enter_context(self.writer(ShoppingCart))
+            subscriptions = stack.enter_context(self.writer(Subscription))
+            for user_id in user_ids:
+                for writer, mean in ((favorites, self.favorites_per_user),
+                                     (carts, self.carts_per_user)):
+                    for recipe_id in self.pick_distinct(
+                            recipe_ids, self.recipe_skew, self.count(mean)):
+                        writer.write(writer.model(user_id=user_id,
+                                                  recipe_id=recipe_id))
+                for target_id in self.pick_distinct(
+                        user_ids, self.follower_skew,
+                        self.count(self.subscriptions_per_user),
+                        exclude=user_id):
+                    subscriptions.write(Subscription(
+                        subscriber_id=user_id, target_user_id=target_id))
+        self.log(f'Избранного: {favorites.written}, в корзинах: '
+                 f'{carts.written}, подписок: {subscriptions.written}.')
+
+    def finish(self, recipe_ids: range) -> None:
+        """
+        Сбрасывает последовательности id, пересчитывает счетчики,
+        индексирует рецепты для поиска и отмечает изменение данных для
+        кешей ответов.
+        """
+        sequences = connection.ops.sequence_reset_sql(
+            no_style(), [Tag, Ingredient, User, Recipe])
+        if sequences:
+            with connection.cursor() as cursor:
+                for sql in sequences:
+                    cursor.execute(sql)
+        reconcile_counters(apps)
+        for start in range(recipe_ids.start, recipe_ids.stop,
+                           self.batch_size):
+            index_recipes(range(start, min(start + self.batch_size,
+                                           recipe_ids.stop)))
+        self.log('Счетчики пересчитаны, рецепты проиндексированы.')
+        bump_version(RECIPES_VERSION_KEY, RECIPE_SET_VERSION_KEY,
+                     AUTHORS_VERSION_KEY, TAGS_VERSION_KEY,
+                     INGREDIENTS_VERSION_KEY)
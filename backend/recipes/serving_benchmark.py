@@ -0,0 +1,198 @@
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http.client import HTTPConnection
+from typing import Dict, List, Tuple
+from urllib.parse import quote
+
+from django.conf import settings
+from django.db import connection
+
+from recipes.benchmark import BENCH_CACHES, Scenario, auth_only, percentile
+
+SERVER_MODES = ('wsgi', 'asgi')
+SERVER_START_TIMEOUT = 30
+# Модуль настроек серверов прогона: рабочие настройки с тестовой БД
+# и временным каталогом media родительского процесса.
+SERVER_SETTINGS = '''from backend.settings import *  # noqa
+
+DATABASES['default']['NAME'] = {name!r}
+MEDIA_ROOT = {media_root!r}
+CACHES = {caches!r}
+'''
+
+# Смешанная нагрузка: (вес, запросы, выполняемые подряд). Быстрые
+# чтения перемежаются PDF (WeasyPrint) и созданием рецепта с
+# изображением (Pillow), которые блокируют поток на десятки мс.
+MIXED_WORKLOAD = (
+    (30, (Scenario('recipes', 'get', '/api/recipes/'),)),
+    (20, (Scenario('recipe-detail', 'get', '/api/recipes/{recipe}/'),)),
+    (15, (Scenario('ingredients-search', 'get',
+                   '/api/ingredients/?name={ingredient_prefix}'),)),
+    (10, (auth_only('subscriptions', 'get', '/api/users/subscriptions/'),)),
+    (10, (auth_only('feed', 'get', '/api/recipes/feed/'),)),
+    (8, (auth_only('download-pdf', 'get',
+                   '/api/recipes/download_shopping_cart/'),)),
+    (7, (auth_only('recipe-create', 'post', '/api/recipes/',
+                   data='new_recipe', capture='created_recipe'),
+         auth_only('recipe-delete', 'delete',
+                   '/api/recipes/{created_recipe}/'))),
+)
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def write_server_settings(directory: str) -> None:
+    """
+    Записывает в каталог модуль настроек bench_serving_settings для
+    серверов прогона.
+    """
+    path = os.path.join(directory, 'bench_serving_settings.py')
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(SERVER_SETTINGS.format(
+            name=str(connection.settings_dict['NAME']),
+            media_root=settings.MEDIA_ROOT, caches=BENCH_CACHES))
+
+
+@contextmanager
+def serve(mode: str, directory: str, workers: int, threads: int):
+    """
+    Запускает gunicorn с gunicorn.conf.py в режиме mode на свободном
+    порту и останавливает его после прогона.
+
+    Args:
+        mode (str): Режим из SERVER_MODES.
+        directory (str): Каталог с модулем bench_serving_settings.
+        workers (int): Количество воркеров.
+        threads (int): ASGI_THREADS воркера в режиме asgi.
+
+    Yields:
+        int: Порт сервера.
+    """
+    port = get_free_port()
+    env = dict(
+        os.environ,
+        SERVER_MODE=mode,
+        GUNICORN_WORKERS=str(workers),
+        ASGI_THREADS=str(threads),
+        DJANGO_SETTINGS_MODULE='bench_serving_settings',
+        PYTHONPATH=os.pathsep.join((directory, str(settings.BASE_DIR))),
+    )
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py',
+         '--bind', f'127.0.0.1:{port}', '--log-level', 'warning'],
+        cwd=settings.BASE_DIR, env=env)
+    try:
+        wait_until_ready(process, port)
+        yield port
+    finally:
+        process.terminate()
+        process.wait(SERVER_START_TIMEOUT)
+
+
+def wait_until_ready(process, port: int) -> None:
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('Сервер завершился при запуске.')
+        try:
+            client = HTTPConnection('127.0.0.1', port, timeout=1)
+            client.request('GET', '/api/tags/')
+            if client.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('Сервер не запустился за '
+                       f'{SERVER_START_TIMEOUT} секунд.')
+
+
+def worker(port: int, context: dict, requests: int,
+           seed: int) -> List[Tuple[str, float, int]]:
+    """
+    Выполняет requests пачек запросов смешанной нагрузки через одно
+    keep-alive соединение.
+
+    Returns:
+        list: Тройки (сценарий, время ответа в секундах, код ответа).
+    """
+    context = dict(context)
+    rng = random.Random(seed)
+    weights = [weight for weight, _ in MIXED_WORKLOAD]
+    headers = {'Authorization': f'Token {context["token"]}',
+               'Content-Type': 'application/json'}
+    client = HTTPConnection('127.0.0.1', port, timeout=60)
+    samples = []
+    for _ in range(requests):
+        _, scenarios = rng.choices(MIXED_WORKLOAD, weights)[0]
+        for scenario in scenarios:
+            body = None
+            if scenario.data is not None:
+                body = json.dumps(context[scenario.data])
+            started = time.perf_counter()
+            path = quote(scenario.path.format(**context), safe='/?=&')
+            client.request(scenario.method.upper(), path, body, headers)
+            response = client.getresponse()
+            content = response.read()
+            samples.append((scenario.name, time.perf_counter() - started,
+                            response.status))
+            if scenario.capture:
+                if response.status >= 300:
+                    break
+                context[scenario.capture] = json.loads(content)['id']
+    client.close()
+    return samples
+
+
+def summarize(samples: List[Tuple[str, float, int]]) -> dict:
+    timings = [elapsed for _, elapsed, _ in samples]
+    return {
+        'requests': len(samples),
+        'errors': sum(status >= 500 for _, _, status in samples),
+        'p50': percentile(timings, 50),
+        'p95': percentile(timings, 95),
+        'p99': percentile(timings, 99),
+    }
+
+
+def run_serving(context: dict, mode: str, directory: str, workers: int,
+                threads: int, concurrency: int, requests: int,
+                warmup: int) -> Dict[str, dict]:
+    """
+    Прогоняет смешанную нагрузку через сервер в режиме mode.
+
+    concurrency клиентских потоков выполняют по warmup пачек без
+    измерений, затем по requests пачек с измерением.
+
+    Returns:
+        dict: {сценарий: {'requests', 'errors', 'p50', 'p95', 'p99'}}
+        и общий итог 'total' с 'throughput' (запросов в секунду);
+        время в секундах.
+    """
+    with serve(mode, directory, workers, threads) as port:
+        with ThreadPoolExecutor(concurrency) as executor:
+            list(executor.map(
+                lambda number: worker(port, context, warmup, -1 - number),
+                range(concurrency)))
+            started = time.perf_counter()
+            batches = list(executor.map(
+                lambda number: worker(port, context, requests, number),
+                range(concurrency)))
+            elapsed = time.perf_counter() - started
+    samples = [sample for batch in batches for sample in batch]
+    results = {}
+    for name in dict.fromkeys(name for name, _, _ in samples):
+        results[name] = summarize(
+            [sample for sample in samples if sample[0] == name])
+    results['total'] = summarize(samples)
+    results['total']['throughput'] = len(samples) / elapsed
+    return results
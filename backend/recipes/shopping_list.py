@@ -0,0 +1,201 @@
+from collections import defaultdict
+from typing import Dict, Iterable
+
+from django.db import transaction
+from django.db.models import F, Sum
+
+from core.constants.recipes import SHOPPING_LIST_BATCH_SIZE
+from recipes.models import (RecipeEssentials, ShoppingCart, ShoppingList,
+                            ShoppingListItem, ShoppingListJob)
+
+
+def get_recipe_amounts(recipe_ids: Iterable[int]) -> Dict[int, int]:
+    """
+    Возвращает суммарное количество каждого ингредиента в рецептах.
+
+    Args:
+        recipe_ids (Iterable[int]): Идентификаторы рецептов.
+
+    Returns:
+        dict: {id ингредиента: количество}.
+    """
+    return dict(
+        RecipeEssentials.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('ingredient_id').annotate(total=Sum('amount'))
+    )
+
+
+def materialize_shopping_list(
+        user_id: int, exclude_recipes: Iterable[int] = ()) -> ShoppingList:
+    """
+    Пересобирает список покупок пользователя по его корзине в текущей
+    транзакции. Строка ShoppingList создается при необходимости и
+    остается заблокированной до конца транзакции, поэтому изменения
+    корзины (apply_shopping_list_changes) ждут окончания сборки.
+
+    Args:
+        user_id (int): Идентификатор пользователя.
+        exclude_recipes (Iterable[int]): Рецепты, которые не учитываются
+        (удаляемые, но еще находящиеся в корзине).
+
+    Returns:
+        ShoppingList: Состояние списка с новой версией.
+    """
+    shopping_list, _ = ShoppingList.objects.select_for_update(
+    ).get_or_create(user_id=user_id)
+    ShoppingListItem.objects.filter(user_id=user_id).delete()
+    totals = RecipeEssentials.objects.filter(
+        recipe__shoppingcart__user_id=user_id
+    ).exclude(recipe_id__in=exclude_recipes).values_list(
+        'ingredient_id').annotate(total=Sum('amount'))
+    ShoppingListItem.objects.bulk_create(
+        ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id,
+                         amount=total)
+        for ingredient_id, total in totals
+    )
+    ShoppingList.objects.filter(pk=shopping_list.pk).update(
+        version=F('version') + 1)
+    shopping_list.refresh_from_db(fields=('version',))
+    return shopping_list
+
+
+def rebuild_shopping_list(user) -> ShoppingList:
+    """
+    Полностью пересобирает список покупок пользователя по его корзине.
+
+    Args:
+        user (User): Пользователь.
+
+    Returns:
+        ShoppingList: Состояние списка с новой версией.
+    """
+    with transaction.atomic():
+        shopping_list = materialize_shopping_list(user.pk)
+    discard_shopping_list_jobs([user.pk])
+    return shopping_list
+
+
+def get_shopping_list_version(user) -> int:
+    """
+    Возвращает версию списка покупок пользователя, при необходимости
+    материализуя список.
+
+    Args:
+        user (User): Пользователь.
+
+    Returns:
+        int: Версия списка покупок.
+    """
+    shopping_list = ShoppingList.objects.filter(user=user).first()
+    if shopping_list is None:
+        shopping_list = rebuild_shopping_list(user)
+    return shopping_list.version
+
+
+def apply_shopping_list_changes(users, deltas: Dict[int, int],
+                                exclude_recipes: Iterable[int] = ()) -> None:
+    """
+    Применяет изменения количества ингредиентов к спискам покупок
+    пользователей и увеличивает их версии.
+
+    Списки блокируются (select_for_update) в порядке id пользователей.
+    Списки, которые еще не материализованы, собираются целиком под той
+    же блокировкой и уже содержат изменение: если пропустить их,
+    изменение, зафиксированное во время параллельной сборки списка
+    (get_shopping_list_version), было бы потеряно.
+
+    Args:
+        users (Iterable[int]): Идентификаторы пользователей.
+        deltas (dict): {id ингредиента: изменение количества}.
+        exclude_recipes (Iterable[int]): Рецепты, которые не учитываются
+        при сборке списков (см. materialize_shopping_list).
+    """
+    deltas = {ingredient: delta for ingredient, delta in deltas.items()
+              if delta}
+    if not deltas:
+        return
+    by_delta = defaultdict(list)
+    for ingredient_id, delta in deltas.items():
+        by_delta[delta].append(ingredient_id)
+
+    user_ids = sorted(set(users))
+    for start in range(0, len(user_ids), SHOPPING_LIST_BATCH_SIZE):
+        batch = user_ids[start:start + SHOPPING_LIST_BATCH_SIZE]
+        with transaction.atomic():
+            existing = list(ShoppingList.objects.select_for_update().filter(
+                user_id__in=batch).order_by('user_id').values_list(
+                'user_id', flat=True))
+            for user_id in sorted(set(batch) - set(existing)):
+                materialize_shopping_list(user_id, exclude_recipes)
+            ShoppingListItem.objects.bulk_create(
+                [ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id)
+                 for user_id in existing
+                 for ingredient_id, delta in deltas.items() if delta > 0],
+                ignore_conflicts=True
+            )
+            for delta, ingredient_ids in by_delta.items():
+                ShoppingListItem.objects.filter(
+                    user_id__in=existing, ingredient_id__in=ingredient_ids
+                ).update(amount=F('amount') + delta)
+            ShoppingListItem.objects.filter(
+                user_id__in=existing, amount__lte=0).delete()
+            ShoppingList.objects.filter(user_id__in=existing).update(
+                version=F('version') + 1)
+        discard_shopping_list_jobs(batch)
+
+
+def add_recipes_to_shopping_list(user, recipe_ids: Iterable[int]) -> None:
+    """Добавляет ингредиенты рецептов в список покупок пользователя."""
+    apply_shopping_list_changes([user.pk], get_recipe_amounts(recipe_ids))
+
+
+def remove_recipes_from_shopping_list(user,
+                                      recipe_ids: Iterable[int]) -> None:
+    """Вычитает ингредиенты рецептов из списка покупок пользователя."""
+    amounts = get_recipe_amounts(recipe_ids)
+    apply_shopping_list_changes(
+        [user.pk],
+        {ingredient: -amount for ingredient, amount in amounts.items()})
+
+
+def apply_recipe_changes(recipe, old_amounts: Dict[int, int],
+                         new_amounts: Dict[int, int],
+                         deleted: bool = False) -> None:
+    """
+    Обновляет списки покупок всех пользователей, у которых рецепт в
+    корзине, после изменения состава рецепта.
+
+    Args:
+        recipe (Recipe): Измененный рецепт.
+        old_amounts (dict): Состав до изменения {id ингредиента: кол-во}.
+        new_amounts (dict): Состав после изменения.
+        deleted (bool): Рецепт удаляется: он еще в корзинах, но не
+        учитывается в заново собранных списках.
+    """
+    deltas = {
+        ingredient: new_amounts.get(ingredient, 0)
+        - old_amounts.get(ingredient, 0)
+        for ingredient in old_amounts.keys() | new_amounts.keys()
+    }
+    apply_shopping_list_changes(
+        ShoppingCart.objects.filter(recipe=recipe).values_list(
+            'user_id', flat=True), deltas,
+        exclude_recipes=[recipe.pk] if deleted else ())
+
+
+def discard_shopping_list_jobs(users) -> None:
+    """
+    Удаляет задания и готовые PDF-файлы пользователей, у которых
+    изменился список покупок. Задание, которое в этот момент выполняется,
+    будет отброшено воркером при сохранении результата.
+
+    Args:
+        users (QuerySet | list): Пользователи (или их id).
+    """
+    jobs = ShoppingListJob.objects.filter(user__in=users)
+    files = [job.file.name for job in jobs.exclude(file='').only('file')]
+    jobs.delete()
+    storage = ShoppingListJob.file.field.storage
+    transaction.on_commit(
+        lambda: [storage.delete(name) for name in files])
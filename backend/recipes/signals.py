@@ -0,0 +1,115 @@
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from core.background import run_in_background
+from core.versions import bump_version
+from recipes.images import (delete_image_files, get_variant_files,
+                            process_recipe_image)
+from recipes.ingredient_index import INGREDIENTS_VERSION_KEY
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.search import index_recipes, remove_recipes_from_index
+from recipes.shopping_list import apply_recipe_changes, get_recipe_amounts
+from recipes.versions import (RECIPE_SET_VERSION_KEY, TAGS_VERSION_KEY,
+                              bump_recipes)
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_recipe_from_shopping_lists(sender, instance, **kwargs):
+    """
+    Вычитает ингредиенты удаляемого рецепта из списков покупок всех
+    пользователей, у которых он в корзине (в том числе при удалении
+    через админ-панель или каскадом вместе с автором).
+    """
+    apply_recipe_changes(instance, get_recipe_amounts([instance.pk]), {},
+                         deleted=True)
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_recipe_image_variants(sender, instance, **kwargs):
+    """
+    Удаляет файлы вариантов изображения удаляемого рецепта после
+    фиксации удаления. Варианты читаются из строки рецепта под
+    блокировкой: объект мог быть загружен до окончания обработки.
+    """
+    variants = Recipe.objects.select_for_update().filter(
+        pk=instance.pk).values_list('image_variants', flat=True).first()
+    if variants:
+        run_in_background(delete_image_files, get_variant_files(variants))
+
+
+@receiver(pre_save, sender=Recipe)
+def reset_replaced_image(sender, instance, raw=False, update_fields=None,
+                         **kwargs):
+    """
+    При замене изображения рецепта (через API или админ-панель)
+    сбрасывает данные обработки и запоминает файлы вариантов прежнего
+    изображения. Строка рецепта блокируется до конца транзакции
+    сохранения (Recipe.save всегда выполняется в транзакции), поэтому
+    обработка прежнего изображения не запишет новые варианты между
+    чтением прежних вариантов и сохранением замены (она удалит их сама).
+    """
+    if raw or instance._state.adding or (
+            update_fields is not None and 'image' not in update_fields):
+        return
+    previous = Recipe.objects.select_for_update().filter(
+        pk=instance.pk).values_list('image', 'image_variants').first()
+    if previous is None or previous[0] == instance.image.name:
+        return
+    instance.image_width = instance.image_height = None
+    instance.image_variants = {}
+    instance.image_placeholder = ''
+    instance._replaced_image_files = get_variant_files(previous[1] or {})
+
+
+@receiver(post_save, sender=Recipe)
+def process_replaced_image(sender, instance, **kwargs):
+    """
+    Обрабатывает новое изображение рецепта после замены и удаляет
+    варианты прежнего (после фиксации транзакции).
+    """
+    stale_files = instance.__dict__.pop('_replaced_image_files', None)
+    if stale_files is not None:
+        run_in_background(process_recipe_image, instance.pk, stale_files)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def bump_ingredients_version(sender, **kwargs):
+    """Отмечает изменение каталога ингредиентов (индекс перестроится)."""
+    bump_version(INGREDIENTS_VERSION_KEY)
+
+
+@receiver(post_save, sender=Ingredient)
+def reindex_ingredient_recipes(sender, instance, created, **kwargs):
+    """Обновляет поисковые документы рецептов с переименованным
+    ингредиентом."""
+    if not created:
+        index_recipes(instance.recipes.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_recipe_from_search_index(sender, instance, **kwargs):
+    """Удаляет поисковый документ удаленного рецепта."""
+    remove_recipes_from_index([instance.pk])
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def bump_recipe_version(sender, instance, created=True, update_fields=None,
+                        **kwargs):
+    """
+    Отмечает изменение рецепта (для условных GET-запросов и кеша
+    ответов). При создании, удалении и изменении полей, по которым
+    ищутся рецепты, отмечается и изменение множества рецептов.
+    """
+    bump_recipes([instance.pk])
+    if created or not update_fields or {'name', 'text'} & set(update_fields):
+        bump_version(RECIPE_SET_VERSION_KEY)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_tags_version(sender, **kwargs):
+    """Отмечает изменение тегов (для условных GET-запросов)."""
+    bump_version(TAGS_VERSION_KEY)
@@ -0,0 +1,444 @@
+import io
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models.signals import pre_save
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from core.constants.recipes import INGREDIENT_SEARCH_LIMIT
+from core.counters import change_counter
+from core.versions import get_version
+from recipes import feed, ingredient_index, signals
+from recipes.feed import (backfill_timeline, get_feed_sources,
+                          update_feed_mode)
+from recipes.images import process_recipe_image
+from recipes.ingredient_import import import_ingredients, read_csv, read_json
+from recipes.ingredient_index import (INGREDIENTS_VERSION_KEY, IngredientIndex,
+                                      get_ingredient_index,
+                                      rebuild_ingredient_index)
+from recipes.membership import (FAVORITES, IdSet, get_cache_key,
+                                get_membership, load_membership,
+                                update_membership)
+from recipes.models import (Favorite, Ingredient, PulledAuthor, Recipe,
+                            RecipeEssentials, ShoppingCart, ShoppingList,
+                            ShoppingListItem, TimelineEntry)
+from recipes.search import index_recipes, search_recipes
+from recipes.shopping_list import add_recipes_to_shopping_list
+from users.models import Subscription, User
+
+
+CSV_CATALOG = (
+    'соль,г\n'
+    '"мука, пшеничная",г\n'
+    'соль,г\n'
+    'яйцо\n'
+    ',шт\n'
+    'молоко,мл\n'
+)
+
+
+class IngredientImportTest(TestCase):
+    """Проверяет потоковый импорт ингредиентов из CSV и JSON."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def run_command(self, name: str, content: str, *args) -> str:
+        path = self.directory / name
+        path.write_text(content, encoding='utf-8')
+        output = io.StringIO()
+        call_command('import_ingredients', '--file', str(path), *args,
+                     stdout=output)
+        return output.getvalue()
+
+    def get_catalog(self):
+        return set(Ingredient.objects.values_list('name',
+                                                  'measurement_unit'))
+
+    def test_csv_counts(self):
+        stats = import_ingredients(read_csv(io.StringIO(CSV_CATALOG)),
+                                   batch_size=2)
+        self.assertEqual(stats, {'read': 6, 'inserted': 3, 'updated': 0,
+                                 'skipped': 1, 'invalid': 2})
+        self.assertEqual(self.get_catalog(), {
+            ('соль', 'г'), ('мука, пшеничная', 'г'), ('молоко', 'мл')})
+
+    def test_json_array_and_lines(self):
+        array = json.dumps([
+            {'name': 'соль', 'measurement_unit': 'г'},
+            {'name': 'сахар', 'measurement_unit': 'г'},
+            {'name': 'перец'},
+        ], ensure_ascii=False)
+        lines = '{"name": "соль", "measurement_unit": "г"}\n7\n'
+        for content, expected in ((array, (2, 1)), (lines, (0, 1))):
+            with self.subTest(content=content):
+                stats = import_ingredients(read_json(io.StringIO(content)),
+                                           batch_size=100)
+                self.assertEqual((stats['inserted'], stats['invalid']),
+                                 expected)
+        self.assertEqual(self.get_catalog(), {('соль', 'г'), ('сахар', 'г')})
+
+    def test_rerun_is_idempotent(self):
+        output = self.run_command('ingredients.csv', CSV_CATALOG)
+        self.assertIn('добавлено 3, обновлено 0, пропущено 1', output)
+        catalog = set(Ingredient.objects.values_list(
+            'id', 'name', 'measurement_unit'))
+        output = self.run_command('ingredients.csv', CSV_CATALOG)
+        self.assertIn('добавлено 0, обновлено 0, пропущено 4', output)
+        self.assertEqual(set(Ingredient.objects.values_list(
+            'id', 'name', 'measurement_unit')), catalog)
+
+    def test_update_units(self):
+        Ingredient.objects.create(name='соль', measurement_unit='кг')
+        content = json.dumps([{'name': 'соль', 'measurement_unit': 'г'}],
+                             ensure_ascii=False)
+        self.run_command('units.json', content)
+        self.assertEqual(self.get_catalog(),
+                         {('соль', 'кг'), ('соль', 'г')})
+        Ingredient.objects.filter(measurement_unit='г').delete()
+        output = self.run_command('units.json', content, '--update-units')
+        self.assertIn('добавлено 0, обновлено 1', output)
+        self.assertEqual(self.get_catalog(), {('соль', 'г')})
+
+
+class IngredientIndexTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        ingredient_index._index = ingredient_index._index_version = None
+        ingredient_index._rebuilding = False
+
+    def test_short_query_uses_word_prefixes(self):
+        index = IngredientIndex([(1, 'Соль', 'г'), (2, 'Фасоль', 'г'),
+                                 (3, 'Сахар', 'г'),
+                                 (4, 'Мука пшеничная', 'г'),
+                                 (5, 'Перец черный', 'г')])
+        self.assertEqual(index.search('пш'), [(4, 'Мука пшеничная', 'г')])
+        self.assertEqual(index.search('с'),
+                         [(3, 'Сахар', 'г'), (1, 'Соль', 'г')])
+        self.assertEqual(index.search('ч'), [(5, 'Перец черный', 'г')])
+        self.assertEqual(index.search('ль'), [])
+        self.assertEqual(index.search('оль'),
+                         [(1, 'Соль', 'г'), (2, 'Фасоль', 'г')])
+        self.assertNotIn('ль', index.word_prefixes)
+
+    def test_default_limit(self):
+        index = IngredientIndex((number, f'соль {number:03}', 'г')
+                                for number in range(INGREDIENT_SEARCH_LIMIT
+                                                    + 10))
+        self.assertEqual(len(index.search('соль')), INGREDIENT_SEARCH_LIMIT)
+        self.assertEqual(len(index.search('соль', None)),
+                         INGREDIENT_SEARCH_LIMIT + 10)
+
+    def test_index_is_built_in_background(self):
+        Ingredient.objects.create(name='соль', measurement_unit='г')
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertIsNone(get_ingredient_index())
+            self.assertIsNone(get_ingredient_index())
+        self.assertEqual(len(callbacks), 1)
+        rebuild_ingredient_index(get_version(INGREDIENTS_VERSION_KEY))
+        self.assertEqual(len(get_ingredient_index()), 1)
+
+    def test_rebuild_serves_previous_index(self):
+        Ingredient.objects.create(name='соль', measurement_unit='г')
+        rebuild_ingredient_index(get_version(INGREDIENTS_VERSION_KEY))
+        previous = get_ingredient_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name='сахар', measurement_unit='г')
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertIs(get_ingredient_index(), previous)
+            self.assertIs(get_ingredient_index(), previous)
+        self.assertEqual(len(callbacks), 1)
+        rebuild_ingredient_index(get_version(INGREDIENTS_VERSION_KEY))
+        self.assertEqual(len(get_ingredient_index()), 2)
+
+
+class MembershipCacheTest(TestCase):
+    """Проверяет кеш множеств избранного и корзины."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='user', email='user@example.com', password='password')
+        self.recipes = [
+            Recipe.objects.create(author=self.user, name=f'Рецепт {number}',
+                                  text='Описание', cooking_time=10,
+                                  image='recipes/images/test.png')
+            for number in range(3)
+        ]
+
+    def favorite(self, recipe):
+        with self.captureOnCommitCallbacks(execute=True):
+            Favorite.objects.create(user=self.user, recipe=recipe)
+            update_membership(self.user, FAVORITES, added=[recipe.pk])
+
+    def test_change_invalidates_cached_sets(self):
+        self.assertEqual(len(load_membership(self.user.pk)[FAVORITES]), 0)
+        self.favorite(self.recipes[0])
+        self.assertIn(self.recipes[0].pk,
+                      load_membership(self.user.pk)[FAVORITES])
+
+    def test_concurrent_changes_are_not_lost(self):
+        load_membership(self.user.pk)
+        self.favorite(self.recipes[0])
+        self.favorite(self.recipes[1])
+        favorites = load_membership(self.user.pk)[FAVORITES]
+        self.assertIn(self.recipes[0].pk, favorites)
+        self.assertIn(self.recipes[1].pk, favorites)
+
+    def test_rolled_back_change_keeps_request_sets(self):
+        membership = get_membership(self.user)
+        self.assertFalse(membership.is_favorited(self.recipes[0].pk))
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    update_membership(self.user, FAVORITES,
+                                      added=[self.recipes[0].pk])
+                    raise IntegrityError
+            except IntegrityError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertFalse(membership.is_favorited(self.recipes[0].pk))
+        self.favorite(self.recipes[0])
+        self.assertTrue(membership.is_favorited(self.recipes[0].pk))
+
+    def test_set_built_before_commit_is_ignored(self):
+        load_membership(self.user.pk)
+        stale_version, _ = cache.get(get_cache_key(FAVORITES, self.user.pk))
+        self.favorite(self.recipes[0])
+        # Чтение, начатое до фиксации, сохраняет множество прежней версии.
+        cache.set(get_cache_key(FAVORITES, self.user.pk),
+                  (stale_version, IdSet().to_bytes()))
+        self.assertIn(self.recipes[0].pk,
+                      load_membership(self.user.pk)[FAVORITES])
+
+
+class ShoppingListTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='user', email='user@example.com', password='password')
+        ingredient = Ingredient.objects.create(name='соль',
+                                               measurement_unit='г')
+        self.recipes = []
+        for number in range(2):
+            recipe = Recipe.objects.create(
+                author=self.user, name=f'Рецепт {number}', text='Описание',
+                cooking_time=10, image='recipes/images/test.png')
+            RecipeEssentials.objects.create(recipe=recipe,
+                                            ingredient=ingredient, amount=5)
+            self.recipes.append(recipe)
+
+    def test_change_materializes_missing_list(self):
+        ShoppingCart.objects.create(user=self.user, recipe=self.recipes[0])
+        ShoppingCart.objects.create(user=self.user, recipe=self.recipes[1])
+        add_recipes_to_shopping_list(self.user, [self.recipes[1].pk])
+        self.assertTrue(ShoppingList.objects.filter(user=self.user).exists())
+        self.assertEqual(
+            list(ShoppingListItem.objects.filter(
+                user=self.user).values_list('amount', flat=True)), [10])
+
+    def test_deleted_recipe_is_not_in_materialized_list(self):
+        RecipeEssentials.objects.filter(recipe=self.recipes[1]).update(
+            amount=3)
+        for recipe in self.recipes:
+            ShoppingCart.objects.create(user=self.user, recipe=recipe)
+        self.recipes[0].delete()
+        self.assertEqual(
+            list(ShoppingListItem.objects.filter(
+                user=self.user).values_list('amount', flat=True)), [3])
+
+
+@mock.patch.object(feed, 'FEED_FANOUT_MAX_FOLLOWERS', 1)
+class FeedModeTest(TestCase):
+
+    def setUp(self):
+        self.author, self.reader, self.other = (
+            User.objects.create_user(username=name,
+                                     email=f'{name}@example.com',
+                                     password='password')
+            for name in ('author', 'reader', 'other'))
+        self.recipe_ids = {
+            Recipe.objects.create(author=self.author, name=f'Рецепт {number}',
+                                  text='Описание', cooking_time=10,
+                                  image='recipes/images/test.png').pk
+            for number in range(2)
+        }
+        self.subscribe(self.reader)
+
+    def subscribe(self, user):
+        Subscription.objects.create(subscriber=user, target_user=self.author)
+        change_counter(User, self.author.pk, 'followers_count', 1)
+        self.author.refresh_from_db()
+        backfill_timeline(user.pk, self.author)
+        update_feed_mode(self.author.pk)
+
+    def unsubscribe(self, user):
+        Subscription.objects.filter(subscriber=user,
+                                    target_user=self.author).delete()
+        change_counter(User, self.author.pk, 'followers_count', -1)
+        update_feed_mode(self.author.pk)
+
+    def read_feed(self):
+        recipe_ids = []
+        for queryset, _ in get_feed_sources(self.reader):
+            field = 'recipe_id' if queryset.model is TimelineEntry else 'id'
+            recipe_ids += queryset.values_list(field, flat=True)
+        return recipe_ids
+
+    def test_recipes_survive_mode_changes(self):
+        self.assertCountEqual(self.read_feed(), self.recipe_ids)
+        self.subscribe(self.other)
+        self.assertTrue(PulledAuthor.objects.filter(
+            author=self.author).exists())
+        self.assertFalse(TimelineEntry.objects.filter(
+            author=self.author).exists())
+        self.assertCountEqual(self.read_feed(), self.recipe_ids)
+        self.unsubscribe(self.other)
+        self.assertFalse(PulledAuthor.objects.filter(
+            author=self.author).exists())
+        self.assertEqual(TimelineEntry.objects.filter(
+            user=self.reader).count(), len(self.recipe_ids))
+        self.assertCountEqual(self.read_feed(), self.recipe_ids)
+
+    def test_entries_of_pulled_author_are_not_read(self):
+        PulledAuthor.objects.create(author=self.author)
+        self.assertCountEqual(self.read_feed(), self.recipe_ids)
+
+
+class RecipeImageFilesTest(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.variants = {
+            'small': {'webp': 'variants/old_320.webp',
+                      'jpeg': 'variants/old_320.jpg'}}
+        for formats in self.variants.values():
+            for name in formats.values():
+                default_storage.save(name, ContentFile(b'image'))
+        user = User.objects.create_user(
+            username='user', email='user@example.com', password='password')
+        self.recipe = Recipe.objects.create(
+            author=user, name='Рецепт', text='Описание', cooking_time=10,
+            image='recipes/images/old.png', image_variants=self.variants)
+
+    def variant_files_exist(self):
+        return [default_storage.exists(name)
+                for formats in self.variants.values()
+                for name in formats.values()]
+
+    def test_delete_removes_variants(self):
+        with mock.patch.object(signals, 'run_in_background',
+                               lambda func, *args: func(*args)):
+            self.recipe.delete()
+        self.assertEqual(self.variant_files_exist(), [False, False])
+
+    def test_replace_removes_variants(self):
+        stale = Recipe.objects.get(pk=self.recipe.pk)
+        stale.image_variants = {}
+        stale.image = 'recipes/images/new.png'
+        with mock.patch.object(signals, 'run_in_background') as background:
+            stale.save()
+        background.assert_called_once_with(
+            process_recipe_image, self.recipe.pk,
+            ['variants/old_320.webp', 'variants/old_320.jpg'])
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_variants, {})
+
+    def test_unchanged_image_keeps_variants(self):
+        with mock.patch.object(signals, 'run_in_background') as background:
+            self.recipe.name = 'Новое название'
+            self.recipe.save()
+        background.assert_not_called()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_variants, self.variants)
+        self.assertEqual(self.variant_files_exist(), [True, True])
+
+
+class RecipeSaveTransactionTest(TransactionTestCase):
+    """Проверяет, что сигналы сохранения рецепта идут в его транзакции."""
+
+    def test_replace_outside_transaction(self):
+        user = User.objects.create_user(
+            username='user', email='user@example.com', password='password')
+        recipe = Recipe.objects.create(
+            author=user, name='Рецепт', text='Описание', cooking_time=10,
+            image='recipes/images/old.png')
+        in_transaction = []
+
+        def record(sender, **kwargs):
+            in_transaction.append(connection.in_atomic_block)
+
+        pre_save.connect(record, sender=Recipe)
+        self.addCleanup(pre_save.disconnect, record, sender=Recipe)
+        recipe.image = 'recipes/images/new.png'
+        with mock.patch.object(signals, 'run_in_background') as background:
+            recipe.save()
+        self.assertEqual(in_transaction, [True])
+        background.assert_called_once_with(process_recipe_image, recipe.pk,
+                                           [])
+
+
+class RecipeSearchTest(TestCase):
+    """Проверяет полнотекстовый поиск рецептов."""
+
+    def setUp(self):
+        author = User.objects.create_user(
+            username='author', email='author@example.com', password='password')
+        self.kit = Ingredient.objects.create(name='борщевой набор',
+                                             measurement_unit='г')
+
+        def create(name, text):
+            return Recipe.objects.create(
+                author=author, name=name, text=text, cooking_time=10,
+                image='recipes/images/test.png')
+
+        self.by_name = create('Борщ', 'Суп со свеклой')
+        self.by_text = create('Суп', 'Почти как борщ')
+        self.by_ingredient = create('Обед', 'Суп на каждый день')
+        RecipeEssentials.objects.create(recipe=self.by_ingredient,
+                                        ingredient=self.kit, amount=1)
+        index_recipes(Recipe.objects.values_list('id', flat=True))
+
+    def search(self, query):
+        return list(search_recipes(Recipe.objects.all(), query))
+
+    def test_ranks_name_above_ingredients_and_text(self):
+        self.assertEqual(self.search('борщ'),
+                         [self.by_name, self.by_ingredient, self.by_text])
+
+    def test_tokens_are_required_prefixes(self):
+        self.assertEqual(self.search('БОР свек'), [self.by_name])
+        self.assertEqual(self.search('борщ кекс'), [])
+        self.assertEqual(len(self.search('  ')), 3)
+
+    def test_index_follows_changes(self):
+        self.kit.name = 'свекольный набор'
+        self.kit.save()
+        self.assertEqual(self.search('свекольн'), [self.by_ingredient])
+        self.by_name.delete()
+        self.assertEqual(self.search('борщ'), [self.by_text])
+
+    def test_cursor_mode_is_ignored_for_search(self):
+        response = self.client.get('/api/recipes/', {
+            'search': 'борщ', 'pagination': 'cursor', 'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        page = response.json()
+        self.assertEqual(page['count'], 3)
+        self.assertEqual(
+            [recipe['id'] for recipe in page['results']],
+            [self.by_name.pk, self.by_ingredient.pk])
+        self.assertIn('page=2', page['next'])
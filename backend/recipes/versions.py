@@ -0,0 +1,32 @@
+from typing import Iterable
+
+from core.versions import bump_version
+
+RECIPES_VERSION_KEY = 'recipes'
+# Изменяется, когда может измениться состав выборок рецептов: при
+# создании и удалении рецепта, изменении названия, описания, тегов или
+# ингредиентов.
+RECIPE_SET_VERSION_KEY = 'recipe_set'
+AUTHORS_VERSION_KEY = 'authors'
+TAGS_VERSION_KEY = 'tags'
+
+
+def recipe_version_key(recipe_id: int) -> str:
+    """Версия отдельного рецепта."""
+    return f'recipe:{recipe_id}'
+
+
+def author_version_key(user_id: int) -> str:
+    """Версия данных автора (имя, username и т.д.)."""
+    return f'author:{user_id}'
+
+
+def membership_version_key(user_id: int) -> str:
+    """Версия избранного, корзины и подписок пользователя."""
+    return f'membership:{user_id}'
+
+
+def bump_recipes(recipe_ids: Iterable[int]) -> None:
+    """Отмечает изменение рецептов и списка рецептов."""
+    bump_version(RECIPES_VERSION_KEY,
+                 *[recipe_version_key(pk) for pk in recipe_ids])
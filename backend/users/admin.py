@@ -18,7 +18,8 @@ class UserAdmin(admin.ModelAdmin):
         ordering (tuple): Поле(-я), по которому(-ым) сортируется
         список пользователей.
     """
-    list_display = ('username', 'email', 'first_name', 'last_name', 'role')
+    list_display = ('username', 'email', 'first_name', 'last_name', 'role',
+                    'recipes_count', 'followers_count')
     list_filter = ('role',)
     search_fields = ('username', 'email', 'first_name', 'last_name')
     ordering = ('id',)
@@ -0,0 +1,137 @@
+import copy
+import time
+from collections import OrderedDict
+from hashlib import sha256
+from threading import Lock
+from typing import Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from core import metrics
+from core.constants.users import (AUTH_TOKEN_CACHE_TIMEOUT,
+                                  AUTH_TOKEN_LOCAL_SIZE,
+                                  AUTH_TOKEN_LOCAL_TIMEOUT)
+
+# Бэкенды кеша, которые хранят данные в памяти процесса.
+PROCESS_LOCAL_CACHES = ('django.core.cache.backends.locmem.LocMemCache',
+                        'django.core.cache.backends.dummy.DummyCache')
+
+TOKEN_LOOKUPS = 'auth_token_lookups_total'
+
+_local_cache = OrderedDict()
+_local_lock = Lock()
+
+
+def is_shared_cache() -> bool:
+    """Проверяет, общий ли кеш Django для всех процессов."""
+    return settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES
+
+
+def get_cache_key(key: str) -> str:
+    """Возвращает ключ кеша для токена (сам токен в ключ не попадает)."""
+    return f'auth_token:{sha256(key.encode()).hexdigest()}'
+
+
+def get_local(cache_key: str):
+    with _local_lock:
+        entry = _local_cache.get(cache_key)
+        if entry is None:
+            return None
+        token, expires_at = entry
+        if expires_at < time.monotonic():
+            del _local_cache[cache_key]
+            return None
+        _local_cache.move_to_end(cache_key)
+        return token
+
+
+def set_local(cache_key: str, token) -> None:
+    with _local_lock:
+        _local_cache[cache_key] = (
+            token, time.monotonic() + AUTH_TOKEN_LOCAL_TIMEOUT)
+        _local_cache.move_to_end(cache_key)
+        while len(_local_cache) > AUTH_TOKEN_LOCAL_SIZE:
+            _local_cache.popitem(last=False)
+
+
+def invalidate_tokens(keys: Iterable[str]) -> None:
+    """
+    Удаляет токены из кеша текущего процесса и общего кеша.
+
+    Общий кеш очищается и сразу, и после фиксации транзакции, чтобы
+    параллельный запрос не успел сохранить в кеш прежнее состояние
+    пользователя. В других процессах запись из локального кеша живет
+    не дольше AUTH_TOKEN_LOCAL_TIMEOUT секунд.
+
+    Args:
+        keys (Iterable[str]): Токены.
+    """
+    cache_keys = [get_cache_key(key) for key in keys]
+    if not cache_keys:
+        return
+    with _local_lock:
+        for cache_key in cache_keys:
+            _local_cache.pop(cache_key, None)
+    cache.delete_many(cache_keys)
+    transaction.on_commit(lambda: cache.delete_many(cache_keys))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Аутентификация по токену с кешированием токена и пользователя.
+
+    TokenAuthentication выполняет запрос к authtoken_token (с JOIN
+    users_user) на каждый запрос. Здесь результат кешируется в два
+    уровня:
+        - локальный LRU-кеш процесса (AUTH_TOKEN_LOCAL_SIZE записей,
+        TTL AUTH_TOKEN_LOCAL_TIMEOUT);
+        - общий кеш Django, общий для всех воркеров gunicorn (TTL
+        AUTH_TOKEN_CACHE_TIMEOUT). Если кеш Django хранится в памяти
+        процесса (LocMemCache), этот уровень пропускается и при промахе
+        локального кеша токен читается из БД: иначе удаленный токен
+        продолжал бы работать в других воркерах.
+
+    Записи удаляются при выходе (удалении токена), а также при любом
+    сохранении пользователя: смене пароля, деактивации, смене роли
+    (см. users.signals). Как и в TokenAuthentication, request.auth -
+    объект Token.
+
+    Удаление затрагивает локальный кеш только того процесса, который
+    его выполнил. В остальных воркерах токен после выхода, а
+    пользователь после деактивации или смены роли продолжают
+    аутентифицироваться по своей локальной записи еще до
+    AUTH_TOKEN_LOCAL_TIMEOUT секунд.
+
+    Источник каждого найденного токена (local, shared или database)
+    учитывается счетчиком auth_token_lookups_total в core.metrics,
+    который суммируется по всем воркерам.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = get_cache_key(key)
+        token = get_local(cache_key)
+        source = 'local'
+        if token is None:
+            shared = is_shared_cache()
+            if shared:
+                token = cache.get(cache_key)
+                source = 'shared'
+            if token is None:
+                _, token = super().authenticate_credentials(key)
+                source = 'database'
+                if shared:
+                    cache.set(cache_key, token, AUTH_TOKEN_CACHE_TIMEOUT)
+            set_local(cache_key, token)
+        metrics.increment(TOKEN_LOOKUPS, source=source)
+        if not token.user.is_active:
+            raise AuthenticationFailed('User inactive or deleted.')
+        # Каждый запрос получает свои копии токена и пользователя, чтобы
+        # данные, сохраненные на объектах во время запроса, не попадали
+        # в кеш.
+        token = copy.copy(token)
+        token.user = copy.copy(token.user)
+        return token.user, token
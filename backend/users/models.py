@@ -3,10 +3,11 @@ from django.db import models
 
 from core.constants.users import (EMAIL_LENGTH, NAME_LENGTH,
                                   ROLE_LENGTH, USERNAME_LENGTH)
+from core.counters import CounterFieldsMixin
 from users.validators import validate_username
 
 
-class User(AbstractUser):
+class User(CounterFieldsMixin, AbstractUser):
     """
     Модель пользователя приложения.
 
@@ -16,6 +17,9 @@ class User(AbstractUser):
         - first_name (str): Имя пользователя.
         - last_name (str): Фамилия пользователя.
         - role (str): Роль пользователя (из выбора в ROLES).
+        - recipes_count (int): Количество рецептов пользователя.
+        - followers_count (int): Количество подписчиков.
+        - following_count (int): Количество подписок.
 
     Мета:
         - ordering (list): Сортировка объектов модели по умолчанию.
@@ -32,6 +36,8 @@ class User(AbstractUser):
     USER = 'user'
     ADMIN = 'admin'
 
+    counter_fields = ('recipes_count', 'followers_count', 'following_count')
+
     ROLES = (
         (USER, USER),
         (ADMIN, ADMIN)
@@ -78,6 +84,21 @@ class User(AbstractUser):
         default=USER,
         blank=True
     )
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов',
+        default=0,
+        editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков',
+        default=0,
+        editable=False
+    )
+    following_count = models.PositiveIntegerField(
+        'Количество подписок',
+        default=0,
+        editable=False
+    )
 
     @property
     def is_admin(self):
@@ -1,10 +1,19 @@
-from typing import Dict, List
+from typing import Dict, Iterable, List
 
+from django.db import connection, transaction
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import SerializerMethodField
 
+from api.v1.fields import ImageVariantsField
+from api.v1.representations import get_representer
+from core.background import run_in_background
+from core.constants.users import (SUBSCRIPTION_RECIPES_LIMIT,
+                                  SUBSCRIPTION_RECIPES_MAX_LIMIT)
+from core.counters import change_counter
+from recipes.feed import backfill_timeline, update_feed_mode
+from recipes.membership import SUBSCRIPTIONS, get_membership, update_membership
 from recipes.models import Recipe
 from users.models import User, Subscription
 
@@ -78,12 +87,13 @@ class UserSerializer(serializers.ModelSerializer):
             пользователя, в противном случае - False.
 
         """
-        return ((subscriber := self.context.get('request').user)
-                and subscriber.is_authenticated
-                and Subscription.objects.filter(
-                    subscriber=subscriber,
-                    target_user=target_user
-        ).exists())
+        request = self.context.get('request')
+        if request is None:
+            return False
+        return get_membership(request.user).is_subscribed(target_user.pk)
+
+    def to_representation(self, instance: User) -> Dict:
+        return get_representer(self).user(instance)
 
 
 class ShortRecipeReadSerializer(serializers.ModelSerializer):
@@ -94,9 +104,12 @@ class ShortRecipeReadSerializer(serializers.ModelSerializer):
         id (int, read-only): Идентификатор рецепта.
         name (str): Название рецепта.
         image (str): Изображение рецепта в формате Base64.
+        image_variants (dict): Ссылки на уменьшенные варианты изображения
+        в форматах WebP и JPEG.
         cooking_time (int): Время приготовления рецепта в минутах.
     """
     image = Base64ImageField()
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
@@ -104,9 +117,81 @@ class ShortRecipeReadSerializer(serializers.ModelSerializer):
             'id',
             'name',
             'image',
+            'image_width',
+            'image_height',
+            'image_placeholder',
+            'image_variants',
             'cooking_time',
         )
 
+    def to_representation(self, instance: Recipe) -> Dict:
+        return get_representer(self).short_recipe(instance)
+
+
+def get_recipes_limit(request) -> int:
+    """
+    Возвращает количество рецептов в превью автора из параметра
+    `recipes_limit` (по умолчанию SUBSCRIPTION_RECIPES_LIMIT, не больше
+    SUBSCRIPTION_RECIPES_MAX_LIMIT).
+    """
+    try:
+        limit = int(request.query_params['recipes_limit'])
+    except (AttributeError, KeyError, ValueError):
+        return SUBSCRIPTION_RECIPES_LIMIT
+    if limit < 0:
+        return SUBSCRIPTION_RECIPES_LIMIT
+    return min(limit, SUBSCRIPTION_RECIPES_MAX_LIMIT)
+
+
+def get_recipe_previews(author_ids: Iterable[int],
+                        limit: int) -> Dict[int, List[Recipe]]:
+    """
+    Возвращает последние рецепты нескольких авторов одним запросом.
+
+    Рецепты нумеруются оконной функцией ROW_NUMBER() отдельно для
+    каждого автора, и выбираются первые limit, поэтому количество
+    загружаемых рецептов не зависит от того, сколько их у авторов.
+
+    Args:
+        author_ids (Iterable[int]): Идентификаторы авторов.
+        limit (int): Количество рецептов каждого автора.
+
+    Returns:
+        dict: {id автора: [рецепты от новых к старым]}.
+    """
+    previews = {pk: [] for pk in author_ids}
+    if not previews or limit <= 0:
+        return previews
+    columns = ', '.join(
+        connection.ops.quote_name(Recipe._meta.get_field(field).column)
+        for field in ('author', *ShortRecipeReadSerializer.Meta.fields))
+    table = Recipe._meta.db_table
+    placeholders = ', '.join(['%s'] * len(previews))
+    recipes = Recipe.objects.raw(
+        f'SELECT {columns} FROM ('
+        f'SELECT *, ROW_NUMBER() OVER (PARTITION BY author_id '
+        f'ORDER BY pub_date DESC, id DESC) AS position '
+        f'FROM {table} WHERE author_id IN ({placeholders})'
+        f') ranked WHERE position <= %s ORDER BY author_id, position',
+        [*previews, limit])
+    for recipe in recipes:
+        previews[recipe.author_id].append(recipe)
+    return previews
+
+
+class SubscriptionListSerializer(serializers.ListSerializer):
+    """
+    Список авторов, для которого превью рецептов всех авторов
+    загружаются одним запросом (get_recipe_previews).
+    """
+
+    def to_representation(self, data):
+        authors = list(data)
+        self.child.recipe_previews = get_recipe_previews(
+            [author.pk for author in authors],
+            get_recipes_limit(self.context.get('request')))
+        return super().to_representation(authors)
+
 
 class UserSubscriptionListSerializer(serializers.ModelSerializer):
     """
@@ -125,8 +210,8 @@ class UserSubscriptionListSerializer(serializers.ModelSerializer):
         который сериализуется.
         - recipes_count (SerializerMethodField): Количество рецептов
         пользователя.
-        - recipes (SerializerMethodField): Сериализованные рецепты
-        пользователя.
+        - recipes (SerializerMethodField): Последние рецепты
+        пользователя (не больше `recipes_limit`).
 
     Meta:
         - model (User): Модель пользователя.
@@ -160,19 +245,17 @@ class UserSubscriptionListSerializer(serializers.ModelSerializer):
             'recipes',
             'recipes_count',
         )
+        list_serializer_class = SubscriptionListSerializer
 
     def get_is_subscribed(self, target_user: User) -> bool:
-        return ((subscriber := self.context.get('request').user)
-                and subscriber.is_authenticated
-                and Subscription.objects.filter(
-                    subscriber=subscriber,
-                    target_user=target_user
-        ).exists())
+        return get_membership(
+            self.context.get('request').user).is_subscribed(target_user.pk)
 
     @staticmethod
     def get_recipes_count(author: User) -> int:
         """
-        Возвращает количество рецептов пользователя.
+        Возвращает количество рецептов пользователя (счетчик
+        User.recipes_count, без запроса COUNT).
 
         Args:
             author (User): Пользователь, для которого подсчитывается
@@ -181,11 +264,11 @@ class UserSubscriptionListSerializer(serializers.ModelSerializer):
         Returns:
             int: Количество рецептов пользователя.
         """
-        return author.recipes.count()
+        return author.recipes_count
 
     def get_recipes(self, author: User) -> List:
         """
-        Возвращает сериализованные рецепты пользователя.
+        Возвращает сериализованные последние рецепты пользователя.
 
         Args:
             author (User): Пользователь, для которого сериализуются рецепты.
@@ -193,13 +276,26 @@ class UserSubscriptionListSerializer(serializers.ModelSerializer):
         Returns:
             list: Список сериализованных рецептов пользователя.
         """
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        recipes = author.recipes.all()[:int(limit)] if limit else (
-            author.recipes.all())
-        serializer = ShortRecipeReadSerializer(recipes, many=True,
-                                               read_only=True)
-        return serializer.data
+        return ShortRecipeReadSerializer(self.get_previews(author),
+                                         many=True, read_only=True).data
+
+    def get_previews(self, author: User) -> List[Recipe]:
+        """
+        Возвращает последние рецепты пользователя.
+
+        В списке авторов рецепты уже загружены для всей страницы
+        (SubscriptionListSerializer), для одного автора загружаются
+        отдельным запросом.
+        """
+        previews = getattr(self, 'recipe_previews', None)
+        if previews is None:
+            previews = get_recipe_previews(
+                [author.pk], get_recipes_limit(self.context.get('request')))
+        return previews.get(author.pk, [])
+
+    def to_representation(self, instance: User) -> Dict:
+        return get_representer(self).subscription(
+            instance, self.get_previews(instance))
 
 
 class UserSubscriptionSerializer(serializers.ModelSerializer):
@@ -234,10 +330,18 @@ class UserSubscriptionSerializer(serializers.ModelSerializer):
         """
         subscriber = self.context['subscriber']
         target_user = self.context['target_user']
-        subscription, _ = Subscription.objects.get_or_create(
-            subscriber=subscriber,
-            target_user=target_user
-        )
+        with transaction.atomic():
+            subscription, created = Subscription.objects.get_or_create(
+                subscriber=subscriber,
+                target_user=target_user
+            )
+            if created:
+                change_counter(User, target_user.pk, 'followers_count', 1)
+                change_counter(User, subscriber.pk, 'following_count', 1)
+                backfill_timeline(subscriber.pk, target_user)
+                run_in_background(update_feed_mode, target_user.pk)
+                update_membership(subscriber, SUBSCRIPTIONS,
+                                  added=[target_user.pk])
         return subscription
 
     def validate(self, data: Dict) -> Dict:
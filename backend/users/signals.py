@@ -0,0 +1,38 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from core.versions import bump_version
+from recipes.versions import AUTHORS_VERSION_KEY, author_version_key
+from users.authentication import invalidate_tokens
+from users.models import User
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Удаляет токен из кеша при выходе пользователя."""
+    invalidate_tokens([instance.key])
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    """
+    Удаляет токены пользователя из кеша при изменении пользователя
+    (смена пароля, роли, деактивация).
+    """
+    if created:
+        return
+    invalidate_tokens(
+        Token.objects.filter(user=instance).values_list('key', flat=True))
+
+
+@receiver(post_save, sender=User)
+def bump_author_version(sender, instance, created, update_fields, **kwargs):
+    """
+    Отмечает изменение данных пользователя, которые выводятся как
+    данные автора рецептов. Обновление только last_login (при входе)
+    пропускается.
+    """
+    if created or (update_fields and set(update_fields) == {'last_login'}):
+        return
+    bump_version(AUTHORS_VERSION_KEY, author_version_key(instance.pk))
@@ -0,0 +1,116 @@
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+
+from core import metrics
+from users import authentication
+from users.authentication import CachedTokenAuthentication
+from users.models import Subscription, User
+
+SHARED_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'users-tests',
+    }
+}
+
+
+class CachedTokenAuthenticationTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        authentication._local_cache.clear()
+        self.user = User.objects.create_user(
+            username='user', email='user@example.com', password='password')
+        self.token = Token.objects.create(user=self.user)
+        self.auth = CachedTokenAuthentication()
+
+    def test_returns_token(self):
+        user, token = self.auth.authenticate_credentials(self.token.key)
+        self.assertEqual(user, self.user)
+        self.assertIsInstance(token, Token)
+        self.assertEqual(token.key, self.token.key)
+        self.assertIs(token.user, user)
+
+    def test_local_cache_skips_shared_tier(self):
+        self.auth.authenticate_credentials(self.token.key)
+        self.assertIsNone(cache.get(
+            authentication.get_cache_key(self.token.key)))
+
+    @override_settings(CACHES=SHARED_CACHE)
+    def test_shared_cache(self):
+        with mock.patch.object(authentication, 'PROCESS_LOCAL_CACHES', ()):
+            self.auth.authenticate_credentials(self.token.key)
+            authentication._local_cache.clear()
+            with self.assertNumQueries(0):
+                user, token = self.auth.authenticate_credentials(
+                    self.token.key)
+        self.assertEqual(token.key, self.token.key)
+
+    def test_deleted_token_is_rejected(self):
+        key = self.token.key
+        self.auth.authenticate_credentials(key)
+        self.token.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(key)
+
+    def test_inactive_user_is_rejected(self):
+        self.auth.authenticate_credentials(self.token.key)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    @override_settings(CACHES=SHARED_CACHE, METRICS_ENABLED=True)
+    @mock.patch.object(authentication, 'PROCESS_LOCAL_CACHES', ())
+    def test_lookups_are_counted(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        metrics._state['pid'] = None
+        self.addCleanup(metrics._state.update, pid=None)
+        with override_settings(METRICS_DIR=directory.name):
+            for _ in range(2):
+                self.auth.authenticate_credentials(self.token.key)
+            authentication._local_cache.clear()
+            self.auth.authenticate_credentials(self.token.key)
+            metrics.flush()
+            counters = metrics.collect()['counters']
+        self.assertEqual(
+            {labels: value for (name, labels), value in counters.items()
+             if name == authentication.TOKEN_LOOKUPS},
+            {(('source', 'database'),): 1, (('source', 'local'),): 1,
+             (('source', 'shared'),): 1})
+
+
+class SubscriptionTest(TestCase):
+    """Проверяет счетчики подписок при подписке и отписке."""
+
+    def setUp(self):
+        cache.clear()
+        self.subscriber, self.author = (
+            User.objects.create_user(username=name,
+                                     email=f'{name}@example.com',
+                                     password='password')
+            for name in ('subscriber', 'author'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.subscriber)
+        self.path = f'/api/users/{self.author.pk}/subscribe/'
+
+    def get_counters(self):
+        self.subscriber.refresh_from_db()
+        self.author.refresh_from_db()
+        return self.subscriber.following_count, self.author.followers_count
+
+    def test_unsubscribe_decrements_counters_once(self):
+        self.assertEqual(self.client.post(self.path).status_code, 201)
+        self.assertEqual(self.get_counters(), (1, 1))
+        self.assertEqual(self.client.delete(self.path).status_code, 204)
+        self.assertFalse(Subscription.objects.exists())
+        self.assertEqual(self.get_counters(), (0, 0))
+        self.assertEqual(self.client.delete(self.path).status_code, 404)
+        self.assertEqual(self.get_counters(), (0, 0))
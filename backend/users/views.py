@@ -1,15 +1,22 @@
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from api.v1.filters import UserFilter
 from api.v1.permissions import IsAdminOrReadOnly
+from api.v1.views import lock_user
+from core.background import run_in_background
+from core.counters import change_counter
 from core.pagination import CustomPagination
+from recipes.feed import prune_timeline, update_feed_mode
+from recipes.membership import SUBSCRIPTIONS, update_membership
 from users.models import Subscription, User
 from users.serializers import (UserSerializer, UserSubscriptionListSerializer,
                                UserSubscriptionSerializer)
@@ -107,6 +114,10 @@ class CustomUserViewSet(UserViewSet):
         """
         Удаление подписки на другого пользователя.
 
+        Строка подписчика блокируется (lock_user), поэтому параллельные
+        отписки выполняются по очереди, и счетчики уменьшаются только
+        той из них, которая действительно удалила подписку.
+
         Args:
             request (Request): Запрос.
             kwargs: Параметры запроса, включая ID целевого пользователя.
@@ -115,9 +126,19 @@ class CustomUserViewSet(UserViewSet):
             Response: Статус операции.
         """
         target_user = get_object_or_404(User, id=self.kwargs.get('id'))
-        get_object_or_404(Subscription,
-                          subscriber=request.user,
-                          target_user=target_user).delete()
+        with transaction.atomic():
+            lock_user(request.user)
+            deleted, _ = Subscription.objects.filter(
+                subscriber=request.user, target_user=target_user).delete()
+            if deleted:
+                change_counter(User, target_user.pk, 'followers_count', -1)
+                change_counter(User, request.user.pk, 'following_count', -1)
+                prune_timeline(request.user.pk, target_user.pk)
+                run_in_background(update_feed_mode, target_user.pk)
+                update_membership(request.user, SUBSCRIPTIONS,
+                                  removed=[target_user.pk])
+        if not deleted:
+            raise NotFound()
         return Response('Подписка удалена',
                         status=status.HTTP_204_NO_CONTENT)
 